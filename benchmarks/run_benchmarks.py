@@ -0,0 +1,433 @@
+# run_benchmarks.py
+"""
+Cross-lab micro and loopback benchmarks with stored baselines.
+
+    python benchmarks/run_benchmarks.py --save      # record a baseline
+    python benchmarks/run_benchmarks.py             # compare, exit 1 on regression
+
+Baselines are machine-specific, so record one on the machine (or CI
+runner) that will do the comparing.
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import sys
+import threading
+import time
+import types
+from dataclasses import dataclass
+from typing import Callable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+DEFAULT_THRESHOLD = 0.15  # Fail if ops/sec drops more than 15%
+
+
+def lab_path(lab):
+    path = os.path.join(ROOT, lab)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    return path
+
+
+@dataclass
+class Benchmark:
+    """
+    One registered benchmark.
+
+    The setup function does all one-time work (starting servers, building
+    tables) and returns (ops, run): `run()` performs `ops` operations and
+    is what gets timed.
+    """
+    name: str
+    unit: str
+    setup: Callable
+    threshold: float = None  # Overrides the global threshold (noisy benchmarks)
+
+
+BENCHMARKS = {}
+
+
+def benchmark(name, unit, threshold=None):
+    def register(setup):
+        BENCHMARKS[name] = Benchmark(name, unit, setup, threshold)
+        return setup
+    return register
+
+
+class SkipBenchmark(Exception):
+    pass
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallows the labs' prints and request logs while they are measured."""
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink), contextlib.redirect_stderr(sink):
+        yield
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# --- Lab 8: forwarding ---
+
+def lab8():
+    lab_path("computer-networks-lab-8")
+    import lab8_import  # noqa: F401
+    import replay_harness
+    return replay_harness
+
+
+@benchmark("lab8.ip_to_binary", "addresses")
+def bench_ip_to_binary():
+    lab8()
+    from ip_utils import ip_to_binary
+    rng = random.Random(1)
+    addresses = [".".join(str(rng.randrange(256)) for _ in range(4)) for _ in range(20_000)]
+    return len(addresses), lambda: [ip_to_binary(a) for a in addresses]
+
+
+@benchmark("lab8.route_packet", "lookups")
+def bench_route_packet():
+    harness = lab8()
+    routes = harness.make_routes(1000)
+    with quiet():
+        router = harness.Router(routes)
+    dests = [p.dest_ip for p in harness.zipf_trace(5_000, routes)]
+    return len(dests), lambda: [router.route_packet(d) for d in dests]
+
+
+@benchmark("lab8.route_packet.trie", "lookups")
+def bench_route_packet_trie():
+    harness = lab8()
+    routes = harness.make_routes(1000)
+    with quiet():
+        router = harness.Router(routes, backend="trie")
+    dests = [p.dest_ip for p in harness.zipf_trace(5_000, routes)]
+    return len(dests), lambda: [router.route_packet(d) for d in dests]
+
+
+@benchmark("lab8.trie_lookup_v6", "lookups")
+def bench_trie_lookup_v6():
+    lab8()
+    from lpm_trie import PrefixTrie, lookup_targets, make_routes_v6
+    routes = make_routes_v6(100_000)
+    trie = PrefixTrie(128)
+    for network, length, link in routes:
+        trie.insert(network, length, link)
+    targets = lookup_targets(routes, 20_000, 128)
+    return len(targets), lambda: [trie.lookup(a) for a in targets]
+
+
+def scheduler_packets(count=50_000):
+    harness = lab8()
+    rng = random.Random(1)
+    return [harness.Packet("10.0.0.1", "10.0.0.2", "", rng.choice((0, 1, 2)))
+            for _ in range(count)]
+
+
+@benchmark("lab8.fifo_scheduler", "packets")
+def bench_fifo():
+    packets = scheduler_packets()  # Sets up the lab-8 imports
+    from scheduler import fifo_scheduler
+    # One call is a list copy (~0.25 ms); repeat it so a round is long
+    # enough that timer and scheduling noise stay well under the threshold
+    rounds = 200
+    return len(packets) * rounds, lambda: [fifo_scheduler(packets) for _ in range(rounds)]
+
+
+@benchmark("lab8.priority_scheduler", "packets")
+def bench_priority():
+    packets = scheduler_packets()
+    from scheduler import priority_scheduler
+    rounds = 5
+    return len(packets) * rounds, lambda: [priority_scheduler(packets) for _ in range(rounds)]
+
+
+# --- Lab 5: ARQ and congestion control simulators ---
+
+class VirtualTime(types.SimpleNamespace):
+    """
+    Drop-in for the `time` module inside a simulator: sleep() advances a
+    virtual clock instantly, so a run that would take minutes of wall time
+    measures only the protocol logic.
+    """
+
+    def __init__(self):
+        super().__init__(now=0.0)
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+def virtualized(module):
+    clock = VirtualTime()
+    module.time = clock
+    return clock
+
+
+@benchmark("lab5.stop_and_wait", "frames")
+def bench_stop_and_wait():
+    lab_path("computer-networks-lab-5")
+    import stop_and_wait
+    virtualized(stop_and_wait)
+    frames = 2_000
+
+    def run():
+        random.seed(1)
+        with quiet():
+            stop_and_wait.StopAndWaitARQ(total_frames=frames, loss_prob=0.3).simulate()
+    return frames, run
+
+
+@benchmark("lab5.go_back_n", "frames")
+def bench_go_back_n():
+    lab_path("computer-networks-lab-5")
+    import go_back_n
+    virtualized(go_back_n)
+    frames = 2_000
+
+    def run():
+        random.seed(1)
+        with quiet():
+            go_back_n.GoBackNARQ(frames, 4, 0.2).simulate()
+    return frames, run
+
+
+@benchmark("lab5.congestion_control", "rounds")
+def bench_congestion_control():
+    lab_path("computer-networks-lab-5")
+    try:
+        import congestion_control
+    except ImportError as e:
+        raise SkipBenchmark(str(e))
+    rounds = 5_000
+
+    def run():
+        sim = congestion_control.TCPCongestionControl(32, rounds, rounds // 2)
+        sim.plot_results = lambda: None  # Measure the simulation, not matplotlib
+        with quiet():
+            sim.simulate()
+    return rounds, run
+
+
+# --- Lab 3: HTTP ---
+
+REQUEST = ("GET /index.html HTTP/1.1\r\nHost: 127.0.0.1:8000\r\nUser-Agent: bench/1.0\r\n"
+           "Accept: text/html,application/xhtml+xml\r\nAccept-Encoding: gzip, deflate\r\n"
+           "Accept-Language: en-US,en;q=0.9\r\nConnection: keep-alive\r\n"
+           "Cookie: session_id=0123456789abcdef0123456789abcdef\r\n\r\n")
+
+
+@benchmark("lab3.parse_headers", "requests")
+def bench_parse_headers():
+    lab_path("computer-networks-lab-3")
+    from http_cookies import parse_headers
+    count = 50_000
+    return count, lambda: [parse_headers(REQUEST) for _ in range(count)]
+
+
+def http_get_loop(port, count, headers=None):
+    """Sends `count` sequential GETs, one connection each (http_cookies closes after every response)."""
+    def run():
+        with quiet():
+            for _ in range(count):
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+                conn.request("GET", "/", headers=headers or {})
+                conn.getresponse().read()
+                conn.close()
+    return count, run
+
+
+@benchmark("lab3.http_caching.200", "requests", threshold=0.3)
+def bench_http_caching_full():
+    lab_path("computer-networks-lab-3")
+    from socketserver import TCPServer
+    from http_caching import CachingHTTPRequestHandler
+    server = TCPServer(("127.0.0.1", 0), CachingHTTPRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return http_get_loop(server.server_address[1], 300)
+
+
+@benchmark("lab3.http_caching.304", "requests", threshold=0.3)
+def bench_http_caching_revalidate():
+    lab_path("computer-networks-lab-3")
+    import hashlib
+    from socketserver import TCPServer
+    import http_caching
+    with open(http_caching.indexfilepath, "rb") as f:
+        etag = hashlib.md5(f.read()).hexdigest()
+    server = TCPServer(("127.0.0.1", 0), http_caching.CachingHTTPRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return http_get_loop(server.server_address[1], 300, {"If-None-Match": etag})
+
+
+@benchmark("lab3.http_cookies", "requests", threshold=0.3)
+def bench_http_cookies():
+    lab_path("computer-networks-lab-3")
+    import http_cookies
+    port = free_port()
+    threading.Thread(target=http_cookies.start_server, args=("127.0.0.1", port),
+                     daemon=True).start()
+    wait_for_port(port)
+    return http_get_loop(port, 300)
+
+
+# --- Lab 1: TCP number exchange ---
+
+def wait_for_port(port, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.01)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+@benchmark("lab1.server", "exchanges", threshold=0.3)
+def bench_lab1_server():
+    lab_path("computer-networks-lab-1")
+    import server
+    server.PORT = free_port()
+    # Handler threads keep printing after the client has its reply, so
+    # redirecting stdout around the loop is not enough
+    server.print = lambda *args, **kwargs: None
+    threading.Thread(target=server.start_server, daemon=True).start()
+    wait_for_port(server.PORT)
+    count = 300
+
+    def run():
+        for i in range(count):
+            with socket.create_connection((server.HOST, server.PORT)) as s:
+                s.sendall(f"bench,{i % 100 + 1}".encode())
+                s.recv(1024)
+    return count, run
+
+
+# --- Runner ---
+
+def run_benchmark(bench: Benchmark, repeat=5):
+    """
+    Times `repeat` rounds after one warm-up round. The best round is the
+    headline figure (least disturbed by other load); the median is kept
+    for reference.
+    """
+    ops, run = bench.setup()
+    run()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    return {
+        "unit": bench.unit,
+        "ops": ops,
+        "ops_per_sec": ops / best,
+        "best_s": best,
+        "median_s": statistics.median(times),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns a list of (name, change, allowed, regressed) for every
+    benchmark present in both runs; change is the relative ops/sec change.
+    """
+    rows = []
+    for name, result in results.items():
+        old = baseline.get("results", {}).get(name)
+        if not old or "ops_per_sec" not in result or "ops_per_sec" not in old:
+            continue
+        change = result["ops_per_sec"] / old["ops_per_sec"] - 1
+        allowed = BENCHMARKS[name].threshold or threshold
+        rows.append((name, change, allowed, change < -allowed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-lab benchmarks with regression detection")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true",
+                        help="write this run into the baseline (with -k, only the matching entries change)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown as a fraction (0.15 = 15%%)")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        try:
+            result = run_benchmark(bench, args.repeat)
+        except SkipBenchmark as e:
+            print(f"{name:<28} skipped ({e})")
+            results[name] = {"skipped": str(e)}
+            continue
+        results[name] = result
+        print(f"{name:<28} {result['ops_per_sec']:>14,.0f} {bench.unit}/s "
+              f"(best {result['best_s'] * 1000:8.2f} ms, median {result['median_s'] * 1000:8.2f} ms)")
+
+    run = {
+        "meta": {"python": platform.python_version(), "machine": platform.node(),
+                 "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=2)
+    if args.save:
+        saved = run
+        if args.filter and os.path.exists(args.baseline):
+            # A partial run only replaces its own entries
+            with open(args.baseline) as f:
+                saved = json.load(f)
+            saved["meta"] = run["meta"]
+            saved.setdefault("results", {}).update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(saved, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save to create one.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    print(f"\n--- Compared with baseline from {baseline['meta']['time']} "
+          f"({baseline['meta']['machine']}, Python {baseline['meta']['python']}) ---")
+    rows = compare(results, baseline, args.threshold)
+    for name, change, allowed, regressed in rows:
+        status = "REGRESSION" if regressed else "ok"
+        print(f"{name:<28} {change * 100:+7.1f}%  (allowed -{allowed * 100:.0f}%)  {status}")
+    failures = [name for name, _, _, regressed in rows if regressed]
+    if failures:
+        print(f"\n{len(failures)} benchmark(s) regressed: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+# common
+"""
+Code shared by the labs. Each lab's labN_import module puts the
+repository root on sys.path, after which:
+
+    from common import metrics
+"""
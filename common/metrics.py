@@ -0,0 +1,354 @@
+# metrics.py
+"""
+Lightweight counters, gauges and latency histograms for the lab servers.
+
+    from common import metrics
+    REQUESTS = metrics.counter("http_requests_total", "Requests served", status="200")
+    LATENCY = metrics.histogram("http_request_seconds", "Request latency")
+
+    REQUESTS.inc()
+    with LATENCY.time():
+        handle()
+
+    metrics.start_from_env()  # METRICS_PORT=9100 -> http://127.0.0.1:9100/metrics
+
+Each update is an integer add under a per-metric lock, and histograms
+bucket values HDR-style (log-linear, ~3% relative error) into a fixed
+array, so recording costs the same no matter how many values were seen.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class Counter:
+    """A value that only goes up (requests, bytes, errors)."""
+
+    kind = "counter"
+
+    def __init__(self, fn=None):
+        self._value = 0
+        self._lock = threading.Lock()
+        self._fn = fn  # Read the value from existing code instead of counting
+
+    def inc(self, amount=1):
+        # acquire/release is measurably cheaper than `with` on this path
+        lock = self._lock
+        lock.acquire()
+        self._value += amount
+        lock.release()
+
+    @property
+    def value(self):
+        return self._fn() if self._fn else self._value
+
+    def samples(self, name, labels):
+        yield name, labels, self.value
+
+
+class Gauge:
+    """A value that goes up and down (open connections, current level)."""
+
+    kind = "gauge"
+
+    def __init__(self, fn=None):
+        self._value = 0
+        self._lock = threading.Lock()
+        self._fn = fn
+
+    def set(self, value):
+        self._value = value
+
+    def inc(self, amount=1):
+        lock = self._lock
+        lock.acquire()
+        self._value += amount
+        lock.release()
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    @contextmanager
+    def track(self):
+        """Counts the block as in progress while it runs."""
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    @property
+    def value(self):
+        return self._fn() if self._fn else self._value
+
+    def samples(self, name, labels):
+        yield name, labels, self.value
+
+
+class Histogram:
+    """
+    Latency distribution in fixed log-linear buckets.
+
+    Values are stored as integers of `unit` seconds (microseconds by
+    default). Values below 2**precision_bits get exact buckets; above that,
+    every power of two is split into 2**(precision_bits - 1) buckets, so
+    the relative error stays under 2**-(precision_bits - 1) (3% at 6 bits)
+    from 1 us up to `max_seconds`.
+    """
+
+    kind = "summary"
+
+    def __init__(self, precision_bits=6, max_seconds=3600.0, unit=1e-6):
+        self.precision_bits = precision_bits
+        self.unit = unit
+        self.max_value = int(max_seconds / unit)
+        self._counts = [0] * (self._index(self.max_value) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def _index(self, value):
+        p = self.precision_bits
+        if value < 1 << p:
+            return value
+        shift = value.bit_length() - p
+        return (1 << p) + (shift - 1 << p - 1) + (value >> shift) - (1 << p - 1)
+
+    def _lower_bound(self, index):
+        p = self.precision_bits
+        if index < 1 << p:
+            return index
+        shift, offset = divmod(index - (1 << p), 1 << p - 1)
+        return (offset + (1 << p - 1)) << shift + 1
+
+    def observe(self, seconds):
+        # Hot path: the bucket index is computed inline (same as _index)
+        value = int(seconds / self.unit)
+        p = self.precision_bits
+        if value >= 1 << p:
+            if value > self.max_value:
+                value = self.max_value
+            shift = value.bit_length() - p
+            index = (1 << p) + (shift - 1 << p - 1) + (value >> shift) - (1 << p - 1)
+        else:
+            index = value if value > 0 else 0
+        lock = self._lock
+        lock.acquire()
+        self._counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if seconds < self.min:
+            self.min = seconds
+        lock.release()
+
+    @contextmanager
+    def time(self):
+        """Observes how long the block takes."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def quantile(self, q):
+        """The value (in seconds) below which a fraction q of observations fall."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self.count
+        if not total:
+            return 0.0
+        rank = max(1, int(q * total + 0.5))
+        seen = 0
+        for index, n in enumerate(counts):
+            seen += n
+            if seen >= rank:
+                # Midpoint of the bucket, clamped to what was really seen
+                low = self._lower_bound(index)
+                high = self._lower_bound(index + 1)
+                return min(max((low + high) / 2 * self.unit, self.min), self.max)
+        return self.max
+
+    def samples(self, name, labels):
+        for q in QUANTILES:
+            yield name, dict(labels, quantile=str(q)), self.quantile(q)
+        yield name + "_sum", labels, self.sum
+        yield name + "_count", labels, self.count
+
+
+def escape(text, quote=True):
+    """Escapes a label value (or, with quote=False, HELP text) for the text format."""
+    text = str(text).replace("\\", "\\\\").replace("\n", "\\n")
+    return text.replace('"', '\\"') if quote else text
+
+
+class Registry:
+    """
+    Holds every metric by (name, labels). Asking for the same name and
+    labels again returns the same object, so modules can declare their
+    metrics at import time without coordinating.
+
+    A metric read through `fn` belongs to one object, so registering a
+    second fn for the same name and labels is an error: give each instance
+    its own label and unregister() it when the instance goes away.
+    """
+
+    def __init__(self):
+        self._metrics = {}  # name -> (kind, help, {labels tuple: metric})
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            kind, _, children = self._metrics.setdefault(name, (cls.kind, help, {}))
+            if kind != cls.kind:
+                raise ValueError(f"metric {name} is already registered as a {kind}")
+            metric = children.get(key)
+            if metric is None:
+                metric = children[key] = cls(**kwargs)
+            elif kwargs.get("fn"):
+                raise ValueError(f"metric {name}{dict(key)} is already registered; "
+                                 f"use distinct labels per instance")
+            return metric
+
+    def unregister(self, name, **labels):
+        """Removes the metric with this name and labels (no-op if absent)."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._metrics.get(name)
+            if family is not None:
+                family[2].pop(key, None)
+                if not family[2]:
+                    del self._metrics[name]
+
+    def counter(self, name, help="", fn=None, **labels) -> Counter:
+        return self._get(Counter, name, help, labels, fn=fn)
+
+    def gauge(self, name, help="", fn=None, **labels) -> Gauge:
+        return self._get(Gauge, name, help, labels, fn=fn)
+
+    def histogram(self, name, help="", **labels) -> Histogram:
+        return self._get(Histogram, name, help, labels)
+
+    def collect(self):
+        """Yields (name, kind, help, [(sample name, labels, value), ...])."""
+        with self._lock:
+            families = [(name, kind, help, list(children.items()))
+                        for name, (kind, help, children) in self._metrics.items()]
+        for name, kind, help, children in families:
+            samples = []
+            for key, metric in children:
+                samples.extend(metric.samples(name, dict(key)))
+            yield name, kind, help, samples
+
+    def render(self) -> str:
+        """The Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for name, kind, help, samples in self.collect():
+            if help:
+                lines.append(f"# HELP {name} {escape(help, quote=False)}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample, labels, value in samples:
+                if isinstance(value, float):
+                    value = f"{value:.9g}"
+                if labels:
+                    text = ",".join(f'{k}="{escape(v)}"' for k, v in labels.items())
+                    lines.append(f"{sample}{{{text}}} {value}")
+                else:
+                    lines.append(f"{sample} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """Every sample as {"name{labels}": value}, for logs and JSON dumps."""
+        result = {}
+        for _, _, _, samples in self.collect():
+            for sample, labels, value in samples:
+                text = ",".join(f"{k}={v}" for k, v in labels.items())
+                result[f"{sample}{{{text}}}" if text else sample] = value
+        return result
+
+    def serve(self, host="127.0.0.1", port=9100):
+        """
+        Serves GET /metrics in a background thread.
+
+        Returns:
+            The HTTP server (call shutdown() to stop it).
+        """
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def dump_periodically(self, interval=10.0, path=None):
+        """
+        Writes a JSON snapshot every `interval` seconds from a daemon
+        thread, appending one line per dump to `path` (stderr if None).
+
+        Returns:
+            An Event; set it to stop dumping.
+        """
+        stop = threading.Event()
+
+        def loop():
+            while not stop.wait(interval):
+                line = json.dumps({"time": time.time(), **self.snapshot()})
+                if path:
+                    with open(path, "a") as f:
+                        f.write(line + "\n")
+                else:
+                    print(line, file=sys.stderr)
+
+        threading.Thread(target=loop, daemon=True).start()
+        return stop
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+unregister = REGISTRY.unregister
+
+
+def start_from_env(registry=REGISTRY):
+    """
+    Turns on exporting if asked to by the environment:
+
+        METRICS_PORT=9100         serve http://127.0.0.1:9100/metrics
+        METRICS_HOST=0.0.0.0      listen address for the endpoint
+        METRICS_DUMP_INTERVAL=10  dump a JSON snapshot every 10 s
+        METRICS_DUMP_FILE=m.jsonl dump to this file instead of stderr
+
+    Does nothing when none of them is set.
+    """
+    port = os.environ.get("METRICS_PORT")
+    if port:
+        registry.serve(os.environ.get("METRICS_HOST", "127.0.0.1"), int(port))
+    interval = os.environ.get("METRICS_DUMP_INTERVAL")
+    if interval:
+        registry.dump_periodically(float(interval), os.environ.get("METRICS_DUMP_FILE"))
@@ -0,0 +1,494 @@
+# pcap_analyzer.py
+import argparse
+import heapq
+import json
+import mmap
+import os
+import socket
+import struct
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+# Link types (https://www.tcpdump.org/linktypes.html)
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_IDB = 0x00000001
+PCAPNG_SPB = 0x00000003
+PCAPNG_EPB = 0x00000006
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+
+ETH_IPV4 = 0x0800
+ETH_IPV6 = 0x86DD
+ETH_ARP = 0x0806
+ETH_VLAN = (0x8100, 0x88A8)
+
+IP_PROTOCOLS = {1: "ICMP", 6: "TCP", 17: "UDP", 58: "ICMPv6"}
+
+TCP_FIN, TCP_SYN, TCP_RST, TCP_ACK = 0x01, 0x02, 0x04, 0x10
+
+# Network-order header layouts, compiled once
+ETH_TYPE = struct.Struct("!H")
+IPV4 = struct.Struct("!BBHHHBBHII")  # ver/ihl, tos, len, id, frag, ttl, proto, csum, src, dst
+PORTS = struct.Struct("!HH")
+TCP = struct.Struct("!HHIIBB")  # sport, dport, seq, ack, data offset, flags
+
+
+RELEASE_EVERY = 64 * 1024 * 1024  # Drop already-parsed pages from RSS this often
+
+
+class PcapFormatError(ValueError):
+    pass
+
+
+class PcapReader:
+    """
+    Memory-maps a pcap or pcapng file and iterates its packets.
+
+    Nothing is copied: every record is yielded as an offset into
+    `self.view` (a memoryview of the mapping), and the kernel pages the
+    file in and out as needed, so multi-GB captures use bounded memory.
+
+    Yields:
+        (timestamp, linktype, offset, caplen, wirelen) per packet.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+        if self.size < 4:  # Also rules out mmap's "cannot mmap an empty file"
+            raise PcapFormatError(f"{path}: too short for a capture file")
+        self._file = open(path, "rb")
+        self.mm = self.view = None
+        try:
+            self.mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(self.mm, "madvise"):
+                self.mm.madvise(mmap.MADV_SEQUENTIAL)
+            self.view = memoryview(self.mm)
+            self._released = 0
+            (magic,) = struct.unpack_from("<I", self.view, 0)
+            self.is_pcapng = magic == PCAPNG_SHB
+        except BaseException:
+            self.close()
+            raise
+
+    def __iter__(self):
+        return self._iter_pcapng() if self.is_pcapng else self._iter_pcap()
+
+    def _iter_pcap(self):
+        view, size = self.view, self.size
+        magic = bytes(view[:4])
+        if magic in (b"\xd4\xc3\xb2\xa1", b"\x4d\x3c\xb2\xa1"):
+            order = "<"
+        elif magic in (b"\xa1\xb2\xc3\xd4", b"\xa1\xb2\x3c\x4d"):
+            order = ">"
+        else:
+            raise PcapFormatError(f"{self.path}: not a pcap or pcapng file")
+        if size < 24:
+            raise PcapFormatError(f"{self.path}: truncated pcap header")
+        scale = 1e-9 if magic in (b"\x4d\x3c\xb2\xa1", b"\xa1\xb2\x3c\x4d") else 1e-6
+        (linktype,) = struct.unpack_from(order + "I", view, 20)
+        linktype &= 0x0FFFFFFF  # Upper bits hold FCS information
+        record = struct.Struct(order + "IIII")
+        unpack = record.unpack_from
+        offset = 24
+        while offset + 16 <= size:
+            sec, frac, caplen, wirelen = unpack(view, offset)
+            offset += 16
+            if offset + caplen > size:
+                break  # Truncated last record
+            yield sec + frac * scale, linktype, offset, caplen, wirelen
+            offset += caplen
+            if offset - self._released >= RELEASE_EVERY:
+                self._release(offset)
+
+    def _iter_pcapng(self):
+        view, size = self.view, self.size
+        order = "<"
+        interfaces = []  # (linktype, seconds per timestamp unit)
+        offset = 0
+        while offset + 12 <= size:
+            block_type, block_len = struct.unpack_from(order + "II", view, offset)
+            if block_type == PCAPNG_SHB:
+                (bom,) = struct.unpack_from("<I", view, offset + 8)
+                order = "<" if bom == PCAPNG_BYTE_ORDER_MAGIC else ">"
+                block_len = struct.unpack_from(order + "I", view, offset + 4)[0]
+                interfaces = []  # Interface ids restart in every section
+            if block_len < 12 or offset + block_len > size:
+                break
+            body = offset + 8
+            if block_type == PCAPNG_IDB:
+                (linktype,) = struct.unpack_from(order + "H", view, body)
+                interfaces.append((linktype, self._ts_resolution(order, body + 8,
+                                                                 offset + block_len - 4)))
+            elif block_type == PCAPNG_EPB:
+                iface, ts_hi, ts_lo, caplen, wirelen = struct.unpack_from(order + "IIIII", view, body)
+                if iface >= len(interfaces):
+                    raise PcapFormatError(f"{self.path}: packet at offset {offset} "
+                                          f"names undeclared interface {iface}")
+                linktype, resolution = interfaces[iface]
+                yield (ts_hi << 32 | ts_lo) * resolution, linktype, body + 20, caplen, wirelen
+            elif block_type == PCAPNG_SPB and interfaces:
+                (wirelen,) = struct.unpack_from(order + "I", view, body)
+                caplen = min(wirelen, block_len - 16)
+                yield 0.0, interfaces[0][0], body + 4, caplen, wirelen
+            offset += block_len
+            if offset - self._released >= RELEASE_EVERY:
+                self._release(offset)
+
+    def _release(self, offset):
+        """
+        Tells the kernel the pages before `offset` are done with. They are
+        clean file pages, so this only shrinks our resident set; the mapping
+        stays valid and would fault them back in if touched again.
+        """
+        end = offset - offset % mmap.PAGESIZE
+        if hasattr(mmap, "MADV_DONTNEED") and end > self._released:
+            self.mm.madvise(mmap.MADV_DONTNEED, self._released, end - self._released)
+        self._released = end
+
+    def _ts_resolution(self, order, offset, end):
+        """Reads the if_tsresol option of an IDB (default: microseconds)."""
+        while offset + 4 <= end:
+            code, length = struct.unpack_from(order + "HH", self.view, offset)
+            if code == 0:
+                break
+            if code == 9 and length >= 1:
+                value = self.view[offset + 4]
+                return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+            offset += 4 + (length + 3 & ~3)
+        return 1e-6
+
+    def close(self):
+        if self.view is not None:
+            self.view.release()
+        if self.mm is not None:
+            self.mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@dataclass(slots=True)
+class FlowStats:
+    """
+    Counters for one bidirectional flow. Side "a" is whoever sent the
+    first packet we saw.
+
+    RTT samples come from the TCP handshake (SYN -> SYN/ACK) and from
+    timing one data segment at a time per direction until it is ACKed,
+    skipping retransmissions (Karn's rule), so the state per flow is
+    constant no matter how long the flow runs. Samples are kept per
+    direction: seen from the capture point, data sent by the local host
+    measures the network round trip, while data it receives only measures
+    its own ACK delay.
+    """
+    proto: str
+    a: tuple
+    b: tuple
+    first: float
+    last: float = 0.0
+    packets_ab: int = 0
+    packets_ba: int = 0
+    bytes_ab: int = 0
+    bytes_ba: int = 0
+    syn_time: float = -1.0
+    timing: list = field(default_factory=lambda: [None, None])  # (seq_end, ts) per direction
+    highest_seq: list = field(default_factory=lambda: [None, None])
+    rtt_count: list = field(default_factory=lambda: [0, 0])  # Per direction (a->b, b->a)
+    rtt_sum: list = field(default_factory=lambda: [0.0, 0.0])
+    rtt_min: list = field(default_factory=lambda: [float("inf")] * 2)
+    retransmits: int = 0
+
+    @property
+    def bytes(self):
+        return self.bytes_ab + self.bytes_ba
+
+    def add_rtt(self, side, sample):
+        self.rtt_count[side] += 1
+        self.rtt_sum[side] += sample
+        if sample < self.rtt_min[side]:
+            self.rtt_min[side] = sample
+
+    def summary(self):
+        def rtt(side, value):
+            return round(value * 1000, 3) if self.rtt_count[side] else None
+        return {
+            "proto": self.proto,
+            "a": f"{ipv4_text(self.a[0])}:{self.a[1]}",
+            "b": f"{ipv4_text(self.b[0])}:{self.b[1]}",
+            "packets": self.packets_ab + self.packets_ba,
+            "bytes_a_to_b": self.bytes_ab,
+            "bytes_b_to_a": self.bytes_ba,
+            "duration_s": round(self.last - self.first, 6),
+            "rtt_a_b_min_ms": rtt(0, self.rtt_min[0]),
+            "rtt_a_b_avg_ms": rtt(0, self.rtt_sum[0] / max(1, self.rtt_count[0])),
+            "rtt_b_a_min_ms": rtt(1, self.rtt_min[1]),
+            "rtt_b_a_avg_ms": rtt(1, self.rtt_sum[1] / max(1, self.rtt_count[1])),
+            "retransmits": self.retransmits,
+        }
+
+
+def seq_after(a, b):
+    """True if TCP sequence number a comes after b (mod 2**32)."""
+    return 0 < (a - b) & 0xFFFFFFFF < 0x80000000
+
+
+def ipv4_text(value):
+    return socket.inet_ntoa(value.to_bytes(4, "big"))
+
+
+class CaptureAnalyzer:
+    """
+    Aggregates a packet stream in one pass.
+
+    Keeps at most `max_flows` flows in memory; the least recently active
+    one is retired when the table is full (its counters still count
+    towards the totals, and it can still make the top-N list).
+    """
+
+    def __init__(self, max_flows=100_000, top=10):
+        self.max_flows = max_flows
+        self.top = top
+        self.flows = OrderedDict()  # (proto, endpoint, endpoint) -> FlowStats
+        self.retired = []  # Min-heap of (bytes, n, summary) for the biggest retired flows
+        self.protocols = {}  # name -> [packets, bytes]
+        self.packets = 0
+        self.bytes = 0
+        self.first_ts = None
+        self.last_ts = 0.0
+        self.rtt_count = [0, 0]  # a->b (first talker's data), b->a
+        self.rtt_sum = [0.0, 0.0]
+
+    def _count(self, name, length):
+        entry = self.protocols.get(name)
+        if entry is None:
+            self.protocols[name] = [1, length]
+        else:
+            entry[0] += 1
+            entry[1] += length
+
+    def feed(self, view, ts, linktype, offset, caplen, wirelen):
+        """Decodes one packet (Ethernet/SLL/raw -> IPv4 -> TCP/UDP) and updates the stats."""
+        self.packets += 1
+        self.bytes += wirelen
+        if self.first_ts is None:
+            self.first_ts = ts
+        self.last_ts = ts
+        end = offset + caplen
+
+        if linktype == LINKTYPE_ETHERNET:
+            if caplen < 14:
+                return self._count("truncated", wirelen)
+            (ethertype,) = ETH_TYPE.unpack_from(view, offset + 12)
+            offset += 14
+            while ethertype in ETH_VLAN and offset + 4 <= end:
+                (ethertype,) = ETH_TYPE.unpack_from(view, offset + 2)
+                offset += 4
+        elif linktype == LINKTYPE_LINUX_SLL:
+            if caplen < 16:
+                return self._count("truncated", wirelen)
+            (ethertype,) = ETH_TYPE.unpack_from(view, offset + 14)
+            offset += 16
+        elif linktype == LINKTYPE_RAW:
+            ethertype = ETH_IPV4 if caplen and view[offset] >> 4 == 4 else ETH_IPV6
+        else:
+            return self._count(f"linktype {linktype}", wirelen)
+
+        if ethertype != ETH_IPV4:
+            name = "IPv6" if ethertype == ETH_IPV6 else "ARP" if ethertype == ETH_ARP \
+                else f"ethertype 0x{ethertype:04x}"
+            return self._count(name, wirelen)
+        if offset + 20 > end:
+            return self._count("truncated", wirelen)
+
+        ver_ihl, _, total_len, _, frag, _, proto, _, src, dst = IPV4.unpack_from(view, offset)
+        ihl = (ver_ihl & 0x0F) * 4
+        l4 = offset + ihl
+        name = IP_PROTOCOLS.get(proto, f"IP proto {proto}")
+        self._count("IPv4/" + name, wirelen)
+        if proto not in (6, 17) or frag & 0x1FFF or l4 + 8 > end:
+            return  # Non-first fragments and other protocols carry no ports
+
+        if proto == 17:
+            sport, dport = PORTS.unpack_from(view, l4)
+            flow = self._flow("UDP", src, sport, dst, dport, ts)
+            forward = flow.a == (src, sport)
+            self._add(flow, forward, wirelen, ts)
+            return
+
+        if l4 + 14 > end:
+            return
+        sport, dport, seq, ack, data_off, flags = TCP.unpack_from(view, l4)
+        payload = total_len - ihl - (data_off >> 4) * 4
+        flow = self._flow("TCP", src, sport, dst, dport, ts)
+        forward = flow.a == (src, sport)
+        self._add(flow, forward, wirelen, ts)
+        self._tcp_rtt(flow, forward, seq, ack, flags, payload, ts)
+
+    def _flow(self, proto, src, sport, dst, dport, ts):
+        a, b = (src, sport), (dst, dport)
+        key = (proto, a, b) if a <= b else (proto, b, a)
+        flow = self.flows.get(key)
+        if flow is None:
+            if len(self.flows) >= self.max_flows:
+                self._retire(self.flows.popitem(last=False)[1])
+            flow = self.flows[key] = FlowStats(proto, a, b, ts)
+        else:
+            self.flows.move_to_end(key)
+        return flow
+
+    @staticmethod
+    def _add(flow, forward, length, ts):
+        flow.last = ts
+        if forward:
+            flow.packets_ab += 1
+            flow.bytes_ab += length
+        else:
+            flow.packets_ba += 1
+            flow.bytes_ba += length
+
+    def _tcp_rtt(self, flow, forward, seq, ack, flags, payload, ts):
+        side, other = (0, 1) if forward else (1, 0)
+        if flags & TCP_SYN:
+            if not flags & TCP_ACK:
+                flow.syn_time = ts
+            elif flow.syn_time >= 0:
+                self._sample(flow, other, ts - flow.syn_time)
+                flow.syn_time = -1.0
+            return
+
+        # An ACK from this side completes the segment the other side is timing
+        pending = flow.timing[other]
+        if flags & TCP_ACK and pending is not None and not seq_after(pending[0], ack):
+            self._sample(flow, other, ts - pending[1])
+            flow.timing[other] = None
+
+        if payload > 0 and not flags & TCP_RST:
+            seq_end = (seq + payload) & 0xFFFFFFFF
+            highest = flow.highest_seq[side]
+            if highest is not None and not seq_after(seq_end, highest):
+                flow.retransmits += 1
+                flow.timing[side] = None  # Karn: an ACK would be ambiguous now
+            else:
+                flow.highest_seq[side] = seq_end
+                if flow.timing[side] is None:
+                    flow.timing[side] = (seq_end, ts)
+
+    def _sample(self, flow, side, rtt):
+        """Records the round trip for data (or a SYN) sent by `side`."""
+        if rtt >= 0:
+            flow.add_rtt(side, rtt)
+            self.rtt_count[side] += 1
+            self.rtt_sum[side] += rtt
+
+    def _retire(self, flow):
+        entry = (flow.bytes, id(flow), flow.summary())
+        if len(self.retired) < self.top:
+            heapq.heappush(self.retired, entry)
+        elif entry[0] > self.retired[0][0]:
+            heapq.heapreplace(self.retired, entry)
+
+    def top_flows(self):
+        active = heapq.nlargest(self.top, self.flows.values(), key=lambda f: f.bytes)
+        candidates = [(f.bytes, f.summary()) for f in active]
+        candidates += [(b, s) for b, _, s in self.retired]
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        return [s for _, s in candidates[:self.top]]
+
+    def report(self):
+        duration = (self.last_ts - self.first_ts) if self.first_ts is not None else 0.0
+        return {
+            "packets": self.packets,
+            "bytes": self.bytes,
+            "duration_s": round(duration, 6),
+            "flows_tracked": len(self.flows),
+            "protocols": {name: {"packets": p, "bytes": b}
+                          for name, (p, b) in sorted(self.protocols.items(),
+                                                     key=lambda kv: kv[1][1], reverse=True)},
+            "rtt_samples": {"a_b": self.rtt_count[0], "b_a": self.rtt_count[1]},
+            "rtt_a_b_avg_ms": (round(self.rtt_sum[0] / self.rtt_count[0] * 1000, 3)
+                               if self.rtt_count[0] else None),
+            "rtt_b_a_avg_ms": (round(self.rtt_sum[1] / self.rtt_count[1] * 1000, 3)
+                               if self.rtt_count[1] else None),
+            "top_flows": self.top_flows(),
+        }
+
+
+def analyze(path, max_flows=100_000, top=10):
+    """
+    Runs one streaming pass over a capture.
+
+    Returns:
+        (report dict, seconds taken, file size in bytes)
+    """
+    analyzer = CaptureAnalyzer(max_flows, top)
+    start = time.perf_counter()
+    with PcapReader(path) as reader:
+        view, feed = reader.view, analyzer.feed
+        for ts, linktype, offset, caplen, wirelen in reader:
+            feed(view, ts, linktype, offset, caplen, wirelen)
+        size = reader.size
+    return analyzer.report(), time.perf_counter() - start, size
+
+
+def print_report(report, elapsed, size):
+    print(f"{report['packets']} packets, {report['bytes']} bytes on the wire, "
+          f"{report['duration_s']:.3f} s of traffic")
+    print(f"Parsed {size / 1e6:.2f} MB in {elapsed:.3f} s "
+          f"({size / elapsed / 1e6:.1f} MB/s, {report['packets'] / elapsed:.0f} packets/s)")
+
+    print("\n--- Protocols ---")
+    for name, entry in report["protocols"].items():
+        share = entry["bytes"] / report["bytes"] * 100 if report["bytes"] else 0
+        print(f"{name:>16}: {entry['packets']:8d} packets {entry['bytes']:12d} bytes ({share:5.1f}%)")
+
+    print("\nTCP RTT (a = first host seen in each flow):")
+    for side, label in (("a_b", "a -> b data, ACK from b"), ("b_a", "b -> a data, ACK from a")):
+        avg = report[f"rtt_{side}_avg_ms"]
+        print(f"{label:>24}: {report['rtt_samples'][side]:6d} samples, "
+              + (f"average {avg:.3f} ms" if avg is not None else "no samples"))
+
+    print(f"\n--- Top {len(report['top_flows'])} flows by bytes ---")
+    for f in report["top_flows"]:
+        rtt = "rtt min " + " / ".join("-" if v is None else f"{v:.2f}"
+                                      for v in (f["rtt_a_b_min_ms"], f["rtt_b_a_min_ms"])) + " ms"
+        print(f"{f['proto']:3} {f['a']:>21} <-> {f['b']:<21} {f['packets']:7d} pkts "
+              f"{f['bytes_a_to_b']:>10d} / {f['bytes_b_to_a']:<10d} B {rtt}")
+
+
+def main():
+    default = os.path.join(os.path.dirname(os.path.abspath(__file__)), "capture_lab1.pcap")
+    parser = argparse.ArgumentParser(description="Streaming pcap/pcapng flow analyzer")
+    parser.add_argument("capture", nargs="?", default=default)
+    parser.add_argument("--top", type=int, default=10, help="flows to list")
+    parser.add_argument("--max-flows", type=int, default=100_000,
+                        help="flows kept in memory at once")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    try:
+        report, elapsed, size = analyze(args.capture, args.max_flows, args.top)
+    except PcapFormatError as e:
+        print(f"error: {e}", file=sys.stderr)  # The message starts with the path
+        sys.exit(2)
+    except OSError as e:
+        print(f"error: {args.capture}: {e.strerror or e}", file=sys.stderr)
+        sys.exit(2)
+    if args.json:
+        report["mb_per_sec"] = round(size / elapsed / 1e6, 2)
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, elapsed, size)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,36 @@
+import os
 import socket
+import sys
 import threading
+import time
+
+# The repository root, for the shared common package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)  # Appended, so it cannot shadow anything
+from common import metrics
 
 HOST = '127.0.0.1'
 PORT = 5001
 SERVER_NAME = "Server of Gemini"
 SERVER_NUMBER = 42
 
+CONNECTIONS = metrics.counter("lab1_connections_total", "Client connections accepted")
+ACTIVE = metrics.gauge("lab1_active_connections", "Connections being handled")
+BYTES_IN = metrics.counter("lab1_bytes_received_total", "Bytes read from clients")
+BYTES_OUT = metrics.counter("lab1_bytes_sent_total", "Bytes sent to clients")
+OUT_OF_RANGE = metrics.counter("lab1_out_of_range_total", "Out-of-range numbers (shutdown requests)")
+LATENCY = metrics.histogram("lab1_request_seconds", "Time from connection to reply")
+
 def handle_client(conn, addr):
     print(f"Connected by {addr}")
-    with conn:
+    CONNECTIONS.inc()
+    start = time.perf_counter()
+    with ACTIVE.track(), conn:
         data = conn.recv(1024)
         if not data:
             return
+        BYTES_IN.inc(len(data))
 
         client_name, client_num_str = data.decode().split(',')
         client_number = int(client_num_str)
@@ -21,6 +40,7 @@ def handle_client(conn, addr):
 
         if not 1 <= client_number <= 100:
             print("Client number out of range. Server is shutting down.")
+            OUT_OF_RANGE.inc()
             conn.close()
             global running
             running = False
@@ -32,13 +52,16 @@ def handle_client(conn, addr):
         total_sum = client_number + SERVER_NUMBER
         print(f"Sum: {total_sum}")
 
-        response = f"{SERVER_NAME},{SERVER_NUMBER}"
-        conn.sendall(response.encode())
+        response = f"{SERVER_NAME},{SERVER_NUMBER}".encode()
+        conn.sendall(response)
+        BYTES_OUT.inc(len(response))
+        LATENCY.observe(time.perf_counter() - start)
     print(f"Connection with {addr} closed.")
 
 def start_server():
     global running
     running = True
+    metrics.start_from_env()
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_socket:
         server_socket.bind((HOST, PORT))
         server_socket.listen()
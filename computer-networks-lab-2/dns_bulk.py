@@ -0,0 +1,310 @@
+# dns_bulk.py
+import argparse
+import asyncio
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, replace
+
+import dns.asyncresolver
+import dns.exception
+import dns.rdatatype
+import dns.resolver
+
+DEFAULT_TYPES = ["A", "MX", "CNAME"]  # Same record types as dns_client.py
+DEFAULT_NEGATIVE_TTL = 300  # Used when a negative answer carries no SOA
+
+
+@dataclass
+class DNSResult:
+    """
+    The outcome of one (name, type) lookup.
+
+    Attributes:
+        name (str): The queried name.
+        rdtype (str): Record type, e.g. "A".
+        status (str): "NOERROR", "NODATA", "NXDOMAIN", "TIMEOUT" or "ERROR".
+        records (list): Record values as text (empty for negative answers).
+        ttl (int): Seconds the answer may be cached for.
+        cached (bool): True if served from the in-process cache.
+        ms (float): Lookup time in milliseconds.
+    """
+    name: str
+    rdtype: str
+    status: str
+    records: list
+    ttl: int
+    cached: bool = False
+    ms: float = 0.0
+
+
+class TTLCache:
+    """
+    In-process DNS cache that honours record TTLs.
+
+    Positive answers live for their TTL; NXDOMAIN/NODATA answers are cached
+    too (negative caching, RFC 2308) for the SOA minimum. Errors and
+    timeouts are never cached. Entries are returned with their TTL counted
+    down, like a real caching resolver would. When full, the least
+    recently used entry is evicted.
+    """
+
+    def __init__(self, max_entries=100_000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (name, rdtype) -> (expires_at, DNSResult)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, name: str, rdtype: str):
+        key = (name.lower(), rdtype)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires, result = entry
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return DNSResult(result.name, result.rdtype, result.status, result.records,
+                         int(remaining), cached=True)
+
+    def put(self, result: DNSResult):
+        if result.status in ("TIMEOUT", "ERROR") or result.ttl <= 0:
+            return
+        key = (result.name.lower(), result.rdtype)
+        self.entries[key] = (time.monotonic() + result.ttl, result)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+
+def negative_ttl(response) -> int:
+    """TTL for a negative answer: min(SOA TTL, SOA minimum), per RFC 2308."""
+    if response is not None:
+        for rrset in response.authority:
+            if rrset.rdtype == dns.rdatatype.SOA:
+                return min(rrset.ttl, rrset[0].minimum)
+    return DEFAULT_NEGATIVE_TTL
+
+
+class BulkResolver:
+    """
+    Resolves many names concurrently with dnspython's asyncio resolver.
+
+    At most `concurrency` queries are in flight at once, and every answer
+    (positive or negative) goes through a TTLCache so repeated names in a
+    list cost one query. Lookups of a name that is already in flight wait
+    for that query instead of sending their own.
+    """
+
+    def __init__(self, nameservers=None, port=53, concurrency=100, timeout=2.0,
+                 cache=None):
+        """
+        Args:
+            nameservers: List of server IPs (defaults to /etc/resolv.conf).
+            port: Server port.
+            concurrency: Maximum queries in flight.
+            timeout: Seconds per lookup, including retries.
+            cache: A TTLCache (a new one if None).
+        """
+        self.resolver = dns.asyncresolver.Resolver(configure=nameservers is None)
+        if nameservers is not None:
+            self.resolver.nameservers = list(nameservers)
+        self.resolver.port = port
+        self.resolver.lifetime = timeout
+        self.concurrency = concurrency
+        self.cache = cache if cache is not None else TTLCache()
+        self.inflight = {}  # (name, rdtype) -> Future of the DNSResult
+        self.coalesced = 0
+
+    async def resolve(self, name: str, rdtype: str) -> DNSResult:
+        """Looks up one record type for one name, using the cache first."""
+        cached = self.cache.get(name, rdtype)
+        if cached is not None:
+            return cached
+
+        key = (name.lower(), rdtype)
+        future = self.inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            start = time.perf_counter()
+            result = await asyncio.shield(future)
+            return replace(result, name=name, cached=True, ms=(time.perf_counter() - start) * 1000)
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            result = await self._lookup(name, rdtype)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved if nobody else was waiting
+            raise
+        finally:
+            del self.inflight[key]
+
+    async def _lookup(self, name: str, rdtype: str) -> DNSResult:
+        """(Private) One query to the nameservers; the result is cached."""
+        start = time.perf_counter()
+        try:
+            answer = await self.resolver.resolve(name, rdtype, raise_on_no_answer=False)
+            if answer.rrset is None:
+                result = DNSResult(name, rdtype, "NODATA", [], negative_ttl(answer.response))
+            else:
+                result = DNSResult(name, rdtype, "NOERROR",
+                                   [r.to_text() for r in answer.rrset], answer.rrset.ttl)
+        except dns.resolver.NXDOMAIN as e:
+            responses = e.kwargs.get("responses", {})
+            response = next(iter(responses.values()), None)
+            result = DNSResult(name, rdtype, "NXDOMAIN", [], negative_ttl(response))
+        except dns.exception.Timeout:
+            result = DNSResult(name, rdtype, "TIMEOUT", [], 0)
+        except dns.exception.DNSException:
+            result = DNSResult(name, rdtype, "ERROR", [], 0)
+        result.ms = (time.perf_counter() - start) * 1000
+        self.cache.put(result)
+        return result
+
+    async def resolve_many(self, names, rdtypes=DEFAULT_TYPES):
+        """
+        Resolves every (name, type) pair, yielding results as they finish.
+
+        Only `concurrency` worker tasks exist at a time, so memory stays flat
+        even for very long name lists (names may be a lazy iterator).
+        """
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        results = asyncio.Queue()
+        done = object()
+
+        async def producer():
+            try:
+                for name in names:
+                    name = name.strip()
+                    if name:
+                        for rdtype in rdtypes:
+                            await queue.put((name, rdtype))
+            except Exception as e:
+                await results.put(e)  # Reading names failed; re-raised below
+                return
+            for _ in range(self.concurrency):
+                await queue.put(done)
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is done:
+                    await results.put(done)
+                    return
+                try:
+                    result = await self.resolve(*item)
+                except Exception:
+                    # Every item must post a result, or the loop below waits forever
+                    result = DNSResult(*item, "ERROR", [], 0)
+                await results.put(result)
+
+        tasks = [asyncio.create_task(producer())]
+        tasks += [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        finished = 0
+        try:
+            while finished < self.concurrency:
+                item = await results.get()
+                if item is done:
+                    finished += 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+# --- Streamed output ---
+
+CSV_FIELDS = ["name", "rdtype", "status", "records", "ttl", "cached", "ms"]
+
+
+async def write_results(results, out, fmt="jsonl"):
+    """
+    Writes results to a file object as they arrive (one line each), so
+    nothing accumulates in memory.
+
+    Returns:
+        A dict of counts per status.
+    """
+    counts = {}
+    writer = csv.DictWriter(out, CSV_FIELDS) if fmt == "csv" else None
+    if writer:
+        writer.writeheader()
+    async for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+        row = asdict(result)
+        row["ms"] = round(row["ms"], 3)
+        if writer:
+            row["records"] = " ".join(row["records"])
+            writer.writerow(row)
+        else:
+            out.write(json.dumps(row) + "\n")
+    return counts
+
+
+async def run(names, args, out):
+    resolver = BulkResolver([args.nameserver] if args.nameserver else None, args.port,
+                            args.concurrency, args.timeout)
+    start = time.perf_counter()
+    counts = await write_results(resolver.resolve_many(names, args.types), out, args.format)
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print(f"{total} lookups in {elapsed:.2f} s ({total / elapsed:.0f}/s), "
+          f"cache hits {resolver.cache.hits}, coalesced {resolver.coalesced}, "
+          f"statuses {counts}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk DNS resolver (A/MX/CNAME by default)")
+    parser.add_argument("input", nargs="?", help="file with one domain per line (default: stdin)")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("-f", "--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("-t", "--types", default=",".join(DEFAULT_TYPES),
+                        type=lambda s: s.upper().split(","))
+    parser.add_argument("-c", "--concurrency", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=2.0)
+    parser.add_argument("--nameserver", help="server IP (default: system resolver)")
+    parser.add_argument("--port", type=int, default=53)
+    parser.add_argument("--demo", action="store_true",
+                        help="resolve a synthetic list against a local stand-in server")
+    args = parser.parse_args()
+
+    if args.demo:
+        from dns_stub_server import StubDNSServer, ZONE_ORIGIN
+        server = StubDNSServer().start()
+        args.nameserver, args.port = server.address
+        # 5000 names with repeats and some that do not exist
+        names = [f"host{i % 1200}.{ZONE_ORIGIN}" for i in range(5000)]
+        out = open(args.output if args.output else os.devnull, "w", newline="")
+        with out:
+            asyncio.run(run(names, args, out))
+        print(f"Stand-in server answered {server.queries} queries", file=sys.stderr)
+        server.stop()
+        return
+
+    with contextlib.ExitStack() as stack:
+        # Only close what was opened here, never sys.stdin or sys.stdout
+        names = stack.enter_context(open(args.input)) if args.input else sys.stdin
+        out = stack.enter_context(open(args.output, "w", newline="")) if args.output else sys.stdout
+        asyncio.run(run(names, args, out))
+
+
+if __name__ == "__main__":
+    main()
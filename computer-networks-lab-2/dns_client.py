@@ -1,4 +1,5 @@
 # dns_client.py
+# For resolving many domains at once, see dns_bulk.py
 import dns.resolver
 
 def main():
@@ -28,7 +29,7 @@ def main():
                     line = f"CNAME record: {cname}\n"
                     print(line.strip())
                     f.write(line)
-            except:
+            except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
                 print("No CNAME record found.")
 
         print(f"\nResults saved to {log_file}")
@@ -0,0 +1,450 @@
+# dns_forwarder.py
+import argparse
+import asyncio
+import random
+import struct
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import dns.asyncquery
+import dns.exception
+import dns.flags
+import dns.message
+import dns.rcode
+
+from dns_bulk import negative_ttl
+
+PREFETCH_FRACTION = 0.1  # Refresh hot records in the last 10% of their TTL
+PREFETCH_MIN_HITS = 3    # ...if they were asked for at least this often
+UDP_PAYLOAD = 512        # Largest UDP reply to a query without EDNS (RFC 1035)
+
+
+@dataclass
+class CacheEntry:
+    """
+    One cached upstream response.
+
+    Attributes:
+        response (dns.message.Message): The upstream reply.
+        stored_at (float): time.monotonic() when it was cached.
+        ttl (int): Lifetime in seconds (smallest TTL in the reply).
+        hits (int): Times it was served since it was stored.
+        prefetching (bool): A refresh is already in flight.
+        rendered (tuple): (shape, reply wire) reused for every hit with
+            the same shape, so hits skip building a Message. The shape is
+            the TTL age in seconds, the transport, and the query's flags
+            and EDNS bytes, which is everything the reply depends on
+            besides the id and question.
+    """
+    response: dns.message.Message
+    stored_at: float
+    ttl: int
+    hits: int = 0
+    prefetching: bool = False
+    rendered: tuple = None
+
+
+def response_ttl(response: dns.message.Message) -> int:
+    """How long a reply may be cached: its smallest answer TTL, or the
+    negative TTL from the SOA for NXDOMAIN/NODATA replies."""
+    if response.rcode() not in (dns.rcode.NOERROR, dns.rcode.NXDOMAIN):
+        return 0  # SERVFAIL, REFUSED, ... are not cached
+    if response.answer:
+        return min(rrset.ttl for rrset in response.answer)
+    return negative_ttl(response)
+
+
+class ForwarderCache:
+    """
+    LRU-bounded cache of upstream responses keyed by question.
+
+    TTLs decay: a reply served 100 s after it was cached has 100 s less on
+    every record, so downstream caches never hold data longer than the
+    upstream allowed.
+    """
+
+    def __init__(self, max_entries=10_000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (qname, rdtype, rdclass) -> CacheEntry
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Returns (entry, remaining_seconds) or None when absent/expired."""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        remaining = entry.ttl - (time.monotonic() - entry.stored_at)
+        if remaining <= 0:
+            del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        entry.hits += 1
+        self.hits += 1
+        return entry, remaining
+
+    def put(self, key, response: dns.message.Message):
+        ttl = response_ttl(response)
+        if ttl <= 0:
+            return
+        self.entries[key] = CacheEntry(response, time.monotonic(), ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+
+def parse_question(wire: bytes):
+    """
+    Reads the question straight from the wire without building a Message.
+
+    Returns:
+        ((qname, qtype, qclass), end_offset) where qname is lower-case text
+        with a trailing dot, or None for anything unusual (more than one
+        question, compression pointers, truncated data).
+    """
+    try:
+        if wire[4:6] != b"\x00\x01":
+            return None
+        pos = 12
+        labels = []
+        while wire[pos]:
+            length = wire[pos]
+            if length & 0xC0:
+                return None
+            labels.append(wire[pos + 1:pos + 1 + length])
+            pos += 1 + length
+        qtype, qclass = struct.unpack_from("!HH", wire, pos + 1)
+    except (IndexError, struct.error):
+        return None
+    name = b".".join(labels).decode("ascii", "backslashreplace").lower() + "."
+    return (name if labels else ".", qtype, qclass), pos + 5
+
+
+def _decayed_reply(query: dns.message.Message, entry: CacheEntry, remaining: float):
+    """Copies a cached reply for this query with TTLs counted down."""
+    reply = dns.message.make_response(query)
+    reply.set_rcode(entry.response.rcode())
+    elapsed = entry.ttl - int(remaining)
+    for section in ("answer", "authority", "additional"):
+        target = getattr(reply, section)
+        for rrset in getattr(entry.response, section):
+            copy = rrset.copy()
+            copy.ttl = max(0, rrset.ttl - elapsed)
+            target.append(copy)
+    return reply
+
+
+def reply_wire(reply: dns.message.Message, query: dns.message.Message, udp: bool) -> bytes:
+    """
+    Renders a reply. Over UDP, one larger than the client accepts (512
+    bytes, or its EDNS payload size) is sent empty with TC set, so the
+    client retries over TCP.
+    """
+    if not udp:
+        return reply.to_wire()
+    limit = max(UDP_PAYLOAD, query.payload) if query.edns >= 0 else UDP_PAYLOAD
+    try:
+        return reply.to_wire(max_size=limit)
+    except dns.exception.TooBig:
+        reply.flags |= dns.flags.TC
+        reply.answer, reply.authority, reply.additional = [], [], []
+        return reply.to_wire()
+
+
+class DNSForwarder:
+    """
+    Caching DNS forwarder.
+
+    Answers from the cache when it can, forwards misses to the upstream
+    server, and collapses identical queries that arrive while a lookup is
+    already in flight into that one upstream query.
+    """
+
+    def __init__(self, upstream=("127.0.0.1", 53), cache=None, timeout=2.0):
+        """
+        Args:
+            upstream: (ip, port) of the server to forward misses to.
+            cache: A ForwarderCache (a new one if None).
+            timeout: Seconds to wait for the upstream.
+        """
+        self.upstream = upstream
+        self.cache = cache if cache is not None else ForwarderCache()
+        self.timeout = timeout
+        self.inflight = {}  # key -> asyncio.Future of the upstream reply
+        self.upstream_queries = 0
+        self.coalesced = 0
+        self.prefetches = 0
+        self.tasks = set()  # Background tasks, referenced until they finish
+
+    def _spawn(self, coro):
+        """(Private) Runs a coroutine in the background without letting it be garbage-collected."""
+        task = asyncio.get_running_loop().create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def handle(self, wire: bytes, udp: bool = False) -> bytes:
+        """
+        Answers one wire-format query with a wire-format reply. Pass
+        udp=True for queries that arrived over UDP, so oversized replies
+        are truncated.
+        """
+        parsed = parse_question(wire)
+        if parsed is not None:
+            key, question_end = parsed
+            cached = self.cache.get(key)
+            if cached is not None:
+                return self._cached_reply(wire, udp, key, question_end, *cached)
+
+        try:
+            query = dns.message.from_wire(wire)
+        except dns.exception.DNSException:
+            return b""
+        if len(query.question) != 1 or parsed is None:
+            reply = dns.message.make_response(query)
+            reply.set_rcode(dns.rcode.FORMERR)
+            return reply.to_wire()
+
+        try:
+            upstream_reply = await self._fetch(key, query)
+        except (dns.exception.DNSException, OSError):
+            reply = dns.message.make_response(query)
+            reply.set_rcode(dns.rcode.SERVFAIL)
+            return reply.to_wire()
+        reply = dns.message.make_response(query)
+        reply.set_rcode(upstream_reply.rcode())
+        reply.answer = upstream_reply.answer
+        reply.authority = upstream_reply.authority
+        reply.additional = upstream_reply.additional
+        return reply_wire(reply, query, udp)
+
+    def _cached_reply(self, wire, udp, key, question_end, entry: CacheEntry, remaining: float):
+        """
+        (Private) Serves a cache hit.
+
+        The reply is rendered from the cached Message for this query's
+        flags, EDNS options and transport, at most once per second of TTL
+        decay; hits with the same shape copy those bytes and patch in the
+        query's id and question (which may differ in letter case).
+        """
+        shape = (entry.ttl - int(remaining), udp, wire[2:4], wire[question_end:])
+        if entry.rendered is None or entry.rendered[0] != shape:
+            query = dns.message.from_wire(wire)
+            entry.rendered = (shape, reply_wire(_decayed_reply(query, entry, remaining), query, udp))
+            self._maybe_prefetch(key, query, entry, remaining)
+        reply = bytearray(entry.rendered[1])
+        reply[0:2] = wire[0:2]
+        reply[12:question_end] = wire[12:question_end]
+        return bytes(reply)
+
+    async def _fetch(self, key, query):
+        """(Private) One upstream lookup per key, shared by every waiter."""
+        future = self.inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            upstream_query = dns.message.make_query(query.question[0].name,
+                                                    query.question[0].rdtype,
+                                                    query.question[0].rdclass)
+            self.upstream_queries += 1
+            reply, _ = await dns.asyncquery.udp_with_fallback(
+                upstream_query, self.upstream[0], timeout=self.timeout, port=self.upstream[1])
+            self.cache.put(key, reply)
+            future.set_result(reply)
+            return reply
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved if nobody else was waiting
+            raise
+        finally:
+            del self.inflight[key]
+
+    def _maybe_prefetch(self, key, query, entry: CacheEntry, remaining: float):
+        """(Private) Refreshes a hot entry in the background before it expires."""
+        if (entry.prefetching or entry.hits < PREFETCH_MIN_HITS
+                or remaining > entry.ttl * PREFETCH_FRACTION or key in self.inflight):
+            return
+        entry.prefetching = True
+        self.prefetches += 1
+
+        async def refresh():
+            try:
+                await self._fetch(key, query)
+            except (dns.exception.DNSException, OSError):
+                entry.prefetching = False  # Let a later hit try again
+
+        self._spawn(refresh())
+
+    # --- Listeners ---
+
+    async def start(self, host="127.0.0.1", port=5300):
+        """Starts UDP and TCP listeners. Returns the bound (host, port)."""
+        loop = asyncio.get_running_loop()
+        forwarder = self
+
+        class UDPProtocol(asyncio.DatagramProtocol):
+            def connection_made(self, transport):
+                self.transport = transport
+
+            def datagram_received(self, data, addr):
+                async def respond():
+                    reply = await forwarder.handle(data, udp=True)
+                    if reply:
+                        self.transport.sendto(reply, addr)
+                forwarder._spawn(respond())
+
+        self.udp_transport, _ = await loop.create_datagram_endpoint(
+            UDPProtocol, local_addr=(host, port))
+        address = self.udp_transport.get_extra_info("sockname")
+
+        async def tcp_client(reader, writer):
+            # DNS over TCP: every message has a 2-byte length prefix
+            try:
+                while True:
+                    (length,) = struct.unpack("!H", await reader.readexactly(2))
+                    reply = await forwarder.handle(await reader.readexactly(length))
+                    writer.write(struct.pack("!H", len(reply)) + reply)
+                    await writer.drain()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+
+        self.tcp_server = await asyncio.start_server(tcp_client, address[0], address[1])
+        return address
+
+    def close(self):
+        self.udp_transport.close()
+        self.tcp_server.close()
+
+
+# --- Query-replay benchmark ---
+
+def zipf_names(count, distinct, s=1.1, seed=0, origin="example.test."):
+    """Query names with a Zipf popularity distribution, like real traffic."""
+    rng = random.Random(seed)
+    weights = [1 / (rank ** s) for rank in range(1, distinct + 1)]
+    picks = rng.choices(range(distinct), weights=weights, k=count)
+    return [f"host{i}.{origin}" for i in picks]
+
+
+async def replay(server, names, concurrency=200, timeout=2.0):
+    """
+    Sends the queries to a server over one UDP socket, keeping up to
+    `concurrency` outstanding and matching replies by message id.
+
+    Returns:
+        A dict with QPS, latency percentiles (ms) and the failure count.
+    """
+    loop = asyncio.get_running_loop()
+    waiting = {}  # message id -> future
+
+    class ReplayProtocol(asyncio.DatagramProtocol):
+        def datagram_received(self, data, addr):
+            (msg_id,) = struct.unpack_from("!H", data)
+            future = waiting.pop(msg_id, None)
+            if future is not None and not future.done():
+                future.set_result(data)
+
+    transport, _ = await loop.create_datagram_endpoint(ReplayProtocol, remote_addr=server)
+    wires = [dns.message.make_query(name, "A").to_wire() for name in names]
+    latencies = []
+    failures = 0
+    next_index = 0
+
+    async def client(slot):
+        nonlocal failures, next_index
+        msg_id = slot
+        while next_index < len(wires):
+            wire = bytearray(wires[next_index])
+            next_index += 1
+            struct.pack_into("!H", wire, 0, msg_id)
+            future = waiting[msg_id] = loop.create_future()
+            start = time.perf_counter()
+            transport.sendto(bytes(wire))
+            try:
+                await asyncio.wait_for(future, timeout)
+                latencies.append((time.perf_counter() - start) * 1000)
+            except asyncio.TimeoutError:
+                waiting.pop(msg_id, None)
+                failures += 1
+            msg_id = (msg_id + concurrency) & 0xFFFF  # Ids stay unique per slot
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(slot) for slot in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    transport.close()
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else 0.0
+
+    return {"qps": len(latencies) / elapsed, "p50_ms": pct(0.50), "p99_ms": pct(0.99),
+            "failures": failures}
+
+
+async def benchmark(queries=20_000, distinct=2_000, upstream_delay=0.005, concurrency=200):
+    from dns_stub_server import StubDNSServer, make_zone
+
+    upstream = StubDNSServer(make_zone(distinct), delay=upstream_delay).start()
+    names = zipf_names(queries, distinct)
+    try:
+        print(f"--- Replaying {queries} Zipf-distributed queries over {distinct} names "
+              f"(upstream delay {upstream_delay * 1000:.0f} ms) ---")
+        direct = await replay(upstream.address, names, concurrency)
+        print(f"  direct to upstream: {direct['qps']:8.0f} QPS | p50 {direct['p50_ms']:6.2f} ms | "
+              f"p99 {direct['p99_ms']:6.2f} ms | failures {direct['failures']}")
+
+        forwarder = DNSForwarder(upstream.address)
+        address = await forwarder.start(port=0)
+        before = upstream.queries
+        cached = await replay(address, names, concurrency)
+        forwarder.close()
+        print(f"  via forwarder:      {cached['qps']:8.0f} QPS | p50 {cached['p50_ms']:6.2f} ms | "
+              f"p99 {cached['p99_ms']:6.2f} ms | failures {cached['failures']}")
+        c = forwarder.cache
+        print(f"  cache hits {c.hits}, misses {c.misses}, coalesced {forwarder.coalesced}, "
+              f"upstream queries {upstream.queries - before}")
+    finally:
+        upstream.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Caching DNS forwarder")
+    parser.add_argument("--listen", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5300)
+    parser.add_argument("--upstream", default="8.8.8.8")
+    parser.add_argument("--upstream-port", type=int, default=53)
+    parser.add_argument("--cache-size", type=int, default=10_000)
+    parser.add_argument("--benchmark", action="store_true",
+                        help="replay queries against a local stand-in upstream and exit")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        asyncio.run(benchmark())
+        return
+
+    async def serve():
+        forwarder = DNSForwarder((args.upstream, args.upstream_port),
+                                 ForwarderCache(args.cache_size))
+        host, port = await forwarder.start(args.listen, args.port)
+        print(f"Forwarding {host}:{port} -> {args.upstream}:{args.upstream_port} (Ctrl+C to stop)")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
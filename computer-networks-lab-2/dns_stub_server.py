@@ -0,0 +1,170 @@
+# dns_stub_server.py
+import errno
+import socketserver
+import struct
+import threading
+import time
+
+import dns.flags
+import dns.message
+import dns.rcode
+import dns.rdataclass
+import dns.rdatatype
+import dns.rrset
+
+ZONE_ORIGIN = "example.test."
+NEGATIVE_TTL = 60  # SOA minimum, used by resolvers for negative caching
+
+
+def make_zone(hosts=1000, ttl=300, origin=ZONE_ORIGIN):
+    """
+    Builds a synthetic zone for tests and benchmarks.
+
+    Every hostN gets an A record; every tenth name also has MX records,
+    and aliasN is a CNAME to hostN.
+
+    Returns:
+        A dict {(name, rdtype): (ttl, [rdata text, ...])}.
+    """
+    zone = {}
+    for i in range(hosts):
+        zone[(f"host{i}.{origin}", "A")] = (ttl, [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"])
+        zone[(f"alias{i}.{origin}", "CNAME")] = (ttl, [f"host{i}.{origin}"])
+        if i % 10 == 0:
+            zone[(f"host{i}.{origin}", "MX")] = (ttl, [f"10 mail{i}.{origin}"])
+    return zone
+
+
+class _UDPServer(socketserver.ThreadingUDPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class StubDNSServer:
+    """
+    A tiny authoritative DNS server for loopback testing.
+
+    Answers from an in-memory zone over UDP and TCP. Unknown names get
+    NXDOMAIN and known names without the asked type get an empty NOERROR
+    answer; both carry an SOA in the authority section so resolvers can
+    cache the negative result. An optional delay stands in for the round
+    trip to a real upstream server.
+    """
+
+    def __init__(self, zone=None, host="127.0.0.1", port=0, delay=0.0, origin=ZONE_ORIGIN):
+        """
+        Args:
+            zone: Dict {(name, rdtype): (ttl, [rdata text])}, see make_zone().
+            host, port: Address to listen on (port 0 picks a free port).
+            delay: Seconds to wait before answering each query.
+            origin: Zone apex, used for the SOA record.
+        """
+        zone = zone if zone is not None else make_zone()
+        # DNS names are case-insensitive; look everything up in lower case
+        self.zone = {(name.lower(), rdtype): value for (name, rdtype), value in zone.items()}
+        self.names = {name for name, _ in self.zone}
+        self.delay = delay
+        self.origin = origin
+        self.queries = 0
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class UDPHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                data, sock = self.request
+                reply = stub.answer(data)
+                if reply:
+                    sock.sendto(reply, self.client_address)
+
+        class TCPHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                # DNS over TCP: each message is prefixed with a 2-byte length
+                while True:
+                    header = self.request.recv(2)
+                    if len(header) < 2:
+                        return
+                    (length,) = struct.unpack("!H", header)
+                    data = b""
+                    while len(data) < length:
+                        chunk = self.request.recv(length - len(data))
+                        if not chunk:
+                            return
+                        data += chunk
+                    reply = stub.answer(data)
+                    self.request.sendall(struct.pack("!H", len(reply)) + reply)
+
+        self.tcp, self.udp = self._bind(host, port, TCPHandler, UDPHandler)
+        self.address = self.udp.server_address
+
+    @staticmethod
+    def _bind(host, port, tcp_handler, udp_handler, attempts=20):
+        """
+        (Private) Binds TCP and UDP servers to the same port. With port 0,
+        TCP picks a free port first and UDP takes the same number; if that
+        UDP port is already in use, both start over on a fresh port.
+        """
+        for _ in range(attempts):
+            tcp = _TCPServer((host, port), tcp_handler)
+            try:
+                return tcp, _UDPServer(tcp.server_address, udp_handler)
+            except OSError as e:
+                tcp.server_close()
+                if port or e.errno != errno.EADDRINUSE:
+                    raise
+        raise OSError(errno.EADDRINUSE, "no port free for both TCP and UDP")
+
+    def answer(self, data: bytes) -> bytes:
+        """Builds the wire-format reply for one wire-format query."""
+        with self._lock:
+            self.queries += 1
+        if self.delay:
+            time.sleep(self.delay)
+        try:
+            query = dns.message.from_wire(data)
+        except Exception:
+            return b""
+        response = dns.message.make_response(query)
+        response.flags |= dns.flags.AA
+        question = query.question[0]
+        name = question.name.to_text().lower()
+        rdtype = dns.rdatatype.to_text(question.rdtype)
+
+        if (name, rdtype) in self.zone:
+            ttl, values = self.zone[(name, rdtype)]
+            response.answer.append(dns.rrset.from_text_list(
+                question.name, ttl, dns.rdataclass.IN, rdtype, values))
+        else:
+            if name not in self.names:
+                response.set_rcode(dns.rcode.NXDOMAIN)
+            soa = f"ns.{self.origin} admin.{self.origin} 1 3600 600 86400 {NEGATIVE_TTL}"
+            response.authority.append(dns.rrset.from_text(
+                self.origin, NEGATIVE_TTL, dns.rdataclass.IN, "SOA", soa))
+        return response.to_wire()
+
+    def start(self):
+        """Serves UDP and TCP in background threads. Returns self."""
+        for server in (self.udp, self.tcp):
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        for server in (self.udp, self.tcp):
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    server = StubDNSServer(port=5353).start()
+    print(f"Stub DNS server for {ZONE_ORIGIN} on {server.address[0]}:{server.address[1]} "
+          f"(try: dig @127.0.0.1 -p 5353 host1.{ZONE_ORIGIN})")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
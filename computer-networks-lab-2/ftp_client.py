@@ -8,16 +8,16 @@ from pyftpdlib.authorizers import DummyAuthorizer
 from pyftpdlib.handlers import FTPHandler
 
 
-def start_ftp_server():
+def start_ftp_server(host="127.0.0.1", port=2121, root=None):
     """Start a local FTP server in a separate thread."""
     authorizer = DummyAuthorizer()
     # Allow user 'user' with password '12345' full read/write in current dir
-    authorizer.add_user("user", "12345", os.getcwd(), perm="elradfmwMT")
+    authorizer.add_user("user", "12345", root or os.getcwd(), perm="elradfmwMT")
 
     handler = FTPHandler
     handler.authorizer = authorizer
 
-    server = FTPServer(("127.0.0.1", 2121), handler)
+    server = FTPServer((host, port), handler)
     server.serve_forever()
 
 
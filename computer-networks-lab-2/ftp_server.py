@@ -0,0 +1,294 @@
+# ftp_server.py
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from ftplib import FTP, all_errors
+
+from pyftpdlib.authorizers import DummyAuthorizer
+from pyftpdlib.handlers import FTPHandler, DTPHandler, ThrottledDTPHandler
+from pyftpdlib.servers import FTPServer, ThreadedFTPServer
+
+try:
+    from pyftpdlib.servers import MultiprocessFTPServer
+except ImportError:  # Not available on Windows
+    MultiprocessFTPServer = None
+
+# "single":  one process, one asynchronous IO loop (what start_ftp_server uses)
+# "prefork": N copies of the IO loop in forked processes sharing the socket
+# "thread":  one thread per session, so a slow session does not block others
+# "process": one process per session, for CPU-heavy sessions
+SERVER_MODES = ["single", "prefork", "thread", "process"]
+
+BUFFER_SIZE = 256 * 1024  # pyftpdlib's default data buffers are 64 KiB
+
+
+class TokenBucket:
+    """
+    Bytes-per-second budget shared by every data channel of one user.
+
+    charge() takes bytes out (the balance may go negative) and returns how
+    long the caller should pause so the user as a whole stays at `rate`.
+    """
+
+    def __init__(self, rate, burst=0.25):
+        self.rate = rate
+        self.capacity = rate * burst  # At most `burst` seconds worth of credit
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()  # "thread" mode runs channels in parallel
+
+    def charge(self, nbytes):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= nbytes
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class PerUserThrottledDTPHandler(ThrottledDTPHandler):
+    """
+    ThrottledDTPHandler whose limits come from the logged-in user.
+
+    The stock handler applies one read/write limit to each data connection.
+    Here the limits are looked up in `user_limits`, and every connection of
+    a user draws from the same TokenBucket, so four parallel transfers of a
+    256 KiB/s user share 256 KiB/s. Users without an entry are not
+    throttled and keep using sendfile(). Buckets live in the server
+    process, so "prefork" and "process" modes enforce the limit per process.
+    """
+
+    user_limits = {}  # username -> (read_limit, write_limit) in bytes/sec
+    buckets = {}  # (username, "read" or "write") -> TokenBucket
+    buckets_lock = threading.Lock()
+
+    def __init__(self, sock, cmd_channel):
+        # Instance attributes shadow the class-wide limits before the parent
+        # sizes its buffers from them
+        self.read_limit, self.write_limit = self.user_limits.get(cmd_channel.username, (0, 0))
+        super().__init__(sock, cmd_channel)
+
+    def use_sendfile(self):
+        if self.read_limit or self.write_limit:
+            return False
+        return DTPHandler.use_sendfile(self)
+
+    def _bucket(self, direction, limit):
+        key = (self.cmd_channel.username, direction)
+        with self.buckets_lock:
+            bucket = self.buckets.get(key)
+            if bucket is None or bucket.rate != limit:
+                bucket = self.buckets[key] = TokenBucket(limit)
+            return bucket
+
+    def recv(self, buffer_size):
+        chunk = DTPHandler.recv(self, buffer_size)
+        if self.read_limit:
+            self._pause(self._bucket("read", self.read_limit).charge(len(chunk)))
+        return chunk
+
+    def send(self, data):
+        num_sent = DTPHandler.send(self, data)
+        if self.write_limit:
+            self._pause(self._bucket("write", self.write_limit).charge(num_sent))
+        return num_sent
+
+    def _pause(self, seconds):
+        """(Private) Takes the channel off the IO loop for `seconds`, as the parent's throttle does."""
+        if seconds <= 0 or self._throttler is not None:
+            return  # Nothing owed, or already paused
+
+        def unsleep():
+            self._throttler = None
+            self.add_channel(events=self.ioloop.READ if self.receive else self.ioloop.WRITE)
+
+        self.del_channel()
+        self._throttler = self.ioloop.call_later(seconds, unsleep, _errback=self.handle_error)
+
+
+def make_ftp_server(host="127.0.0.1", port=2121, root=None, mode="single",
+                    users=None, user_limits=None, use_sendfile=True,
+                    buffer_size=BUFFER_SIZE, max_cons=1024, max_cons_per_ip=0):
+    """
+    Builds a configured pyftpdlib server without starting it.
+
+    Args:
+        host, port: Address to listen on.
+        root: Home directory for every user (defaults to the current dir).
+        mode: One of SERVER_MODES.
+        users: Dict username -> password (defaults to the lab's user/12345).
+        user_limits: Dict username -> (read_limit, write_limit) in bytes/sec.
+        use_sendfile: Serve RETR with os.sendfile() (zero-copy) when possible.
+        buffer_size: Data connection buffer size in bytes.
+        max_cons, max_cons_per_ip: Connection limits (0 = unlimited).
+
+    Returns:
+        The server; call serve_forever() on it (see start_server()).
+    """
+    if mode not in SERVER_MODES:
+        raise ValueError(f"mode must be one of {SERVER_MODES}")
+    if mode == "process" and MultiprocessFTPServer is None:
+        raise ValueError("MultiprocessFTPServer is not available on this platform")
+
+    authorizer = DummyAuthorizer()
+    for user, password in (users or {"user": "12345"}).items():
+        authorizer.add_user(user, password, root or os.getcwd(), perm="elradfmwMT")
+
+    # Fresh subclasses so these settings do not leak into the shared
+    # FTPHandler class that ftp_client.start_ftp_server() configures
+    dtp_handler = type("DTPHandler", (PerUserThrottledDTPHandler,), {
+        "user_limits": dict(user_limits or {}),
+        "buckets": {},
+        "ac_in_buffer_size": buffer_size,
+        "ac_out_buffer_size": buffer_size,
+    })
+    handler = type("FTPHandler", (FTPHandler,), {
+        "authorizer": authorizer,
+        "dtp_handler": dtp_handler,
+        "use_sendfile": use_sendfile and hasattr(os, "sendfile"),
+        "banner": f"pyftpdlib ({mode}) ready.",
+    })
+
+    server_class = {
+        "single": FTPServer,
+        "prefork": FTPServer,
+        "thread": ThreadedFTPServer,
+        "process": MultiprocessFTPServer,
+    }[mode]
+    server = server_class((host, port), handler, backlog=max(100, max_cons // 2))
+    server.max_cons = max_cons
+    server.max_cons_per_ip = max_cons_per_ip
+    return server
+
+
+def start_server(mode="single", workers=None, **kwargs):
+    """
+    Builds and runs a server until interrupted (blocking).
+
+    Args:
+        mode: One of SERVER_MODES.
+        workers: Processes for "prefork" mode (defaults to the CPU count).
+        **kwargs: Passed on to make_ftp_server().
+    """
+    server = make_ftp_server(mode=mode, **kwargs)
+    if mode == "prefork":
+        server.serve_forever(worker_processes=workers or os.cpu_count())
+    else:
+        server.serve_forever()
+
+
+# --- Load generator ---
+
+def run_load(host="127.0.0.1", port=2121, sessions=200, transfers=5,
+             filename="load_test.bin", user="user", passwd="12345", timeout=60):
+    """
+    Opens many concurrent sessions that each download a file repeatedly.
+
+    Args:
+        sessions: Number of simultaneous FTP sessions (one thread each).
+        transfers: RETR commands per session.
+        filename: File to download (must exist in the server root).
+
+    Returns:
+        A dict with transfers/sec, aggregate MB/s, average login time and
+        the number of failed sessions.
+    """
+    lock = threading.Lock()
+    totals = {"transfers": 0, "bytes": 0, "errors": 0, "login": 0.0}
+    start_barrier = threading.Barrier(sessions + 1)
+
+    def session():
+        received = 0
+
+        def count(block):
+            nonlocal received
+            received += len(block)
+
+        done = 0
+        try:
+            start_barrier.wait()
+            t0 = time.perf_counter()
+            ftp = FTP(timeout=timeout)
+            ftp.connect(host, port)
+            ftp.login(user, passwd)
+            login = time.perf_counter() - t0
+            for _ in range(transfers):
+                ftp.retrbinary(f"RETR {filename}", count, 256 * 1024)
+                done += 1
+            ftp.quit()
+            errors = 0
+        except (*all_errors, EOFError, threading.BrokenBarrierError):
+            login, errors = 0.0, 1
+        with lock:
+            totals["transfers"] += done
+            totals["bytes"] += received
+            totals["errors"] += errors
+            totals["login"] += login
+
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    for t in threads:
+        t.start()
+    start_barrier.wait()  # Release every session at once
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    ok = sessions - totals["errors"]
+    return {
+        "sessions": sessions,
+        "failed_sessions": totals["errors"],
+        "transfers_per_sec": totals["transfers"] / elapsed,
+        "mb_per_sec": totals["bytes"] / elapsed / 1e6,
+        "avg_login_ms": totals["login"] / ok * 1000 if ok else 0.0,
+        "seconds": elapsed,
+    }
+
+
+def main():
+    file_size = 1024 * 1024
+    with tempfile.TemporaryDirectory() as root:
+        with open(os.path.join(root, "load_test.bin"), "wb") as f:
+            f.write(os.urandom(file_size))
+
+        print(f"--- FTP load test: 200 sessions x 5 RETR of a {file_size // 1024} KiB file ---")
+        for port, mode in enumerate(SERVER_MODES, start=2131):
+            if mode == "process" and MultiprocessFTPServer is None:
+                continue
+            # Run each server in its own process so the load generator's
+            # threads do not compete with it for the GIL. Not a daemon
+            # process: the "process" mode needs to spawn children.
+            proc = multiprocessing.Process(target=start_server,
+                                           kwargs={"mode": mode, "port": port, "root": root})
+            proc.start()
+            time.sleep(1)
+            try:
+                result = run_load(port=port)
+            finally:
+                proc.terminate()
+                proc.join()
+            print(f"{mode:>8}: {result['transfers_per_sec']:8.1f} transfers/s | "
+                  f"{result['mb_per_sec']:8.1f} MB/s | "
+                  f"login {result['avg_login_ms']:7.1f} ms | "
+                  f"failed sessions {result['failed_sessions']}")
+
+        print("\n--- Per-user throttling: 'slow' is limited to 1 MiB/s across all its sessions ---")
+        kwargs = {"mode": "single", "port": 2140, "root": root,
+                  "users": {"user": "12345", "slow": "12345"},
+                  "user_limits": {"slow": (0, 1024 * 1024)}}
+        proc = multiprocessing.Process(target=start_server, kwargs=kwargs)
+        proc.start()
+        time.sleep(1)
+        try:
+            for user in ("user", "slow"):
+                result = run_load(port=2140, sessions=4, transfers=1, user=user)
+                print(f"{user:>8}: {result['mb_per_sec']:8.1f} MB/s aggregate over 4 sessions")
+        finally:
+            proc.terminate()
+            proc.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,442 @@
+# ftp_transfer.py
+import hashlib
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from ftplib import FTP, all_errors, error_perm, error_reply, error_temp
+
+DEFAULT_BLOCKSIZE = 256 * 1024  # ftplib's default is 8 KiB
+BLOCKSIZE_CANDIDATES = [8 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024]
+RESUME_CHECK_BYTES = 64 * 1024  # Compared across both ends before resuming
+VERIFY_MODES = (None, "size", "sha256")
+
+
+@dataclass
+class TransferJob:
+    """
+    One file to move.
+
+    Attributes:
+        direction (str): "upload" or "download".
+        local_path (str): Path on this machine.
+        remote_path (str): Path on the FTP server.
+        size (int): File size in bytes (0 if not known yet).
+    """
+    direction: str
+    local_path: str
+    remote_path: str
+    size: int = 0
+
+
+@dataclass
+class TransferResult:
+    """
+    Outcome of a TransferJob.
+
+    Attributes:
+        job (TransferJob): The job that was run.
+        ok (bool): True if the transfer (and verification, if on) succeeded.
+        bytes_sent (int): Bytes moved over the data connection this time.
+        resumed_from (int): Offset the transfer restarted at (0 = from start).
+        seconds (float): Wall time spent on the job, including retries.
+        sha256 (str): Hex digest of the complete file.
+        error (str): Last error message, if any.
+    """
+    job: TransferJob
+    ok: bool
+    bytes_sent: int = 0
+    resumed_from: int = 0
+    seconds: float = 0.0
+    sha256: str = ""
+    error: str = ""
+
+
+def _hash_file(path: str, limit: int | None = None, blocksize: int = DEFAULT_BLOCKSIZE):
+    """Returns a sha256 object fed with the first `limit` bytes of a file."""
+    digest = hashlib.sha256()
+    remaining = limit
+    with open(path, "rb") as f:
+        while remaining is None or remaining > 0:
+            block = f.read(blocksize if remaining is None else min(blocksize, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest
+
+
+class FTPTransferEngine:
+    """
+    Moves many files in parallel over a pool of FTP sessions.
+
+    Each worker thread owns one logged-in FTP connection and pulls jobs from
+    a shared queue. Interrupted transfers are resumed with REST from the
+    size already present on the destination, once the last bytes before
+    that offset are confirmed to match on both ends, and every file is
+    hashed while it streams so integrity can be checked without a second
+    local pass.
+    """
+
+    def __init__(self, host="127.0.0.1", port=2121, user="user", passwd="12345",
+                 workers=4, blocksize=DEFAULT_BLOCKSIZE, retries=3, verify="size",
+                 timeout=30):
+        """
+        Args:
+            host, port, user, passwd: FTP server and credentials.
+            workers: Number of parallel FTP sessions.
+            blocksize: Bytes per read/write on the data connection.
+            retries: Reconnect-and-resume attempts per file after an error.
+            verify: How to check each finished file. "size" compares SIZE
+                with the local size (one command). "sha256" hashes the
+                remote copy with RETR; this costs one extra download per
+                file, so it is opt-in. None skips the check.
+            timeout: Socket timeout in seconds.
+        """
+        if verify not in VERIFY_MODES:
+            raise ValueError(f"verify must be one of {VERIFY_MODES}")
+        self.host = host
+        self.port = port
+        self.user = user
+        self.passwd = passwd
+        self.workers = workers
+        self.blocksize = blocksize
+        self.retries = retries
+        self.verify = verify
+        self.timeout = timeout
+
+    def connect(self) -> FTP:
+        """Opens one logged-in session in binary mode."""
+        ftp = FTP(timeout=self.timeout)
+        ftp.connect(self.host, self.port)
+        ftp.login(user=self.user, passwd=self.passwd)
+        ftp.voidcmd("TYPE I")  # SIZE and REST need binary mode
+        return ftp
+
+    # --- Building job lists ---
+
+    def upload_tree(self, local_dir: str, remote_dir: str) -> list:
+        """Uploads every file under local_dir to remote_dir. Returns results."""
+        jobs = []
+        with self.connect() as ftp:
+            for root, _, files in os.walk(local_dir):
+                rel = os.path.relpath(root, local_dir)
+                target = remote_dir if rel == "." else f"{remote_dir}/{rel.replace(os.sep, '/')}"
+                self._make_remote_dirs(ftp, target)
+                for name in files:
+                    path = os.path.join(root, name)
+                    jobs.append(TransferJob("upload", path, f"{target}/{name}",
+                                            os.path.getsize(path)))
+        return self.run(jobs)
+
+    def download_tree(self, remote_dir: str, local_dir: str) -> list:
+        """Downloads every file under remote_dir to local_dir. Returns results."""
+        jobs = []
+        with self.connect() as ftp:
+            pending = [remote_dir]
+            while pending:
+                current = pending.pop()
+                rel = current[len(remote_dir):].lstrip("/")
+                os.makedirs(os.path.join(local_dir, rel), exist_ok=True)
+                for name, facts in ftp.mlsd(current, facts=["type", "size"]):
+                    path = f"{current}/{name}"
+                    if facts.get("type") == "dir":
+                        pending.append(path)
+                    elif facts.get("type") == "file":
+                        jobs.append(TransferJob("download", os.path.join(local_dir, rel, name),
+                                                path, int(facts.get("size", 0))))
+        return self.run(jobs)
+
+    @staticmethod
+    def _make_remote_dirs(ftp: FTP, path: str):
+        """(Private) mkdir -p on the server."""
+        current = ""
+        for part in path.strip("/").split("/"):
+            current = f"{current}/{part}" if current or path.startswith("/") else part
+            try:
+                ftp.mkd(current)
+            except error_perm:
+                pass  # Already exists
+
+    # --- Running jobs ---
+
+    def run(self, jobs: list) -> list:
+        """
+        Runs jobs on the worker pool, largest first so one big file does not
+        end up alone at the tail of the run.
+
+        Returns:
+            A list of TransferResult, in completion order.
+        """
+        work = queue.Queue()
+        for job in sorted(jobs, key=lambda j: j.size, reverse=True):
+            work.put(job)
+        results = []
+        lock = threading.Lock()
+
+        def worker():
+            ftp = None
+            while True:
+                try:
+                    job = work.get_nowait()
+                except queue.Empty:
+                    break
+                ftp, result = self._run_job(ftp, job)
+                with lock:
+                    results.append(result)
+            if ftp is not None:
+                try:
+                    ftp.quit()
+                except all_errors:
+                    ftp.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(min(self.workers, len(jobs)))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def _run_job(self, ftp, job: TransferJob):
+        """(Private) Transfers one file, reconnecting and resuming on errors."""
+        start = time.perf_counter()
+        result = TransferResult(job, ok=False)
+        first_offset = None
+        restart = False
+        for _ in range(self.retries + 1):
+            try:
+                if ftp is None:
+                    ftp = self.connect()
+                if job.direction == "upload":
+                    offset, sent, digest = self._upload(ftp, job, restart)
+                else:
+                    offset, sent, digest = self._download(ftp, job, restart)
+                if first_offset is None:
+                    first_offset = offset
+                result.bytes_sent += sent
+                result.sha256 = digest
+                result.error = self._verify(ftp, job, digest)
+                result.ok = not result.error
+                if not result.ok and offset and not restart:
+                    # The resumed part may have been stale; one more go from 0
+                    restart = True
+                    continue
+                break
+            except (*all_errors, EOFError) as e:
+                result.error = str(e)
+                if ftp is not None:
+                    ftp.close()
+                ftp = None
+        result.resumed_from = first_offset or 0
+        result.seconds = time.perf_counter() - start
+        return ftp, result
+
+    def _remote_size(self, ftp: FTP, path: str) -> int:
+        try:
+            return ftp.size(path) or 0
+        except error_perm:
+            return 0  # File does not exist yet
+
+    def _verify(self, ftp: FTP, job: TransferJob, digest: str) -> str:
+        """(Private) Checks a finished file per self.verify. Returns an error message or ""."""
+        if self.verify == "size":
+            remote = self._remote_size(ftp, job.remote_path)
+            local = os.path.getsize(job.local_path)
+            return "" if remote == local else f"size mismatch ({remote} remote, {local} local)"
+        if self.verify == "sha256":
+            return "" if self._remote_sha256(ftp, job.remote_path) == digest else "sha256 mismatch"
+        return ""
+
+    def _remote_range(self, ftp: FTP, path: str, start: int, length: int) -> bytes:
+        """(Private) Reads `length` bytes of a remote file from `start` (REST + RETR)."""
+        conn = ftp.transfercmd(f"RETR {path}", rest=start)
+        data = b""
+        try:
+            while len(data) < length:
+                block = conn.recv(length - len(data))
+                if not block:
+                    break
+                data += block
+        finally:
+            conn.close()
+        try:
+            ftp.voidresp()
+        except (error_temp, error_reply):
+            pass  # 426: we closed the data connection before the end, as intended
+        return data
+
+    def _resume_offset(self, ftp: FTP, job: TransferJob, offset: int, size: int) -> int:
+        """
+        (Private) The offset to resume at: `offset` if the destination is a
+        prefix of the source, judged by the RESUME_CHECK_BYTES before it,
+        else 0.
+        """
+        if offset <= 0 or offset > size:
+            return 0
+        check = min(offset, RESUME_CHECK_BYTES)
+        with open(job.local_path, "rb") as f:
+            f.seek(offset - check)
+            local = f.read(check)
+        remote = self._remote_range(ftp, job.remote_path, offset - check, check)
+        return offset if local == remote else 0
+
+    def _upload(self, ftp: FTP, job: TransferJob, restart: bool = False):
+        """(Private) STOR, restarting at the size already on the server."""
+        size = os.path.getsize(job.local_path)
+        offset = 0 if restart else self._remote_size(ftp, job.remote_path)
+        offset = self._resume_offset(ftp, job, offset, size)
+        digest = _hash_file(job.local_path, offset, self.blocksize)
+        sent = 0
+
+        with open(job.local_path, "rb") as f:
+            f.seek(offset)
+
+            class HashingReader:
+                # storbinary() only calls read(); hash each block on its way out
+                def read(self_, n):
+                    nonlocal sent
+                    block = f.read(n)
+                    digest.update(block)
+                    sent += len(block)
+                    return block
+
+            if offset < size or size == 0:
+                ftp.storbinary(f"STOR {job.remote_path}", HashingReader(),
+                               self.blocksize, rest=offset or None)
+        return offset, sent, digest.hexdigest()
+
+    def _download(self, ftp: FTP, job: TransferJob, restart: bool = False):
+        """(Private) RETR, restarting at the size already on disk."""
+        exists = os.path.exists(job.local_path)
+        offset = os.path.getsize(job.local_path) if exists and not restart else 0
+        size = self._remote_size(ftp, job.remote_path)
+        offset = self._resume_offset(ftp, job, offset, size)
+        digest = _hash_file(job.local_path, offset, self.blocksize) if offset else hashlib.sha256()
+        sent = 0
+
+        with open(job.local_path, "r+b" if offset else "wb") as f:
+            f.seek(offset)
+            f.truncate()
+
+            def write(block):
+                nonlocal sent
+                f.write(block)
+                digest.update(block)
+                sent += len(block)
+
+            if offset < size or size == 0:
+                ftp.retrbinary(f"RETR {job.remote_path}", write,
+                               self.blocksize, rest=offset or None)
+        return offset, sent, digest.hexdigest()
+
+    def _remote_sha256(self, ftp: FTP, path: str) -> str:
+        """(Private) Streams a remote file through sha256 without storing it."""
+        digest = hashlib.sha256()
+        ftp.retrbinary(f"RETR {path}", digest.update, self.blocksize)
+        return digest.hexdigest()
+
+    # --- Tuning ---
+
+    def autotune_blocksize(self, sample_bytes=16 * 1024 * 1024,
+                           candidates=BLOCKSIZE_CANDIDATES, remote_dir=".") -> int:
+        """
+        Uploads a sample file with each candidate blocksize, keeps the
+        fastest one as self.blocksize and returns it.
+        """
+        best, best_rate = self.blocksize, 0.0
+        payload = os.urandom(sample_bytes)
+        remote = f"{remote_dir}/.blocksize_probe"
+        with self.connect() as ftp:
+            for blocksize in candidates:
+                with tempfile.TemporaryFile() as f:
+                    f.write(payload)
+                    f.seek(0)
+                    start = time.perf_counter()
+                    ftp.storbinary(f"STOR {remote}", f, blocksize)
+                    rate = sample_bytes / (time.perf_counter() - start)
+                if rate > best_rate:
+                    best, best_rate = blocksize, rate
+            ftp.delete(remote)
+        self.blocksize = best
+        return best
+
+
+def report(results: list, elapsed: float, min_size: int = 0):
+    """
+    Prints per-file throughput (for files of at least min_size bytes) and
+    aggregate throughput for the whole run.
+    """
+    total = sum(r.bytes_sent for r in results)
+    for r in sorted(results, key=lambda r: r.job.remote_path):
+        if r.job.size < min_size and r.ok:
+            continue
+        rate = r.bytes_sent / r.seconds / 1e6 if r.seconds else 0.0
+        status = "OK " if r.ok else "ERR"
+        resumed = f" (resumed at {r.resumed_from})" if r.resumed_from else ""
+        print(f"  {status} {r.job.direction:8} {r.job.remote_path:40} "
+              f"{r.bytes_sent / 1e6:8.2f} MB {rate:8.2f} MB/s{resumed} {r.error}")
+    failed = sum(not r.ok for r in results)
+    print(f"Total: {len(results)} files, {failed} failed, {total / 1e6:.2f} MB in "
+          f"{elapsed:.2f} s -> {total / elapsed / 1e6:.2f} MB/s")
+
+
+def main():
+    # Run against the embedded pyftpdlib server from ftp_client.py
+    from ftp_client import start_ftp_server
+
+    with tempfile.TemporaryDirectory() as server_root, \
+            tempfile.TemporaryDirectory() as work:
+        threading.Thread(target=start_ftp_server,
+                         kwargs={"port": 2121, "root": server_root}, daemon=True).start()
+        time.sleep(1)
+        # serve_forever() configures pyftpdlib's logger; quiet it afterwards
+        logging.getLogger("pyftpdlib").setLevel(logging.WARNING)
+
+        # Build a small tree: a few large files and many small ones
+        source = os.path.join(work, "source")
+        for d in range(4):
+            os.makedirs(os.path.join(source, f"dir{d}"))
+            with open(os.path.join(source, f"dir{d}", "large.bin"), "wb") as f:
+                f.write(os.urandom(16 * 1024 * 1024))
+            for i in range(25):
+                with open(os.path.join(source, f"dir{d}", f"small{i}.bin"), "wb") as f:
+                    f.write(os.urandom(64 * 1024))
+
+        engine = FTPTransferEngine(workers=4)
+        print(f"Tuned blocksize: {engine.autotune_blocksize() // 1024} KiB")
+
+        for workers in (1, 4):
+            engine.workers = workers
+            remote = f"tree_w{workers}"
+            start = time.perf_counter()
+            results = engine.upload_tree(source, remote)
+            print(f"\n--- Upload with {workers} session(s) ---")
+            report(results, time.perf_counter() - start, min_size=1024 * 1024)
+
+        # Simulate an interrupted download: keep only half of one file, and
+        # leave a same-sized but different file in place of another
+        dest = os.path.join(work, "dest")
+        engine.download_tree("tree_w4", dest)
+        partial = os.path.join(dest, "dir0", "large.bin")
+        with open(partial, "r+b") as f:
+            f.truncate(8 * 1024 * 1024)
+        with open(os.path.join(dest, "dir1", "large.bin"), "wb") as f:
+            f.write(os.urandom(8 * 1024 * 1024))
+        start = time.perf_counter()
+        results = engine.download_tree("tree_w4", dest)
+        print("\n--- Download after interruption (dir0 resumes, dir1's stale prefix restarts at 0) ---")
+        report(results, time.perf_counter() - start, min_size=1024 * 1024)
+
+        engine.verify = "sha256"
+        start = time.perf_counter()
+        results = engine.download_tree("tree_w4", dest)
+        print("\n--- Same tree again with verify=\"sha256\" (hashes every remote file) ---")
+        report(results, time.perf_counter() - start, min_size=1024 * 1024)
+
+
+if __name__ == "__main__":
+    main()
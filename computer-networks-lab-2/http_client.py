@@ -1,17 +1,20 @@
 # http_client.py
+# For many URLs or load testing, see http_pool.py
 import requests
 
 def main():
+    # One Session for both requests, so the POST reuses the GET's connection
+    session = requests.Session()
     try:
         # Example GET request
-        get_resp = requests.get("https://httpbin.org/get")
+        get_resp = session.get("https://httpbin.org/get")
         print("GET Request:")
         print("Status Code:", get_resp.status_code)
         print("Headers:", get_resp.headers)
         print("Body:", get_resp.text[:200], "...")  # print partial
 
         # Example POST request
-        post_resp = requests.post("https://httpbin.org/post", data={"name": "Anuj", "course": "CN"})
+        post_resp = session.post("https://httpbin.org/post", data={"name": "Anuj", "course": "CN"})
         print("\nPOST Request:")
         print("Status Code:", post_resp.status_code)
         print("Headers:", post_resp.headers)
@@ -19,6 +22,8 @@ def main():
 
     except Exception as e:
         print("Error occurred:", e)
+    finally:
+        session.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,267 @@
+# http_pool.py
+import argparse
+import hashlib
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CHUNK_SIZE = 64 * 1024
+LAB3_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "computer-networks-lab-3")
+
+
+@dataclass
+class FetchResult:
+    """
+    Outcome of one request.
+
+    Attributes:
+        url (str): The requested URL.
+        status (int): HTTP status code (0 if the request failed).
+        bytes (int): Body size, counted while streaming.
+        seconds (float): Total time including reading the body.
+        first_byte_ms (float): Time until the response headers arrived.
+        sha256 (str): Hex digest of the body (only if hashing was asked for).
+        error (str): Exception text if the request failed.
+    """
+    url: str
+    status: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    first_byte_ms: float = 0.0
+    sha256: str = ""
+    error: str = ""
+
+
+def make_session(pool_size=10, retries=0) -> requests.Session:
+    """
+    Creates a Session whose connection pools keep up to pool_size
+    keep-alive connections per host, so repeated requests skip the TCP
+    (and TLS) handshake.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch(session, url, method="GET", data=None, hash_body=False, timeout=30):
+    """
+    Sends one request and streams the body in CHUNK_SIZE pieces instead of
+    building resp.text, so large responses do not sit in memory.
+    """
+    result = FetchResult(url)
+    digest = hashlib.sha256() if hash_body else None
+    start = time.perf_counter()
+    try:
+        with session.request(method, url, data=data, stream=True, timeout=timeout) as resp:
+            result.first_byte_ms = (time.perf_counter() - start) * 1000
+            result.status = resp.status_code
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                result.bytes += len(chunk)
+                if digest:
+                    digest.update(chunk)
+    except requests.RequestException as e:
+        result.error = str(e)
+    result.seconds = time.perf_counter() - start
+    if digest and not result.error:
+        result.sha256 = digest.hexdigest()
+    return result
+
+
+class PooledClient:
+    """
+    Runs many requests on a thread pool.
+
+    Each worker thread gets its own pooled Session (Sessions are not
+    guaranteed to be thread-safe), and keeps reusing its connections for
+    every request it handles.
+    """
+
+    def __init__(self, workers=16, retries=0, timeout=30):
+        self.workers = workers
+        self.retries = retries
+        self.timeout = timeout
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = make_session(pool_size=4, retries=self.retries)
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def fetch_many(self, urls, method="GET", hash_body=False):
+        """Yields a FetchResult for every URL as soon as it finishes."""
+        with ThreadPoolExecutor(self.workers) as pool:
+            futures = [pool.submit(lambda u: fetch(self._session(), u, method,
+                                                   hash_body=hash_body, timeout=self.timeout), url)
+                       for url in urls]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def close(self):
+        for session in self._sessions:
+            session.close()
+
+
+# --- Load test ---
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def load_test(url, requests_total=2000, concurrency=16, pooled=True):
+    """
+    Sends requests_total GETs to one URL with `concurrency` workers.
+
+    Args:
+        pooled: False opens a new connection per request (like calling
+            requests.get() directly) for comparison.
+
+    Returns:
+        A dict with RPS, latency percentiles in ms, errors and status counts.
+    """
+    if pooled:
+        client = PooledClient(workers=concurrency)
+        start = time.perf_counter()
+        results = list(client.fetch_many([url] * requests_total))
+        elapsed = time.perf_counter() - start
+        client.close()
+    else:
+        def one(_):
+            with requests.Session() as session:
+                return fetch(session, url)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(one, range(requests_total)))
+        elapsed = time.perf_counter() - start
+
+    latencies = sorted(r.seconds * 1000 for r in results if not r.error)
+    statuses = {}
+    for r in results:
+        statuses[r.status] = statuses.get(r.status, 0) + 1
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50),
+        "p90_ms": percentile(latencies, 0.90),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": latencies[-1] if latencies else 0.0,
+        "errors": sum(1 for r in results if r.error),
+        "statuses": statuses,
+        "mb_per_sec": sum(r.bytes for r in results) / elapsed / 1e6,
+    }
+
+
+def print_load_result(label, result):
+    print(f"{label:>10}: {result['rps']:8.0f} req/s | p50 {result['p50_ms']:6.2f} ms | "
+          f"p90 {result['p90_ms']:6.2f} ms | p99 {result['p99_ms']:6.2f} ms | "
+          f"max {result['max_ms']:7.2f} ms | errors {result['errors']} | {result['statuses']}")
+
+
+def start_standin_server(body_size=16 * 1024):
+    """
+    Starts a threaded HTTP/1.1 keep-alive server on a free loopback port.
+
+    Lab 3's http_cookies.py (on :8000) closes the connection after every
+    response, so it cannot show the benefit of pooling; http_caching.py
+    keeps connections open (see start_lab3_server).
+    """
+    body = b"x" * body_size
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; without TCP_NODELAY
+        # each keep-alive response stalls ~40 ms on delayed ACKs
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_lab3_server():
+    """
+    Starts lab 3's http_caching.py handler (HTTP/1.1 keep-alive, serving
+    its index.html) in this process, on a free loopback port.
+    """
+    if LAB3_DIR not in sys.path:
+        sys.path.append(LAB3_DIR)  # Appended, so it cannot shadow anything
+    from http_caching import CachingHTTPRequestHandler
+
+    class Handler(CachingHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pooled, concurrent HTTP client")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    get = sub.add_parser("get", help="fetch URLs concurrently")
+    get.add_argument("urls", nargs="+")
+    get.add_argument("-w", "--workers", type=int, default=16)
+    get.add_argument("--sha256", action="store_true", help="hash each body while streaming")
+
+    load = sub.add_parser("loadtest", help="hammer one URL and report RPS/latency")
+    load.add_argument("url", nargs="?", help="target (default: a local stand-in server)")
+    load.add_argument("-n", "--requests", type=int, default=2000)
+    load.add_argument("-c", "--concurrency", type=int, default=16)
+    load.add_argument("--compare", action="store_true",
+                      help="also run without connection pooling")
+    load.add_argument("--lab3", action="store_true",
+                      help="target lab 3's http_caching.py (in-process) instead of the stand-in")
+    args = parser.parse_args()
+
+    if args.command == "get":
+        client = PooledClient(workers=args.workers)
+        for r in client.fetch_many(args.urls, hash_body=args.sha256):
+            print(f"{r.status or 'ERR':>3} {r.bytes:10d} B {r.seconds * 1000:8.1f} ms "
+                  f"{r.url} {r.sha256} {r.error}")
+        client.close()
+        return
+
+    server = None
+    url = args.url
+    if url is None:
+        server = start_lab3_server() if args.lab3 else start_standin_server()
+        url = f"http://127.0.0.1:{server.server_address[1]}/"
+    print(f"--- Load test: {args.requests} GETs, concurrency {args.concurrency}, {url} ---")
+    print_load_result("pooled", load_test(url, args.requests, args.concurrency, pooled=True))
+    if args.compare:
+        print_load_result("unpooled", load_test(url, args.requests, args.concurrency, pooled=False))
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
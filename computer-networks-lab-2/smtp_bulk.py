@@ -0,0 +1,275 @@
+# smtp_bulk.py
+import logging
+import os
+import queue
+import random
+import smtplib
+import threading
+import time
+from dataclasses import dataclass
+from email.mime.text import MIMEText
+
+
+@dataclass
+class SMTPConfig:
+    """
+    Where and how to connect. Credentials never live in the source code.
+
+    Attributes:
+        host (str): SMTP server.
+        port (int): SMTP port (587 for STARTTLS submission).
+        user (str): Login name ("" to skip AUTH).
+        password (str): Login password or app password.
+        starttls (bool): Upgrade the connection with STARTTLS.
+        timeout (float): Socket timeout in seconds.
+    """
+    host: str = "smtp.gmail.com"
+    port: int = 587
+    user: str = ""
+    password: str = ""
+    starttls: bool = True
+    timeout: float = 30.0
+
+    @classmethod
+    def from_env(cls, prefix="SMTP_") -> "SMTPConfig":
+        """
+        Reads SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD and
+        SMTP_STARTTLS ("0" disables) from the environment.
+        """
+        env = os.environ
+        return cls(
+            host=env.get(prefix + "HOST", cls.host),
+            port=int(env.get(prefix + "PORT", cls.port)),
+            user=env.get(prefix + "USER", ""),
+            password=env.get(prefix + "PASSWORD", ""),
+            starttls=env.get(prefix + "STARTTLS", "1") != "0",
+        )
+
+
+@dataclass
+class SendResult:
+    """
+    Outcome of one message.
+
+    Attributes:
+        to (str): Recipient.
+        ok (bool): True if the server accepted the message.
+        attempts (int): Tries used (1 = first try succeeded).
+        error (str): Last error if the message was not sent.
+    """
+    to: str
+    ok: bool
+    attempts: int
+    error: str = ""
+
+
+def is_transient(error: Exception) -> bool:
+    """4xx replies and dropped connections are worth retrying; 5xx are not."""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return False
+
+
+class BulkSender:
+    """
+    Sends many messages over a small pool of authenticated connections.
+
+    Unlike smtp_client.py, which pays for connect + STARTTLS + AUTH on every
+    message, each worker logs in once and reuses its connection for up to
+    `messages_per_connection` messages (servers often cap this). Transient
+    failures are retried with exponential backoff and jitter.
+    """
+
+    def __init__(self, config: SMTPConfig, connections=4, messages_per_connection=100,
+                 retries=3, backoff=0.5):
+        """
+        Args:
+            config: Server and credentials (see SMTPConfig.from_env()).
+            connections: Parallel SMTP connections.
+            messages_per_connection: Reconnect after this many messages.
+            retries: Extra attempts for transient (4xx) failures.
+            backoff: First retry delay in seconds; doubles each attempt.
+        """
+        self.config = config
+        self.connections = connections
+        self.messages_per_connection = messages_per_connection
+        self.retries = retries
+        self.backoff = backoff
+        self.logins = 0
+        self._logins_lock = threading.Lock()  # connect() runs on every worker thread
+
+    def connect(self) -> smtplib.SMTP:
+        """Opens one connection and authenticates it."""
+        c = self.config
+        server = smtplib.SMTP(c.host, c.port, timeout=c.timeout)
+        try:
+            if c.starttls:
+                server.starttls()
+            if c.user:
+                server.login(c.user, c.password)
+        except BaseException:
+            server.close()
+            raise
+        with self._logins_lock:
+            self.logins += 1
+        return server
+
+    def send_all(self, messages) -> list:
+        """
+        Sends every message.
+
+        Args:
+            messages: Iterable of email.message.Message objects with From
+                and To headers set.
+
+        Returns:
+            A list of SendResult, one per message.
+        """
+        work = queue.Queue()
+        for msg in messages:
+            work.put(msg)
+        results = []
+        lock = threading.Lock()
+
+        def worker():
+            server = None
+            sent_on_connection = 0
+            while True:
+                try:
+                    msg = work.get_nowait()
+                except queue.Empty:
+                    break
+                attempt = 0
+                while True:
+                    attempt += 1
+                    try:
+                        if server is None or sent_on_connection >= self.messages_per_connection:
+                            self._quit(server)
+                            server = self.connect()
+                            sent_on_connection = 0
+                        server.send_message(msg)
+                        sent_on_connection += 1
+                        result = SendResult(msg["To"], True, attempt)
+                        break
+                    except (smtplib.SMTPException, OSError) as e:
+                        # SMTPException subclasses OSError; only a dead socket
+                        # needs a reconnect, a 4xx reply keeps the session
+                        if (isinstance(e, smtplib.SMTPServerDisconnected)
+                                or not isinstance(e, smtplib.SMTPException)):
+                            server = None
+                        if not is_transient(e) or attempt > self.retries:
+                            result = SendResult(msg["To"], False, attempt, str(e))
+                            break
+                        delay = self.backoff * 2 ** (attempt - 1)
+                        time.sleep(delay * random.uniform(0.5, 1.5))
+                with lock:
+                    results.append(result)
+            self._quit(server)
+
+        threads = [threading.Thread(target=worker) for _ in range(self.connections)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    @staticmethod
+    def _quit(server):
+        if server is None:
+            return
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+
+def make_message(sender, receiver, subject, body) -> MIMEText:
+    msg = MIMEText(body)
+    msg["Subject"] = subject
+    msg["From"] = sender
+    msg["To"] = receiver
+    return msg
+
+
+# --- Benchmark against a local SMTP sink ---
+
+def start_sink(port=0, transient_failure_rate=0.0, user="user", password="12345"):
+    """
+    Starts an aiosmtpd server on loopback that accepts and discards mail.
+
+    A fraction of messages is answered with "451 try again later" so the
+    retry path is exercised. AUTH is accepted without TLS (loopback only).
+
+    Returns:
+        (controller, handler); controller.port is the port actually bound
+        (a free one when port=0) and handler.accepted counts delivered
+        messages.
+    """
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult, LoginPassword
+
+    # aiosmtpd logs a deprecation warning about its own attribute on every AUTH
+    logging.getLogger("mail.log").setLevel(logging.ERROR)
+
+    class SinkHandler:
+        def __init__(self):
+            self.accepted = 0
+            self.rejected = 0
+            self.rng = random.Random(0)
+
+        async def handle_DATA(self, server, session, envelope):
+            if self.rng.random() < transient_failure_rate:
+                self.rejected += 1
+                return "451 4.3.0 Try again later"
+            self.accepted += 1
+            return "250 OK"
+
+    def authenticator(server, session, envelope, mechanism, auth_data):
+        ok = (isinstance(auth_data, LoginPassword) and auth_data.login.decode() == user
+              and auth_data.password.decode() == password)
+        return AuthResult(success=ok)
+
+    class SinkController(Controller):
+        def _trigger_server(self):
+            # Runs once the socket is bound; aiosmtpd would otherwise
+            # connect to port 0 here
+            self.port = self.server.sockets[0].getsockname()[1]
+            super()._trigger_server()
+
+    handler = SinkHandler()
+    controller = SinkController(handler, hostname="127.0.0.1", port=port,
+                                authenticator=authenticator, auth_require_tls=False)
+    controller.start()
+    return controller, handler
+
+
+def benchmark(messages=500):
+    controller, handler = start_sink(transient_failure_rate=0.02)
+    config = SMTPConfig(host=controller.hostname, port=controller.port,
+                        user="user", password="12345", starttls=False)
+    batch = [make_message("noreply@example.test", f"user{i}@example.test",
+                          f"Notification {i}", "This is a test notification.")
+             for i in range(messages)]
+    print(f"--- Sending {messages} messages to a local SMTP sink (2% answered 451) ---")
+    try:
+        for label, connections, per_connection in [("new connection per message", 1, 1),
+                                                   ("1 reused connection", 1, 1000),
+                                                   ("4 reused connections", 4, 1000)]:
+            sender = BulkSender(config, connections, per_connection, backoff=0.01)
+            start = time.perf_counter()
+            results = sender.send_all(batch)
+            elapsed = time.perf_counter() - start
+            sent = sum(r.ok for r in results)
+            retried = sum(r.attempts > 1 for r in results)
+            print(f"{label:>28}: {sent / elapsed:8.1f} msg/s | sent {sent} | "
+                  f"retried {retried} | failed {len(results) - sent} | logins {sender.logins}")
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    benchmark()
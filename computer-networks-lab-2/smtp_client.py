@@ -1,13 +1,16 @@
 # smtp_client.py
+import os
 import smtplib
 from email.mime.text import MIMEText
 
+from smtp_bulk import SMTPConfig
+
 def main():
-    smtp_server = "smtp.gmail.com"
-    port = 587
-    sender_email = "sholu1234anuj@gmail.com"   # change
-    receiver_email = "sholu0104@gmail.com"  # change
-    password = "xnwg zmsg cfua arzu"  # app password, not normal
+    # Credentials come from SMTP_HOST / SMTP_PORT / SMTP_USER / SMTP_PASSWORD
+    # (an app password, not the normal one); see smtp_bulk.py for bulk sending
+    config = SMTPConfig.from_env()
+    sender_email = os.environ.get("SMTP_FROM", config.user)
+    receiver_email = os.environ.get("SMTP_TO", sender_email)
 
     try:
         msg = MIMEText("This is a test email from Python SMTP client.")
@@ -15,9 +18,11 @@ def main():
         msg["From"] = sender_email
         msg["To"] = receiver_email
 
-        server = smtplib.SMTP(smtp_server, port)
-        server.starttls()
-        server.login(sender_email, password)
+        server = smtplib.SMTP(config.host, config.port, timeout=config.timeout)
+        if config.starttls:
+            server.starttls()
+        if config.user:
+            server.login(config.user, config.password)
         server.sendmail(sender_email, receiver_email, msg.as_string())
         print("Email sent successfully!")
         server.quit()
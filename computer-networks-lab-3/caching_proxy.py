@@ -0,0 +1,741 @@
+# caching_proxy.py
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from http.server import ThreadingHTTPServer
+
+# The repository root, for the shared common package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)  # Appended, so it cannot shadow anything
+from common import metrics
+
+# The per-proxy counters are registered in CachingProxy.start()
+LATENCY = metrics.histogram("proxy_request_seconds", "Time from request read to response written")
+
+# Headers that describe one connection, not the message (RFC 9110 section 7.6.1)
+HOP_BY_HOP = {"connection", "keep-alive", "proxy-connection", "proxy-authenticate",
+              "proxy-authorization", "te", "trailer", "transfer-encoding", "upgrade"}
+# Statuses that may be stored when the response says how long (RFC 9110 section 15.1)
+CACHEABLE_STATUS = {200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501}
+ENTRY_OVERHEAD = 200  # Rough bytes per entry beyond body and headers
+
+
+class HTTPError(Exception):
+    """A malformed HTTP message."""
+
+
+@dataclass
+class Response:
+    status: int
+    reason: str
+    headers: list  # [(name, value), ...] in the order received
+    body: bytes
+
+
+@dataclass
+class CacheEntry:
+    """
+    One stored upstream response.
+
+    Attributes:
+        response (Response): The full 200 (or other cacheable) response.
+        stored_at (float): time.monotonic() when it was received, minus
+            any Age the upstream reported.
+        lifetime (float): Seconds it stays fresh (max-age, s-maxage).
+        etag (str): The validator used to revalidate it, if any.
+        size (int): Bytes charged against the cache limit.
+    """
+    response: Response
+    stored_at: float
+    lifetime: float
+    etag: str = None
+    size: int = 0
+
+    def age(self, now):
+        return now - self.stored_at
+
+    def fresh(self, now):
+        return now - self.stored_at < self.lifetime
+
+
+def get_header(headers, name):
+    """The first value of a header (case-insensitive), or None."""
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def parse_cache_control(value):
+    """'public, max-age=86400' -> {'public': '', 'max-age': '86400'}"""
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"')
+    return directives
+
+
+def wants_keep_alive(version, headers):
+    tokens = (get_header(headers, "connection") or "").lower()
+    if version == "HTTP/1.1":
+        return "close" not in tokens
+    return "keep-alive" in tokens
+
+
+def freshness(headers, max_ttl=None):
+    """
+    How long a response may be served without asking the origin, or None
+    if it must not be stored: no-store, private, a Set-Cookie (a shared
+    cache must not hand one user's session to another) or Vary (the key
+    would have to include request headers).
+
+    A response without max-age is only worth storing when it has an ETag
+    to revalidate with; it is stored with a lifetime of 0.
+    """
+    cc = parse_cache_control(get_header(headers, "cache-control"))
+    if ("no-store" in cc or "private" in cc or get_header(headers, "set-cookie") is not None
+            or get_header(headers, "vary") is not None):
+        return None
+    value = cc.get("s-maxage", cc.get("max-age", ""))
+    lifetime = int(value) if value.isdigit() and "no-cache" not in cc else 0
+    if lifetime == 0 and get_header(headers, "etag") is None:
+        return None
+    return lifetime if max_ttl is None else min(lifetime, max_ttl)
+
+
+# --- HTTP/1.1 framing ---
+
+async def read_head(reader):
+    """
+    Reads a start line and header section.
+
+    Returns:
+        (start line split in three, [(name, value), ...]), or None if the
+        peer closed the connection before sending anything.
+    """
+    try:
+        data = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise
+    except asyncio.LimitOverrunError:
+        raise HTTPError("header section too large") from None
+    lines = data.decode("latin-1").split("\r\n")
+    start = lines[0].split(" ", 2)
+    if len(start) < 2:
+        raise HTTPError(f"malformed start line {lines[0]!r}")
+    headers = []
+    for line in lines[1:]:
+        if not line:
+            break
+        name, sep, value = line.partition(":")
+        if not sep:
+            raise HTTPError(f"malformed header line {line!r}")
+        headers.append((name.strip(), value.strip()))
+    return start + [""] * (3 - len(start)), headers
+
+
+async def read_body(reader, headers, to_eof=False):
+    """
+    Reads a body framed by chunked encoding or Content-Length. Responses
+    with neither (to_eof=True) run until the upstream closes.
+
+    Returns:
+        (body, reusable): reusable is False when the body ended with the
+        connection.
+    """
+    try:
+        if "chunked" in (get_header(headers, "transfer-encoding") or "").lower():
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    while await reader.readuntil(b"\r\n") != b"\r\n":
+                        pass  # Trailers are dropped
+                    return b"".join(chunks), True
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+        length = get_header(headers, "content-length")
+        if length is not None:
+            return await reader.readexactly(int(length)), True
+    except ValueError:
+        raise HTTPError("invalid body framing") from None
+    if to_eof:
+        return await reader.read(), False
+    return b"", True
+
+
+def render_request(method, target, host, headers, body=b""):
+    lines = [f"{method} {target} HTTP/1.1", f"Host: {host}"]
+    lines += [f"{name}: {value}" for name, value in headers
+              if name.lower() not in HOP_BY_HOP and name.lower() not in ("host", "content-length")]
+    if body or method in ("POST", "PUT", "PATCH"):
+        lines.append(f"Content-Length: {len(body)}")
+    lines.append("Connection: keep-alive")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+def render_response(response, keep_alive, head_only=False):
+    """
+    Serializes a response for the client. The body is always buffered, so
+    it goes out with a Content-Length whatever framing the upstream used.
+    """
+    lines = [f"HTTP/1.1 {response.status} {response.reason}"]
+    lines += [f"{name}: {value}" for name, value in response.headers
+              if name.lower() not in HOP_BY_HOP and name.lower() != "content-length"]
+    if response.status >= 200 and response.status not in (204, 304):
+        # A forwarded HEAD has no body but keeps the upstream's length
+        length = (get_header(response.headers, "content-length")
+                  if head_only and not response.body else len(response.body))
+        if length is not None:
+            lines.append(f"Content-Length: {length}")
+    lines.append("Connection: " + ("keep-alive" if keep_alive else "close"))
+    head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+    if head_only or response.status == 304:
+        return head
+    return head + response.body
+
+
+def error_response(status, reason):
+    body = f"{status} {reason}\n".encode()
+    return Response(status, reason, [("Content-Type", "text/plain")], body)
+
+
+# --- Cache and upstream connections ---
+
+class ProxyCache:
+    """
+    LRU cache of responses bounded by total bytes (bodies plus headers),
+    not by entry count, so a few large pages cannot blow the memory budget.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entry_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 8
+        self.entries = OrderedDict()  # request target -> CacheEntry
+        self.bytes = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry: CacheEntry):
+        """Stores (or re-sizes) an entry. Returns False if it is too large to keep."""
+        response = entry.response
+        entry.size = (len(response.body) + ENTRY_OVERHEAD
+                      + sum(len(name) + len(value) + 4 for name, value in response.headers))
+        self.discard(key)
+        if entry.size > self.max_entry_bytes:
+            return False
+        self.entries[key] = entry
+        self.bytes += entry.size
+        while self.bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= evicted.size
+            self.evictions += 1
+        return True
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+
+class UpstreamPool:
+    """
+    Keep-alive connections to the origin. Idle connections are reused
+    most-recently-used first (the least likely to have been timed out by
+    the server), and at most `max_connections` requests are outstanding,
+    so a burst of misses queues here instead of piling onto the origin.
+    """
+
+    def __init__(self, host, port, max_connections=32, max_idle=32, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.idle = deque()
+        self.slots = asyncio.Semaphore(max_connections)
+        self.opened = 0
+        self.reused = 0
+
+    async def _connect(self, fresh=False):
+        while self.idle and not fresh:
+            reader, writer = self.idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                self.reused += 1
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        self.opened += 1
+        return reader, writer, False
+
+    async def request(self, method, target, headers, body=b""):
+        """Sends one request and reads the whole response."""
+        async with self.slots:
+            return await asyncio.wait_for(self._exchange(method, target, headers, body),
+                                          self.timeout)
+
+    async def _exchange(self, method, target, headers, body):
+        wire = render_request(method, target, f"{self.host}:{self.port}", headers, body)
+        for attempt in range(2):
+            reader, writer, reused = await self._connect(fresh=attempt > 0)
+            try:
+                writer.write(wire)
+                await writer.drain()
+                head = await read_head(reader)
+                if head is None:
+                    raise ConnectionResetError("upstream closed the connection")
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                # The server may have closed an idle connection just as we
+                # reused it; safe methods get one retry on a new one
+                if reused and method in ("GET", "HEAD"):
+                    continue
+                raise
+            except BaseException:
+                writer.close()  # e.g. cancelled by wait_for's timeout
+                raise
+            try:
+                (version, status, reason), response_headers = head
+                status = int(status)
+                if method == "HEAD" or status in (204, 304) or status < 200:
+                    response_body, reusable = b"", True
+                else:
+                    response_body, reusable = await read_body(reader, response_headers, to_eof=True)
+            except ValueError:
+                writer.close()
+                raise HTTPError("malformed upstream status line") from None
+            except BaseException:
+                writer.close()
+                raise
+            if reusable and wants_keep_alive(version, response_headers) and len(self.idle) < self.max_idle:
+                self.idle.append((reader, writer))
+            else:
+                writer.close()
+            return Response(status, reason, response_headers, response_body)
+
+    def close(self):
+        while self.idle:
+            self.idle.pop()[1].close()
+
+
+# --- The proxy ---
+
+class CachingProxy:
+    """
+    Caching reverse proxy for one origin.
+
+    GETs are answered from the cache while fresh (max-age / s-maxage),
+    revalidated with If-None-Match once stale, and fetched otherwise.
+    Requests for a URL that is already being fetched or revalidated wait
+    for that one upstream request instead of sending their own. Other
+    methods are passed through and invalidate the URL.
+    """
+
+    def __init__(self, upstream=("127.0.0.1", 8080), cache=None, max_connections=32,
+                 max_ttl=None, timeout=10.0):
+        """
+        Args:
+            upstream: (host, port) of the origin server.
+            cache: A ProxyCache (a new 64 MiB one if None).
+            max_connections: Limit on concurrent upstream requests.
+            max_ttl: Caps every freshness lifetime, in seconds (None: trust
+                the origin; 0: revalidate on every request).
+            timeout: Seconds to wait for an upstream response.
+        """
+        self.pool = UpstreamPool(upstream[0], upstream[1], max_connections, timeout=timeout)
+        self.cache = cache if cache is not None else ProxyCache()
+        self.max_ttl = max_ttl
+        self.inflight = {}  # request target -> asyncio.Future of (CacheEntry or None, status)
+        self.requests = 0
+        self.metric_keys = []  # (name, labels) registered by start()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.coalesced = 0
+        self.bypassed = 0
+        self.upstream_requests = 0
+        self.upstream_bytes = 0
+
+    async def handle(self, method, target, headers, body=b"") -> Response:
+        """Answers one client request; adds X-Cache (and Age when served from the cache)."""
+        self.requests += 1
+        if method not in ("GET", "HEAD"):
+            self.cache.discard(target)  # Unsafe methods invalidate (RFC 9111 section 4.4)
+            return await self._forward(method, target, headers, body)
+        request_cc = parse_cache_control(get_header(headers, "cache-control"))
+        if "no-store" in request_cc or get_header(headers, "authorization") is not None:
+            return await self._forward(method, target, headers, body)
+
+        entry = self.cache.get(target)
+        if entry is not None and entry.fresh(time.monotonic()) and "no-cache" not in request_cc:
+            self.hits += 1
+            return self._serve(entry, headers, "HIT")
+        if entry is None and method == "HEAD":
+            return await self._forward(method, target, headers, body)
+
+        try:
+            entry, status = await self._fetch(target, headers, entry)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, HTTPError):
+            return error_response(502, "Bad Gateway")
+        if isinstance(entry, Response):
+            return entry  # Not cacheable; already marked MISS
+        if entry is None:
+            # The shared fetch turned out uncacheable: it may carry another
+            # client's cookies, so this request goes upstream itself
+            return await self._forward(method, target, headers, body)
+        return self._serve(entry, headers, status)
+
+    def _serve(self, entry: CacheEntry, headers, status):
+        """(Private) A cached response, or a 304 if the client already has it."""
+        response = entry.response
+        if_none_match = get_header(headers, "if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            not_modified = entry.etag is not None and (entry.etag in tags or "*" in tags)
+        else:
+            if_modified_since = get_header(headers, "if-modified-since")
+            not_modified = (if_modified_since is not None
+                            and if_modified_since == get_header(response.headers, "last-modified"))
+        extra = [("Age", str(int(entry.age(time.monotonic())))), ("X-Cache", status)]
+        if not_modified:
+            kept = [(name, value) for name, value in response.headers
+                    if name.lower() in ("etag", "last-modified", "cache-control", "expires", "date")]
+            return Response(304, "Not Modified", kept + extra, b"")
+        return Response(response.status, response.reason, response.headers + extra, response.body)
+
+    async def _upstream(self, method, target, headers, body=b""):
+        self.upstream_requests += 1
+        response = await self.pool.request(method, target, headers, body)
+        self.upstream_bytes += len(response.body)
+        return response
+
+    async def _forward(self, method, target, headers, body):
+        """(Private) Passes a request through without touching the cache."""
+        self.bypassed += 1
+        try:
+            response = await self._upstream(method, target, headers, body)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, HTTPError):
+            return error_response(502, "Bad Gateway")
+        response.headers.append(("X-Cache", "BYPASS"))
+        return response
+
+    async def _fetch(self, key, headers, stale: CacheEntry):
+        """(Private) One upstream fetch or revalidation per URL, shared by every waiter."""
+        future = self.inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            result = await self._refresh(key, headers, stale)
+            if isinstance(result[0], Response):
+                future.set_result((None, "MISS"))
+            else:
+                future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved if nobody else was waiting
+            raise
+        finally:
+            del self.inflight[key]
+
+    async def _refresh(self, key, headers, stale: CacheEntry):
+        """
+        (Private) Fetches `key`, conditionally if the stale entry has an
+        ETag. The client's own validators are not forwarded: they are
+        answered from the entry, and the proxy needs the full body to store.
+
+        Returns:
+            (CacheEntry, "MISS" | "REVALIDATED"), or (Response, "MISS") when
+            the response may not be stored.
+        """
+        upstream_headers = [(name, value) for name, value in headers
+                            if name.lower() not in ("if-none-match", "if-modified-since",
+                                                    "cache-control")]
+        if stale is not None and stale.etag is not None:
+            upstream_headers.append(("If-None-Match", stale.etag))
+        response = await self._upstream("GET", key, upstream_headers)
+        now = time.monotonic()
+
+        if response.status == 304 and stale is not None:
+            # Headers in the 304 replace the stored ones (RFC 9111 section 4.3.4)
+            updated = {name.lower() for name, _ in response.headers}
+            stale.response.headers = [(name, value) for name, value in stale.response.headers
+                                      if name.lower() not in updated] + response.headers
+            lifetime = freshness(stale.response.headers, self.max_ttl)
+            if lifetime is None:
+                self.cache.discard(key)
+            else:
+                stale.stored_at = now - self._age(response.headers)
+                stale.lifetime = lifetime
+                stale.etag = get_header(stale.response.headers, "etag")
+                self.cache.put(key, stale)
+            self.revalidated += 1
+            return stale, "REVALIDATED"
+
+        self.misses += 1
+        lifetime = freshness(response.headers, self.max_ttl)
+        if lifetime is None or response.status not in CACHEABLE_STATUS:
+            self.cache.discard(key)
+            response.headers.append(("X-Cache", "MISS"))
+            return response, "MISS"
+        entry = CacheEntry(response, now - self._age(response.headers), lifetime,
+                           get_header(response.headers, "etag"))
+        self.cache.put(key, entry)
+        return entry, "MISS"
+
+    @staticmethod
+    def _age(headers):
+        value = get_header(headers, "age") or ""
+        return int(value) if value.isdigit() else 0
+
+    # --- Listener ---
+
+    async def _client(self, reader, writer):
+        """(Private) Serves one client connection, keeping it open between requests."""
+        try:
+            while True:
+                head = await read_head(reader)
+                if head is None:
+                    break
+                (method, target, version), headers = head
+                body, _ = await read_body(reader, headers)
+                start = time.perf_counter()
+                response = await self.handle(method, target, headers, body)
+                keep_alive = wants_keep_alive(version, headers)
+                writer.write(render_response(response, keep_alive, head_only=method == "HEAD"))
+                await writer.drain()
+                LATENCY.observe(time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except HTTPError:
+            writer.write(render_response(error_response(400, "Bad Request"), False))
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8081):
+        """Starts listening. Returns the bound (host, port)."""
+        self.server = await asyncio.start_server(self._client, host, port)
+        address = self.server.sockets[0].getsockname()[:2]
+        # Labelled by listen address, so several proxies in one process
+        # each export their own counters; close() unregisters them
+        proxy = {"proxy": "%s:%d" % address}
+        self.metric_keys = []
+
+        def export(kind, name, help, fn, **labels):
+            kind(name, help, fn=fn, **proxy, **labels)
+            self.metric_keys.append((name, dict(proxy, **labels)))
+
+        for name, value in (("hit", lambda: self.hits), ("miss", lambda: self.misses),
+                            ("revalidated", lambda: self.revalidated),
+                            ("coalesced", lambda: self.coalesced), ("bypass", lambda: self.bypassed)):
+            export(metrics.counter, "proxy_cache_requests_total", "Requests by cache result", value,
+                   result=name)
+        export(metrics.counter, "proxy_upstream_requests_total", "Requests sent to the origin",
+               lambda: self.upstream_requests)
+        export(metrics.counter, "proxy_upstream_body_bytes_total", "Body bytes received from the origin",
+               lambda: self.upstream_bytes)
+        export(metrics.counter, "proxy_upstream_connections_total", "Origin connections opened",
+               lambda: self.pool.opened)
+        export(metrics.counter, "proxy_cache_evictions_total",
+               "Entries evicted to stay under the byte limit", lambda: self.cache.evictions)
+        export(metrics.gauge, "proxy_cache_bytes", "Bytes held by the cache", lambda: self.cache.bytes)
+        export(metrics.gauge, "proxy_cache_entries", "Responses in the cache", lambda: len(self.cache))
+        return address
+
+    def close(self):
+        for name, labels in self.metric_keys:
+            metrics.unregister(name, **labels)
+        self.metric_keys = []
+        self.server.close()
+        self.pool.close()
+
+
+# --- Load-generation benchmark ---
+
+def start_origin(delay=0.005):
+    """
+    Runs http_caching's handler on a threaded HTTP/1.1 server (so pooled
+    connections stay open), sleeping `delay` seconds per request to stand
+    in for a remote origin.
+
+    Returns:
+        The server (call shutdown() to stop it).
+    """
+    from http_caching import CachingHTTPRequestHandler
+
+    class OriginHandler(CachingHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(delay)
+            super().do_GET()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OriginHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def zipf_paths(count, distinct, s=1.0, seed=0):
+    """Request paths with a Zipf popularity distribution, like real traffic."""
+    rng = random.Random(seed)
+    weights = [1 / (rank ** s) for rank in range(1, distinct + 1)]
+    return [f"/page/{i}" for i in rng.choices(range(distinct), weights=weights, k=count)]
+
+
+async def replay(address, paths, concurrency=50):
+    """
+    Sends the GETs over `concurrency` keep-alive connections.
+
+    Returns:
+        A dict with requests/sec, latency percentiles (ms), failures and
+        counts by X-Cache value.
+    """
+    latencies = []
+    failures = 0
+    results = {}
+    next_index = 0
+
+    async def client():
+        nonlocal failures, next_index
+        connection = None
+        while next_index < len(paths):
+            path = paths[next_index]
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = await asyncio.open_connection(*address)
+                reader, writer = connection
+                writer.write(render_request("GET", path, "%s:%d" % tuple(address), []))
+                await writer.drain()
+                (version, status, _), headers = await read_head(reader)
+                await read_body(reader, headers)
+                latencies.append((time.perf_counter() - start) * 1000)
+                result = get_header(headers, "x-cache") or "ORIGIN"
+                results[result] = results.get(result, 0) + 1
+                if not wants_keep_alive(version, headers):
+                    writer.close()
+                    connection = None
+            except (OSError, TypeError, asyncio.IncompleteReadError, HTTPError):
+                failures += 1
+                connection = None
+        if connection is not None:
+            connection[1].close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else 0.0
+
+    return {"rps": len(latencies) / elapsed, "p50_ms": pct(0.50), "p99_ms": pct(0.99),
+            "failures": failures, "results": results}
+
+
+def print_run(label, run):
+    print(f"  {label:<24} {run['rps']:7.0f} req/s | p50 {run['p50_ms']:6.2f} ms | "
+          f"p99 {run['p99_ms']:6.2f} ms | failures {run['failures']}")
+
+
+async def benchmark(requests=20_000, distinct=2_000, origin_delay=0.005, concurrency=50,
+                    max_bytes=2 * 1024 * 1024):
+    from http_caching import indexfilepath
+
+    origin = start_origin(origin_delay)
+    upstream = origin.server_address[:2]
+    page_size = os.path.getsize(indexfilepath)
+    paths = zipf_paths(requests, distinct)
+    try:
+        print(f"--- {requests} Zipf-distributed GETs over {distinct} URLs, {concurrency} "
+              f"keep-alive clients, origin delay {origin_delay * 1000:.0f} ms, "
+              f"cache {max_bytes // 1024} KiB ---")
+        print_run("direct to origin", await replay(upstream, paths, concurrency))
+
+        for label, max_ttl in (("via proxy", None), ("via proxy, max-ttl 0", 0)):
+            proxy = CachingProxy(upstream, ProxyCache(max_bytes), max_ttl=max_ttl)
+            address = await proxy.start(port=0)
+            # A cold-cache burst for one URL: every request but one should wait
+            burst = await replay(address, ["/burst"] * concurrency, concurrency)
+            coalesced = proxy.coalesced
+            run = await replay(address, paths, concurrency)
+            proxy.close()
+            print_run(label, run)
+            served = sum(run["results"].values()) + sum(burst["results"].values())
+            print(f"    origin requests {proxy.upstream_requests} of {served} "
+                  f"({1 - proxy.upstream_requests / served:.1%} offloaded), origin body bytes "
+                  f"{1 - proxy.upstream_bytes / (served * page_size):.1%} offloaded | "
+                  f"hits {proxy.hits}, misses {proxy.misses}, revalidated {proxy.revalidated}, "
+                  f"evictions {proxy.cache.evictions}")
+            print(f"    burst of {concurrency} cold requests for one URL: "
+                  f"{concurrency - coalesced} upstream fetch(es), {coalesced} coalesced | "
+                  f"origin connections opened {proxy.pool.opened}, reused {proxy.pool.reused}")
+    finally:
+        origin.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Caching reverse proxy for the lab-3 servers")
+    parser.add_argument("--listen", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--upstream", default="127.0.0.1:8080", help="origin host:port")
+    parser.add_argument("--max-bytes", type=int, default=64 * 1024 * 1024, help="cache size limit")
+    parser.add_argument("--max-connections", type=int, default=32,
+                        help="concurrent upstream requests")
+    parser.add_argument("--max-ttl", type=float, default=None,
+                        help="cap on freshness lifetimes in seconds (0 revalidates every request)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="replay requests against a local http_caching origin and exit")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        asyncio.run(benchmark())
+        return
+
+    host, _, port = args.upstream.rpartition(":")
+
+    async def serve():
+        proxy = CachingProxy((host, int(port)), ProxyCache(args.max_bytes),
+                             args.max_connections, args.max_ttl)
+        listen_host, listen_port = await proxy.start(args.listen, args.port)
+        metrics.start_from_env()
+        print(f"Proxying {listen_host}:{listen_port} -> {args.upstream} (Ctrl+C to stop)")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
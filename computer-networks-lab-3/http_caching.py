@@ -1,16 +1,33 @@
 import os
 import hashlib
-from http.server import SimpleHTTPRequestHandler
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from socketserver import TCPServer # NOTE: wrapper around socket for basic protocols
 from datetime import datetime, timezone
 import logging
+import sys
+
+# The repository root, for the shared common package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)  # Appended, so it cannot shadow anything
+from common import metrics
 
 indexfilepath = os.path.join(
     os.path.dirname(__file__), 
     'index.html'
 )
 
+REQUESTS = {status: metrics.counter("http_caching_requests_total", "Requests by status", status=str(status))
+            for status in (200, 304, 404)}
+CACHE_HITS = metrics.counter("http_caching_cache_hits_total", "Conditional GETs answered with 304")
+BYTES_SENT = metrics.counter("http_caching_body_bytes_total", "Response body bytes sent")
+LATENCY = metrics.histogram("http_caching_request_seconds", "Time to handle a GET")
+
 class CachingHTTPRequestHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # NOTE: keep-alive; every response below sets Content-Length
+    # Headers and body go out in separate writes; without TCP_NODELAY each
+    # response on a reused connection stalls ~40 ms on delayed ACKs
+    disable_nagle_algorithm = True
     def _get_etag(self, filepath: str):
         """Generate ETag using MD5 hash of file contents."""
         with open(filepath, 'rb') as f:
@@ -24,6 +41,10 @@ class CachingHTTPRequestHandler(SimpleHTTPRequestHandler):
 
     def do_GET(self):
         """Handle GET request with ETag and Last-Modified headers."""
+        with LATENCY.time():
+            self._handle_get()
+
+    def _handle_get(self):
         client_ip = self.client_address[0]  # Capture client IP address
         method = self.command
         url = self.path
@@ -32,6 +53,7 @@ class CachingHTTPRequestHandler(SimpleHTTPRequestHandler):
         if not os.path.exists(indexfilepath):
             logging.error(f"File not found: {indexfilepath}")
             self.send_error(404, "File not found")
+            REQUESTS[404].inc()
             logging.info(f"Request {method} {url} completed with status 404.")
             return
         
@@ -50,27 +72,35 @@ class CachingHTTPRequestHandler(SimpleHTTPRequestHandler):
             self.send_header('ETag', etag)
             self.send_header('Last-Modified', last_modified)
             self.end_headers()
+            REQUESTS[304].inc()
+            CACHE_HITS.inc()
             logging.info(f"Request {method} {url} completed with status 304.")
             return
         
         logging.info(f"Serving file: {indexfilepath} for {url}")
+        with open(indexfilepath, 'rb') as file:
+            body = file.read()
+
         self.send_response(200)
         self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
         self.send_header('ETag', etag)
         self.send_header('Last-Modified', last_modified)
         self.send_header('Cache-Control', 'public, max-age=86400') # NOTE: Cache for 1 day
         self.end_headers()
-        
-        with open(indexfilepath, 'rb') as file:
-            self.wfile.write(file.read())
+        self.wfile.write(body)
+        REQUESTS[200].inc()
+        BYTES_SENT.inc(len(body))
         logging.info(f"Request {method} {url} completed with status 200.")
 
 def main(host: str = '0.0.0.0', port: int = 8080):
     """Start the HTTP server."""
     server_address = (host, port)
     httpd: TCPServer | None = None
+    metrics.start_from_env()
     try:
-        httpd = TCPServer(server_address, CachingHTTPRequestHandler)
+        # One thread per connection, so an idle keep-alive client does not block the others
+        httpd = ThreadingHTTPServer(server_address, CachingHTTPRequestHandler)
         logging.info(f"Starting server on {host}:{port}...")
         httpd.serve_forever()
     except Exception as e:
@@ -1,7 +1,23 @@
+import os
+import sys
+import time
 import socket
 import logging
 import secrets
 
+# The repository root, for the shared common package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)  # Appended, so it cannot shadow anything
+from common import metrics
+
+CONNECTIONS = metrics.counter("http_cookies_connections_total", "Connections accepted")
+NEW_SESSIONS = metrics.counter("http_cookies_sessions_total", "Requests by session state", session="new")
+RETURNING = metrics.counter("http_cookies_sessions_total", "Requests by session state", session="returning")
+BYTES_IN = metrics.counter("http_cookies_bytes_received_total", "Request bytes read")
+BYTES_OUT = metrics.counter("http_cookies_bytes_sent_total", "Response bytes sent")
+LATENCY = metrics.histogram("http_cookies_request_seconds", "Time to read, parse and answer a request")
+
 def generate_session_id(length: int = 16) -> str:
     return secrets.token_hex(length)
 
@@ -17,13 +33,16 @@ def parse_headers(request: str) -> dict[str, str]: # HEADER IS LOWERED...
     return headers
 
 def handle_request(client_socket: socket.socket):
-    request = client_socket.recv(1024).decode()
+    data = client_socket.recv(1024)
+    BYTES_IN.inc(len(data))
+    request = data.decode()
 
     headers: dict[str, str] = parse_headers(request)
     cookies = headers.get("cookie", "")
 
     if "session_id" not in cookies:
         session_id = generate_session_id()
+        NEW_SESSIONS.inc()
         logging.info(f"New session created: {session_id}")
         response_body = f"Welcome, new user! Your session ID is {session_id}"
         response_headers = [
@@ -36,6 +55,7 @@ def handle_request(client_socket: socket.socket):
         ]
     else:
         session_id = cookies.split('=')[1]
+        RETURNING.inc()
         logging.info(f"Returning user with session ID: {session_id}")
         response_body = f"Welcome back, user with session ID {session_id}!"
         response_headers = [
@@ -46,23 +66,28 @@ def handle_request(client_socket: socket.socket):
             "\r\n"
         ]
         
-    response = "\r\n".join(response_headers) + "\r\n" + response_body
-    client_socket.sendall(response.encode())
+    response = ("\r\n".join(response_headers) + "\r\n" + response_body).encode()
+    client_socket.sendall(response)
+    BYTES_OUT.inc(len(response))
     client_socket.close()
     
 def mainloop(server_socket: socket.socket):
     while True:
         client_socket, client_address = server_socket.accept()
         logging.info(f"Connection from {client_address}")
+        CONNECTIONS.inc()
+        start = time.perf_counter()
         try: 
             handle_request(client_socket)
         finally:
             client_socket.close()
+            LATENCY.observe(time.perf_counter() - start)
 
 def start_server(host: str = '0.0.0.0', port: int = 8000):
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_socket.bind((host, port))
     server_socket.listen(5)
+    metrics.start_from_env()
     logging.info(f"Server started at {host}:{port}")
     try: 
         mainloop(server_socket)
@@ -0,0 +1,316 @@
+import math
+import random
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass
+
+from udp_batch_io import tune_socket, send_chunks, BatchReceiver
+from video_protocol import HEADER_SIZE, header_builder, parse_packet, FrameAssembler
+
+CHUNK_SIZE = 4096
+REPORT_INTERVAL = 1.0  # Seconds between receiver reports
+
+
+# 1. Receiver report (client -> server back channel)
+@dataclass
+class ReceiverReport:
+    """
+    Statistics the client sends back to the server once per interval.
+
+    Attributes:
+        loss_rate (float): Fraction of chunks lost during the interval.
+        jitter_ms (float): Interarrival jitter (RFC 3550 style), milliseconds.
+        decode_ms (float): Average time to decode one frame, milliseconds.
+        frames (int): Frames completed during the interval.
+    """
+    loss_rate: float
+    jitter_ms: float
+    decode_ms: float
+    frames: int
+
+    FORMAT = struct.Struct('!BfffI')
+    TYPE = 1  # Leading byte, so stray datagrams are told apart from reports
+
+    def pack(self) -> bytes:
+        return self.FORMAT.pack(self.TYPE, self.loss_rate, self.jitter_ms, self.decode_ms, self.frames)
+
+    @classmethod
+    def unpack(cls, data: bytes) -> 'ReceiverReport | None':
+        """
+        Returns None for anything that is not a well-formed report: the
+        wrong size, an unknown type, or non-finite statistics.
+        """
+        if len(data) != cls.FORMAT.size:
+            return None
+        kind, *fields = cls.FORMAT.unpack(data)
+        if kind != cls.TYPE or not all(math.isfinite(f) for f in fields[:3]):
+            return None
+        return cls(*fields)
+
+
+class ReceiverStats:
+    """
+    Turns FrameAssembler counters into one ReceiverReport per interval.
+    """
+
+    def __init__(self, assembler: FrameAssembler):
+        self.assembler = assembler
+        self.jitter = 0.0
+        self.last_transit = None
+        self.decode_total = 0.0
+        self.decode_frames = 0
+        self._last_expected = 0
+        self._last_received = 0
+        self._last_completed = 0
+
+    def on_packet(self, send_time: float):
+        """Updates the jitter estimate from a datagram's send timestamp."""
+        transit = time.time() - send_time
+        if self.last_transit is not None:
+            # J = J + (|D| - J) / 16, as in RFC 3550
+            self.jitter += (abs(transit - self.last_transit) - self.jitter) / 16
+        self.last_transit = transit
+
+    def on_decode(self, seconds: float):
+        self.decode_total += seconds
+        self.decode_frames += 1
+
+    def make_report(self) -> ReceiverReport:
+        """Builds a report for everything since the previous call."""
+        a = self.assembler
+        expected = a.chunks_expected - self._last_expected
+        received = a.chunks_received - self._last_received
+        frames = a.frames_completed - self._last_completed
+        self._last_expected = a.chunks_expected
+        self._last_received = a.chunks_received
+        self._last_completed = a.frames_completed
+
+        loss = 1.0 - received / expected if expected else 0.0
+        decode_ms = self.decode_total / self.decode_frames * 1000 if self.decode_frames else 0.0
+        self.decode_total = 0.0
+        self.decode_frames = 0
+        return ReceiverReport(loss, self.jitter * 1000, decode_ms, frames)
+
+
+# 2. Sender-side controller
+@dataclass
+class StreamLevel:
+    """
+    One rung of the quality ladder.
+
+    Attributes:
+        width (int): Frame width after resize.
+        height (int): Frame height after resize.
+        quality (int): JPEG quality passed to cv2.IMWRITE_JPEG_QUALITY.
+        fps (int): Target frames per second.
+    """
+    width: int
+    height: int
+    quality: int
+    fps: int
+
+
+# Ordered from lowest to highest bitrate; the original server used 640x480
+# at OpenCV's default quality (95) and ~30 FPS, which is the top rung.
+DEFAULT_LEVELS = [
+    StreamLevel(320, 240, 40, 15),
+    StreamLevel(320, 240, 60, 20),
+    StreamLevel(480, 360, 60, 25),
+    StreamLevel(640, 480, 70, 30),
+    StreamLevel(640, 480, 85, 30),
+    StreamLevel(640, 480, 95, 30),
+]
+
+
+class BitrateController:
+    """
+    Picks a StreamLevel from receiver reports.
+
+    Steps down one level as soon as loss exceeds the target (or the client
+    cannot decode frames within the frame interval), and steps up one level
+    only after `hold` consecutive clean reports, so the stream does not
+    oscillate around the link capacity.
+    """
+
+    def __init__(self, levels: list = None, target_loss: float = 0.02,
+                 hold: int = 3, start_level: int = None):
+        """
+        Args:
+            levels: Quality ladder, lowest bitrate first.
+            target_loss: Loss rate the controller tries to stay under.
+            hold: Clean reports required before stepping up.
+            start_level: Index to start at (defaults to the top rung).
+        """
+        self.levels = levels or DEFAULT_LEVELS
+        self.target_loss = target_loss
+        self.hold = hold
+        self.index = len(self.levels) - 1 if start_level is None else start_level
+        self.clean_reports = 0
+
+    @property
+    def level(self) -> StreamLevel:
+        return self.levels[self.index]
+
+    def on_report(self, report: ReceiverReport) -> StreamLevel:
+        """Updates the current level from one report and returns it."""
+        frame_budget_ms = 1000 / self.level.fps
+        congested = (report.loss_rate > self.target_loss
+                     or report.decode_ms > frame_budget_ms)
+
+        if congested:
+            self.clean_reports = 0
+            if self.index > 0:
+                self.index -= 1
+        elif report.loss_rate <= self.target_loss / 2:
+            self.clean_reports += 1
+            if self.clean_reports >= self.hold and self.index < len(self.levels) - 1:
+                self.index += 1
+                self.clean_reports = 0
+        else:
+            self.clean_reports = 0
+        return self.level
+
+
+def poll_reports(sock: socket.socket, controller: BitrateController) -> list:
+    """
+    Applies every report waiting on a non-blocking socket to the controller;
+    datagrams that are not well-formed reports are skipped.
+
+    Returns:
+        The reports that were applied (usually zero or one).
+    """
+    reports = []
+    while True:
+        try:
+            data, _ = sock.recvfrom(64)
+        except (BlockingIOError, socket.timeout):
+            return reports
+        report = ReceiverReport.unpack(data)
+        if report is None:
+            continue  # Not a report (anyone can reach this port); ignore it
+        controller.on_report(report)
+        reports.append(report)
+
+
+# --- Loopback test with an injected-loss stand-in ---
+
+class BottleneckLink:
+    """
+    Stand-in for a constrained network path, wrapped around a UDP socket.
+
+    Datagrams are forwarded only while a token bucket of `capacity` bytes/sec
+    has room (anything beyond that is dropped, as an overflowing router queue
+    would), plus an independent random loss of `random_loss`.
+    """
+
+    def __init__(self, sock: socket.socket, capacity: float, burst: float = None,
+                 random_loss: float = 0.0, seed: int = 0):
+        self.sock = sock
+        self.capacity = capacity
+        self.burst = burst or capacity / 10
+        self.tokens = self.burst
+        self.last = time.perf_counter()
+        self.random_loss = random_loss
+        self.rng = random.Random(seed)
+
+    def sendmsg(self, buffers, ancdata, flags, addr):
+        now = time.perf_counter()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.capacity)
+        self.last = now
+
+        size = sum(len(b) for b in buffers)
+        if self.tokens < size or self.rng.random() < self.random_loss:
+            return size  # Dropped
+        self.tokens -= size
+        return self.sock.sendmsg(buffers, ancdata, flags, addr)
+
+    def sendto(self, data, addr):
+        return self.sendmsg([data], [], 0, addr)
+
+
+def estimate_frame_bytes(level: StreamLevel) -> int:
+    """
+    Rough JPEG size of a level, used when no real encoder is available.
+    Bits per pixel grows from ~0.6 at quality 40 to ~2.0 at quality 95.
+    """
+    bits_per_pixel = 0.6 + (level.quality - 40) / 55 * 1.4
+    return int(level.width * level.height * bits_per_pixel / 8)
+
+
+def run_loopback_test(capacity: float = 1_000_000, duration: float = 12.0,
+                      random_loss: float = 0.0, target_loss: float = 0.02) -> list:
+    """
+    Streams synthetic frames through a BottleneckLink and lets the controller
+    adapt, with the client sending receiver reports back over loopback.
+
+    Args:
+        capacity: Bottleneck rate in bytes/sec.
+        duration: Seconds to stream.
+        random_loss: Extra random loss on top of the bottleneck.
+        target_loss: Controller loss target.
+
+    Returns:
+        A list of (elapsed_sec, report, level) tuples, one per report.
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    tune_socket(server)
+    tune_socket(client)
+    server.bind(('127.0.0.1', 0))
+    client.bind(('127.0.0.1', 0))
+    client_addr = client.getsockname()
+    server_addr = server.getsockname()
+    server.setblocking(False)
+
+    link = BottleneckLink(server, capacity, random_loss=random_loss)
+    controller = BitrateController(target_loss=target_loss)
+    history = []
+    start = time.perf_counter()
+    done = threading.Event()
+
+    def client_loop():
+        assembler = FrameAssembler()
+        stats = ReceiverStats(assembler)
+        receiver = BatchReceiver(client, CHUNK_SIZE, HEADER_SIZE)
+        next_report = time.perf_counter() + REPORT_INTERVAL
+        while not done.is_set():
+            for packet in receiver.recv_batch(timeout=0.1):
+                stats.on_packet(parse_packet(packet)[4])
+                frame = assembler.add(packet)
+                if frame is not None:
+                    t0 = time.perf_counter()
+                    bytes(frame[1])  # Stand-in for cv2.imdecode
+                    stats.on_decode(time.perf_counter() - t0)
+            if time.perf_counter() >= next_report:
+                client.sendto(stats.make_report().pack(), server_addr)
+                next_report += REPORT_INTERVAL
+
+    thread = threading.Thread(target=client_loop)
+    thread.start()
+
+    frame_id = 0
+    while time.perf_counter() - start < duration:
+        for report in poll_reports(server, controller):
+            history.append((time.perf_counter() - start, report, controller.level))
+        level = controller.level
+        payload = bytes(estimate_frame_bytes(level))
+        send_chunks(link, client_addr, payload, CHUNK_SIZE, header_builder(frame_id))
+        frame_id += 1
+        time.sleep(1 / level.fps)
+
+    done.set()
+    thread.join()
+    server.close()
+    client.close()
+    return history
+
+
+if __name__ == "__main__":
+    print("--- Adaptive Bitrate Loopback Test (1 MB/s bottleneck, 2% target) ---")
+    for elapsed, report, level in run_loopback_test():
+        print(f"t={elapsed:5.1f}s | loss {report.loss_rate:6.1%} | "
+              f"jitter {report.jitter_ms:6.2f} ms | decode {report.decode_ms:5.2f} ms | "
+              f"frames {report.frames:3d} -> {level.width}x{level.height} "
+              f"q{level.quality} @ {level.fps} fps")
@@ -1,33 +1,30 @@
-import cv2
-import socket
-import numpy as np
+import os
+import sys
+
+from video_stream import DisplayReceiver, HeadlessReceiver
+
+# The repository root, for the shared common package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)  # Appended, so it cannot shadow anything
+from common import metrics
 
 # Client configuration
 CLIENT_IP = '127.0.0.1'
 CLIENT_PORT = 9999
 CHUNK_SIZE = 4096
+HEADLESS = False  # True: only decode and record latency (no window needed)
 
-# Create UDP socket and bind
-sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-sock.bind((CLIENT_IP, CLIENT_PORT))
-
-buffer = b''
-
-while True:
-    packet, _ = sock.recvfrom(CHUNK_SIZE + 1)
-    marker = packet[0]
-    data = packet[1:]
-    buffer += data
-
-    if marker == 1:
-        # Decode and display frame
-        frame = cv2.imdecode(np.frombuffer(buffer, dtype=np.uint8), cv2.IMREAD_COLOR)
-        if frame is not None:
-            cv2.imshow('UDP Video Stream', frame)
-        buffer = b''
+receiver_class = HeadlessReceiver if HEADLESS else DisplayReceiver
+receiver = receiver_class((CLIENT_IP, CLIENT_PORT), CHUNK_SIZE)
+metrics.start_from_env()  # METRICS_PORT=9101 serves /metrics
 
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+try:
+    receiver.run()  # Press 'q' in the video window to quit
+except KeyboardInterrupt:
+    pass
+finally:
+    receiver.close()
 
-sock.close()
-cv2.destroyAllWindows()
+if HEADLESS:
+    print(receiver.summary())
@@ -1,35 +1,34 @@
-import cv2
-import socket
-import time
+import os
+import sys
+
+from adaptive_bitrate import BitrateController
+from video_stream import VideoSender, VideoFileSource, SyntheticFrameSource
+
+# The repository root, for the shared common package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)  # Appended, so it cannot shadow anything
+from common import metrics
 
 # Server configuration
 SERVER_IP = '127.0.0.1'
 SERVER_PORT = 9999
+REPORT_PORT = 9998  # Receiver reports from the client arrive here
 CHUNK_SIZE = 4096
-
-# Create UDP socket
-sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-
-# Open video file
-cap = cv2.VideoCapture('Space_invader_turtorial.mp4')  # Replace with your video file path
-
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    # Resize and encode frame
-    frame = cv2.resize(frame, (640, 480))
-    encoded, buffer = cv2.imencode('.jpg', frame)
-    data = buffer.tobytes()
-
-    # Split into chunks
-    for i in range(0, len(data), CHUNK_SIZE):
-        chunk = data[i:i+CHUNK_SIZE]
-        marker = b'\x01' if i + CHUNK_SIZE >= len(data) else b'\x00'
-        sock.sendto(marker + chunk, (SERVER_IP, SERVER_PORT))
-
-    time.sleep(1/30)  # Maintain ~30 FPS
-
-cap.release()
-sock.close()
+USE_GSO = False     # Hand whole frames to the kernel with UDP GSO (Linux)
+TARGET_LOSS = 0.02  # Adaptive bitrate keeps chunk loss under 2%
+FEC_GROUP_SIZE = 4  # One XOR parity chunk per 4 data chunks (0 disables FEC)
+VIDEO_FILE = 'Space_invader_turtorial.mp4'  # Replace with your video file path, or None for synthetic frames
+
+sender = VideoSender((SERVER_IP, SERVER_PORT), bind=(SERVER_IP, REPORT_PORT),
+                     chunk_size=CHUNK_SIZE, fec_group_size=FEC_GROUP_SIZE,
+                     controller=BitrateController(target_loss=TARGET_LOSS),
+                     use_gso=USE_GSO)
+
+source = VideoFileSource(VIDEO_FILE) if VIDEO_FILE else SyntheticFrameSource()
+metrics.start_from_env()  # METRICS_PORT=9100 serves /metrics
+
+try:
+    sender.stream(source)  # Paced at the controller's frame rate (~30 FPS)
+finally:
+    sender.close()
@@ -0,0 +1,148 @@
+import struct
+import time
+from dataclasses import dataclass, field
+
+# Every datagram starts with this header, followed by a chunk of JPEG data:
+#   flags      (1 byte)  bit 0 = last chunk of the frame
+#                        bit 1 = FEC parity chunk (see fec.py)
+#   frame_id   (4 bytes) increases by one per frame
+#   index      (2 bytes) position of this chunk in the frame
+#   count      (2 bytes) number of chunks in the frame
+#   send_time  (8 bytes) sender wall clock, used for jitter/latency
+HEADER = struct.Struct('!BIHHd')
+HEADER_SIZE = HEADER.size
+
+FLAG_LAST = 0x01
+FLAG_PARITY = 0x02
+
+
+def header_builder(frame_id: int, send_time: float | None = None):
+    """
+    Returns a make_header(index, count) callable for udp_batch_io.send_chunks().
+
+    All chunks of a frame share the same frame_id and send_time.
+    """
+    if send_time is None:
+        send_time = time.time()
+
+    def make_header(index: int, count: int) -> bytes:
+        flags = FLAG_LAST if index == count - 1 else 0
+        return HEADER.pack(flags, frame_id & 0xFFFFFFFF, index, count, send_time)
+
+    return make_header
+
+
+def parse_packet(packet):
+    """
+    Splits a datagram into its header fields and payload.
+
+    Returns:
+        (flags, frame_id, index, count, send_time, payload) where payload is
+        a memoryview into the packet.
+    """
+    view = memoryview(packet)
+    flags, frame_id, index, count, send_time = HEADER.unpack_from(view)
+    return flags, frame_id, index, count, send_time, view[HEADER_SIZE:]
+
+
+@dataclass
+class PendingFrame:
+    """
+    A frame whose chunks are still arriving.
+
+    Attributes:
+        count (int): Number of data chunks in the frame.
+        send_time (float): Sender timestamp from the header.
+        chunks (dict): index -> payload bytes of data chunks received.
+        parity (dict): group -> payload bytes of FEC parity chunks received.
+        recovered (int): Data chunks rebuilt from parity rather than received.
+    """
+    count: int
+    send_time: float
+    chunks: dict = field(default_factory=dict)
+    parity: dict = field(default_factory=dict)
+    recovered: int = 0
+
+
+class FrameAssembler:
+    """
+    Reassembles frames from chunks that may arrive lost or out of order.
+
+    Unlike the original marker-byte client, a lost chunk only drops its own
+    frame: chunks are placed by index, and a frame is given up once a frame
+    `max_pending` ids newer has started arriving.
+    """
+
+    def __init__(self, max_pending: int = 2):
+        self.max_pending = max_pending
+        self.pending = {}  # frame_id -> PendingFrame
+        self.finished = set()  # Recently completed ids, to ignore stragglers
+        self.last_frame_id = -1
+        self.frames_completed = 0
+        self.frames_dropped = 0
+        self.chunks_received = 0
+        self.chunks_expected = 0
+
+    def add(self, packet):
+        """
+        Adds one datagram.
+
+        Returns:
+            (frame_id, frame_bytes, send_time) when this chunk completes a
+            frame, otherwise None.
+        """
+        flags, frame_id, index, count, send_time, payload = parse_packet(packet)
+        frame = self._pending_frame(frame_id, count, send_time)
+        if frame is None:
+            return None
+        frame.chunks[index] = bytes(payload)
+        return self._finish_if_complete(frame_id, frame)
+
+    def _pending_frame(self, frame_id: int, count: int, send_time: float):
+        """
+        (Private) Returns the PendingFrame for frame_id, creating it if
+        needed, or None if the frame is too old to be worth assembling.
+        """
+        if frame_id <= self.last_frame_id - self.max_pending or frame_id in self.finished:
+            return None  # Late chunk of a frame we already finished or gave up on
+
+        if frame_id > self.last_frame_id:
+            # Whole frames that never showed up at all
+            if self.last_frame_id >= 0:
+                skipped = frame_id - self.last_frame_id - 1
+                self.frames_dropped += skipped
+                self.chunks_expected += skipped * count
+            self.last_frame_id = frame_id
+            self._expire(frame_id)
+
+        frame = self.pending.get(frame_id)
+        if frame is None:
+            frame = self.pending[frame_id] = PendingFrame(count, send_time)
+        return frame
+
+    def _finish_if_complete(self, frame_id: int, frame: PendingFrame):
+        """(Private) Joins the frame once every data chunk is present."""
+        if len(frame.chunks) < frame.count:
+            return None
+        del self.pending[frame_id]
+        self.finished.add(frame_id)
+        self.frames_completed += 1
+        self.chunks_expected += frame.count
+        self.chunks_received += frame.count - frame.recovered
+        chunks = frame.chunks
+        return frame_id, b''.join(chunks[i] for i in range(frame.count)), frame.send_time
+
+    def _expire(self, newest_id: int):
+        """(Private) Drops incomplete frames that fell out of the window."""
+        self.finished = {f for f in self.finished if f > newest_id - self.max_pending}
+        for frame_id in [f for f in self.pending if f <= newest_id - self.max_pending]:
+            frame = self.pending.pop(frame_id)
+            self.frames_dropped += 1
+            self.chunks_expected += frame.count
+            self.chunks_received += len(frame.chunks) - frame.recovered
+
+    def loss_rate(self) -> float:
+        """Fraction of chunks of finished frames that never arrived."""
+        if self.chunks_expected == 0:
+            return 0.0
+        return 1.0 - self.chunks_received / self.chunks_expected
@@ -0,0 +1,383 @@
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from udp_batch_io import tune_socket, gso_supported, BatchReceiver
+from video_protocol import HEADER_SIZE, parse_packet
+from fec import send_frame_fec, FecFrameAssembler, PARITY_PREFIX
+from adaptive_bitrate import (BitrateController, ReceiverStats, poll_reports,
+                              REPORT_INTERVAL)
+# The repository root, for the shared common package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)  # Appended, so it cannot shadow anything
+from common import metrics
+
+CHUNK_SIZE = 4096
+
+FRAMES_SENT = metrics.counter("video_sender_frames_total", "Frames encoded and sent")
+BYTES_SENT = metrics.counter("video_sender_bytes_total", "Encoded frame bytes sent (before FEC)")
+ENCODE_SECONDS = metrics.histogram("video_sender_encode_seconds", "Resize + JPEG encode time per frame")
+SEND_SECONDS = metrics.histogram("video_sender_send_seconds", "Time to hand one frame's datagrams to the kernel")
+FRAMES_DROPPED = metrics.counter("video_sender_frames_dropped_total", "Frames cut short by a full send buffer")
+PACKETS_RECEIVED = metrics.counter("video_receiver_packets_total", "Datagrams received")
+DECODE_SECONDS = metrics.histogram("video_receiver_decode_seconds", "JPEG decode time per frame")
+FRAME_LATENCY = metrics.histogram("video_receiver_frame_latency_seconds",
+                                  "Capture-to-decode latency (sender and receiver clocks must agree)")
+
+
+# 1. Frame sources
+class SyntheticFrameSource:
+    """
+    Generates BGR frames with NumPy, so no video file is needed.
+
+    Each frame is a moving colour gradient with a bouncing square and a
+    little noise, which gives the JPEG encoder realistic work (neither a
+    flat image nor pure noise).
+    """
+
+    def __init__(self, width: int = 640, height: int = 480, frames: int = 300,
+                 seed: int = 0):
+        self.width = width
+        self.height = height
+        self.frames = frames
+        self.rng = np.random.default_rng(seed)
+        # Precompute the static parts once; per-frame work is just a shift
+        x = np.linspace(0, 255, width, dtype=np.float32)
+        y = np.linspace(0, 255, height, dtype=np.float32)
+        self.gradient = np.empty((height, width, 3), dtype=np.uint8)
+        self.gradient[..., 0] = x[None, :].astype(np.uint8)
+        self.gradient[..., 1] = y[:, None].astype(np.uint8)
+        self.gradient[..., 2] = ((x[None, :] + y[:, None]) / 2).astype(np.uint8)
+
+    def __iter__(self):
+        size = min(self.width, self.height) // 6
+        for i in range(self.frames):
+            frame = np.roll(self.gradient, i * 4, axis=1)
+            x = (i * 7) % (self.width - size)
+            y = (i * 5) % (self.height - size)
+            frame[y:y + size, x:x + size] = 255
+            noise = self.rng.integers(0, 16, size=frame.shape, dtype=np.uint8)
+            yield frame + noise
+
+
+class VideoFileSource:
+    """Reads frames from a video file with OpenCV (the original lab-4 source)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __iter__(self):
+        cap = cv2.VideoCapture(self.path)
+        try:
+            while cap.isOpened():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield frame
+        finally:
+            cap.release()
+
+
+# 2. Sender
+class VideoSender:
+    """
+    Encodes frames to JPEG and streams them over UDP.
+
+    Uses the batched datagram path, optional FEC parity, and an adaptive
+    bitrate controller fed by receiver reports arriving on the same socket.
+    """
+
+    def __init__(self, dest: tuple, bind: tuple = ('127.0.0.1', 0),
+                 chunk_size: int = CHUNK_SIZE, fec_group_size: int = 4,
+                 controller: BitrateController | None = None, use_gso: bool = False):
+        """
+        Args:
+            dest: (ip, port) of the receiver.
+            bind: Local (ip, port); receiver reports are sent back here.
+            chunk_size: Payload bytes per datagram.
+            fec_group_size: Data chunks per parity chunk (0 disables FEC).
+            controller: Adaptive bitrate controller (a default one if None).
+            use_gso: Use UDP GSO when the kernel supports it.
+        """
+        self.dest = dest
+        self.chunk_size = chunk_size
+        self.fec_group_size = fec_group_size
+        self.controller = controller or BitrateController()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        tune_socket(self.sock)
+        self.sock.bind(bind)
+        self.sock.setblocking(False)
+        self.use_gso = use_gso and gso_supported(self.sock)
+        self.frame_id = 0
+        self.bytes_sent = 0
+        self.frames_dropped = 0
+        # Labelled by local address, so several senders in one process each
+        # export their own level
+        self.metric_labels = {"sender": "%s:%d" % self.sock.getsockname()}
+        metrics.gauge("video_sender_quality", "Current JPEG quality",
+                      fn=lambda: self.controller.level.quality, **self.metric_labels)
+        metrics.gauge("video_sender_height", "Current frame height",
+                      fn=lambda: self.controller.level.height, **self.metric_labels)
+
+    def send_frame(self, frame) -> int:
+        """
+        Resizes, encodes and sends one frame at the controller's level.
+
+        Returns:
+            The encoded frame size in bytes.
+        """
+        capture_time = time.time()
+        poll_reports(self.sock, self.controller)
+        level = self.controller.level
+        start = time.perf_counter()
+        if frame.shape[1] != level.width or frame.shape[0] != level.height:
+            frame = cv2.resize(frame, (level.width, level.height))
+        encoded, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, level.quality])
+        encoded_at = time.perf_counter()
+        ENCODE_SECONDS.observe(encoded_at - start)
+
+        try:
+            send_frame_fec(self.sock, self.dest, buffer, self.frame_id, self.chunk_size,
+                           self.fec_group_size, gso=self.use_gso, send_time=capture_time)
+        except BlockingIOError:
+            # The socket is non-blocking (for poll_reports) and a burst filled
+            # the send buffer: drop the rest of this frame instead of stalling
+            # capture. The receiver gives up on it, and the loss it reports
+            # makes the controller back off.
+            self.frame_id += 1
+            self.frames_dropped += 1
+            FRAMES_DROPPED.inc()
+            return buffer.size
+        SEND_SECONDS.observe(time.perf_counter() - encoded_at)
+        self.frame_id += 1
+        self.bytes_sent += buffer.size
+        FRAMES_SENT.inc()
+        BYTES_SENT.inc(buffer.size)
+        return buffer.size
+
+    def stream(self, source, pace: bool = True):
+        """
+        Sends every frame from a source.
+
+        Args:
+            source: Iterable of BGR frames.
+            pace: Sleep to hold the controller's frame rate (False sends as
+                fast as frames can be encoded).
+        """
+        for frame in source:
+            start = time.perf_counter()
+            self.send_frame(frame)
+            if pace:
+                remaining = 1 / self.controller.level.fps - (time.perf_counter() - start)
+                if remaining > 0:
+                    time.sleep(remaining)
+
+    def close(self):
+        for name in ("video_sender_quality", "video_sender_height"):
+            metrics.unregister(name, **self.metric_labels)
+        self.sock.close()
+
+
+# 3. Receivers
+class VideoReceiver:
+    """
+    Receives, reassembles (with FEC recovery) and decodes frames, and sends
+    receiver reports back to the sender. Subclasses decide what to do with
+    each decoded frame in on_frame().
+    """
+
+    def __init__(self, bind: tuple = ('127.0.0.1', 9999), chunk_size: int = CHUNK_SIZE):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        tune_socket(self.sock)
+        self.sock.bind(bind)
+        self.address = self.sock.getsockname()
+        self.receiver = BatchReceiver(self.sock, chunk_size, HEADER_SIZE + PARITY_PREFIX.size)
+        self.assembler = FecFrameAssembler()
+        self.stats = ReceiverStats(self.assembler)
+        self.stopped = threading.Event()
+        # The assembler already counts these; export them without extra work
+        assembler = self.assembler
+        self.metric_labels = {"receiver": "%s:%d" % self.address}
+        metrics.counter("video_receiver_frames_completed_total", "Frames reassembled",
+                        fn=lambda: assembler.frames_completed, **self.metric_labels)
+        metrics.counter("video_receiver_frames_dropped_total", "Frames given up on (missing chunks)",
+                        fn=lambda: assembler.frames_dropped, **self.metric_labels)
+        metrics.counter("video_receiver_chunks_recovered_total", "Chunks rebuilt from FEC parity",
+                        fn=lambda: assembler.chunks_recovered, **self.metric_labels)
+
+    def on_frame(self, frame_id: int, image, send_time: float) -> bool:
+        """Handles one decoded frame. Returns False to stop receiving."""
+        return True
+
+    def run(self, max_frames: int | None = None, idle_timeout: float | None = None):
+        """
+        Receives until stop() is called, max_frames frames were decoded, or
+        nothing arrived for idle_timeout seconds.
+        """
+        frames = 0
+        next_report = time.perf_counter() + REPORT_INTERVAL
+        last_packet = time.perf_counter()
+        wait = REPORT_INTERVAL if idle_timeout is None else min(REPORT_INTERVAL, idle_timeout)
+
+        while not self.stopped.is_set():
+            packets = self.receiver.recv_batch(timeout=wait)
+            now = time.perf_counter()
+            if packets:
+                last_packet = now
+                PACKETS_RECEIVED.inc(len(packets))
+            elif idle_timeout is not None and now - last_packet >= idle_timeout:
+                break
+
+            for packet in packets:
+                self.stats.on_packet(parse_packet(packet)[4])
+                completed = self.assembler.add(packet)
+                if completed is None:
+                    continue
+                frame_id, data, send_time = completed
+
+                start = time.perf_counter()
+                image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+                decode_time = time.perf_counter() - start
+                self.stats.on_decode(decode_time)
+                DECODE_SECONDS.observe(decode_time)
+                if image is None:
+                    continue
+                FRAME_LATENCY.observe(time.time() - send_time)
+                frames += 1
+                if not self.on_frame(frame_id, image, send_time) or frames == max_frames:
+                    self.stopped.set()
+                    break
+
+            if self.receiver.peer is not None and now >= next_report:
+                self.sock.sendto(self.stats.make_report().pack(), self.receiver.peer)
+                next_report = now + REPORT_INTERVAL
+
+    def stop(self):
+        self.stopped.set()
+
+    def close(self):
+        for name in ("video_receiver_frames_completed_total", "video_receiver_frames_dropped_total",
+                     "video_receiver_chunks_recovered_total"):
+            metrics.unregister(name, **self.metric_labels)
+        self.sock.close()
+
+
+class DisplayReceiver(VideoReceiver):
+    """Shows frames in an OpenCV window; press 'q' to quit."""
+
+    def on_frame(self, frame_id, image, send_time):
+        cv2.imshow('UDP Video Stream', image)
+        return not (cv2.waitKey(1) & 0xFF == ord('q'))
+
+    def close(self):
+        super().close()
+        cv2.destroyAllWindows()
+
+
+class HeadlessReceiver(VideoReceiver):
+    """
+    Decodes frames without displaying them and records per-frame
+    end-to-end latency (capture on the sender to decoded on the receiver).
+    """
+
+    def __init__(self, bind: tuple = ('127.0.0.1', 0), chunk_size: int = CHUNK_SIZE):
+        super().__init__(bind, chunk_size)
+        self.latencies = []
+        self.first_frame = None
+        self.last_frame = None
+        self.pixels = 0
+
+    def on_frame(self, frame_id, image, send_time):
+        now = time.time()
+        self.latencies.append(now - send_time)
+        if self.first_frame is None:
+            self.first_frame = now
+        self.last_frame = now
+        self.pixels += image.shape[0] * image.shape[1]
+        return True
+
+    def summary(self) -> dict:
+        """Latency percentiles (ms), frame rate and goodput of the run."""
+        if not self.latencies:
+            return {'frames': 0}
+        lat = np.array(self.latencies) * 1000
+        elapsed = max(self.last_frame - self.first_frame, 1e-9)
+        return {
+            'frames': len(self.latencies),
+            'frames_dropped': self.assembler.frames_dropped,
+            'chunks_recovered': self.assembler.chunks_recovered,
+            'latency_p50_ms': float(np.percentile(lat, 50)),
+            'latency_p99_ms': float(np.percentile(lat, 99)),
+            'latency_max_ms': float(lat.max()),
+            'fps': (len(self.latencies) - 1) / elapsed,
+            'megapixels_per_sec': self.pixels / elapsed / 1e6,
+        }
+
+
+# --- Loopback benchmark for CI ---
+
+def run_loopback_benchmark(frames: int = 300, width: int = 640, height: int = 480,
+                           pace: bool = False, fec_group_size: int = 4,
+                           render_metrics: bool = False) -> dict:
+    """
+    Streams synthetic frames to a HeadlessReceiver over 127.0.0.1.
+
+    Returns:
+        The receiver summary plus the sender's encoded megabytes per second
+        (and, with render_metrics, the exported metrics text as 'metrics').
+    """
+    receiver = HeadlessReceiver()
+    thread = threading.Thread(target=receiver.run,
+                              kwargs={'max_frames': frames, 'idle_timeout': 2.0})
+    thread.start()
+
+    sender = VideoSender(receiver.address, fec_group_size=fec_group_size)
+    start = time.perf_counter()
+    sender.stream(SyntheticFrameSource(width, height, frames), pace=pace)
+    send_elapsed = time.perf_counter() - start
+    thread.join()
+
+    result = receiver.summary()
+    result['sender_mb_per_sec'] = sender.bytes_sent / send_elapsed / 1e6
+    result['sender_frames_dropped'] = sender.frames_dropped
+    if render_metrics:
+        result['metrics'] = metrics.REGISTRY.render()  # Before close() unregisters the instances
+    sender.close()
+    receiver.close()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless UDP video loopback benchmark")
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--pace', action='store_true', help="hold the controller's frame rate")
+    parser.add_argument('--fec-group', type=int, default=4)
+    parser.add_argument('--min-fps', type=float, default=0, help="fail if slower (CI gate)")
+    parser.add_argument('--max-p99-ms', type=float, default=0, help="fail if slower (CI gate)")
+    parser.add_argument('--metrics', action='store_true', help="print the exported metrics afterwards")
+    args = parser.parse_args()
+
+    result = run_loopback_benchmark(args.frames, pace=args.pace, fec_group_size=args.fec_group,
+                                    render_metrics=args.metrics)
+    metrics_text = result.pop('metrics', None)
+    print("--- Headless UDP Video Loopback Benchmark ---")
+    for key, value in result.items():
+        print(f"  {key:>20}: {value:.2f}" if isinstance(value, float) else f"  {key:>20}: {value}")
+    if metrics_text:
+        print(metrics_text)
+
+    failed = result.get('frames', 0) == 0
+    if args.min_fps and result.get('fps', 0) < args.min_fps:
+        print(f"FAIL: fps below {args.min_fps}")
+        failed = True
+    if args.max_p99_ms and result.get('latency_p99_ms', float('inf')) > args.max_p99_ms:
+        print(f"FAIL: p99 latency above {args.max_p99_ms} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,487 @@
+# aqm.py
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from collections import deque
+
+import lab8_import  # noqa: F401  (makes the *.py.py lab modules importable)
+from scheduler import Packet, fifo_scheduler, priority_scheduler
+
+# The repository root, for the shared common package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)  # Appended, so it cannot shadow anything
+from common.metrics import Histogram
+
+MTU = 1500
+
+
+# 1. Drop policies
+class TailDrop:
+    """
+    No early drops: packets are only lost when the buffer is full (the
+    bound itself is enforced by BoundedQueue for every policy).
+    """
+    name = "taildrop"
+
+    def admit(self, queue, now, size) -> bool:
+        return True
+
+    def dequeue(self, queue, now):
+        return queue.pop(now)
+
+
+class RED:
+    """
+    Random Early Detection (Floyd & Jacobson, 1993).
+
+    Tracks an EWMA of the queue length and drops arriving packets with a
+    probability that grows linearly from 0 at min_th to max_p at max_th
+    (spread out with the count since the last drop); above max_th every
+    arrival is dropped, or with "gentle" RED the probability keeps
+    rising to 1 at 2 * max_th.
+    """
+    name = "red"
+
+    def __init__(self, min_th=None, max_th=None, max_p=0.1, weight=0.002, gentle=True,
+                 limit=1000, mean_packet_time=None, seed=1):
+        """
+        Args:
+            min_th, max_th: Average-queue thresholds in packets (default
+                10% and 30% of the buffer limit).
+            max_p: Drop probability at max_th.
+            weight: EWMA weight for the average queue length.
+            gentle: Ramp from max_p to 1 between max_th and 2 * max_th
+                instead of dropping everything above max_th.
+            limit: Buffer limit, used for the default thresholds.
+            mean_packet_time: Transmission time of a typical packet; lets
+                the average decay while the queue sits empty.
+            seed: Seed for the drop decisions (runs are reproducible).
+        """
+        self.min_th = min_th if min_th is not None else max(1, limit * 0.1)
+        self.max_th = max_th if max_th is not None else max(self.min_th + 1, limit * 0.3)
+        self.max_p = max_p
+        self.weight = weight
+        self.gentle = gentle
+        self.mean_packet_time = mean_packet_time
+        self.avg = 0.0
+        self.count = -1  # Packets since the last drop (-1: not in the drop region)
+        self.idle_since = None
+        self.rng = random.Random(seed)
+
+    def admit(self, queue, now, size) -> bool:
+        length = len(queue)
+        if length:
+            self.avg += self.weight * (length - self.avg)
+        else:
+            # The queue was empty: age the average as if idle_time / packet
+            # time empty-queue samples had been taken
+            if self.idle_since is not None and self.mean_packet_time:
+                m = (now - self.idle_since) / self.mean_packet_time
+                self.avg *= (1 - self.weight) ** m
+            else:
+                self.avg += self.weight * (length - self.avg)
+            self.idle_since = None
+
+        avg, min_th, max_th = self.avg, self.min_th, self.max_th
+        if avg < min_th:
+            self.count = -1
+            return True
+        if avg >= max_th:
+            if not self.gentle or avg >= 2 * max_th:
+                self.count = 0
+                return False
+            pb = self.max_p + (1 - self.max_p) * (avg - max_th) / max_th
+        else:
+            pb = self.max_p * (avg - min_th) / (max_th - min_th)
+        self.count += 1
+        pa = pb / (1 - self.count * pb) if self.count * pb < 1 else 1.0
+        if self.rng.random() < pa:
+            self.count = 0
+            return False
+        return True
+
+    def dequeue(self, queue, now):
+        entry = queue.pop(now)
+        if entry is not None and not len(queue):
+            self.idle_since = now
+        return entry
+
+
+class CoDel:
+    """
+    Controlled Delay (RFC 8289).
+
+    Drops at dequeue time based on sojourn time rather than queue length:
+    once packets have spent more than `target` in the queue for a whole
+    `interval`, it starts dropping, and drops faster (interval / sqrt(n))
+    until the delay falls back under target. Good queues (short bursts)
+    are left alone; standing queues are drained.
+    """
+    name = "codel"
+
+    def __init__(self, target=0.005, interval=0.100, mtu=MTU):
+        self.target = target
+        self.interval = interval
+        self.mtu = mtu
+        self.first_above_time = 0.0
+        self.drop_next = 0.0
+        self.count = 0
+        self.last_count = 0
+        self.dropping = False
+
+    def admit(self, queue, now, size) -> bool:
+        return True
+
+    def _control_law(self, t):
+        return t + self.interval / math.sqrt(self.count)
+
+    def _dodequeue(self, queue, now):
+        entry = queue.pop(now)
+        if entry is None:
+            self.first_above_time = 0.0
+            return None, False
+        sojourn = now - entry[0]
+        if sojourn < self.target or queue.bytes <= self.mtu:
+            self.first_above_time = 0.0
+            return entry, False
+        if self.first_above_time == 0.0:
+            self.first_above_time = now + self.interval
+            return entry, False
+        return entry, now >= self.first_above_time
+
+    def dequeue(self, queue, now):
+        entry, ok_to_drop = self._dodequeue(queue, now)
+        if entry is None:
+            self.dropping = False
+            return None
+        if self.dropping:
+            if not ok_to_drop:
+                self.dropping = False
+            while self.dropping and now >= self.drop_next:
+                queue.drop(entry, now, self.name)
+                self.count += 1
+                entry, ok_to_drop = self._dodequeue(queue, now)
+                if not ok_to_drop:
+                    self.dropping = False
+                else:
+                    self.drop_next = self._control_law(self.drop_next)
+        elif ok_to_drop:
+            queue.drop(entry, now, self.name)
+            entry, _ = self._dodequeue(queue, now)
+            self.dropping = True
+            # Resume near the previous drop rate if we were dropping recently
+            delta = self.count - self.last_count
+            if delta > 1 and now - self.drop_next < 16 * self.interval:
+                self.count = delta
+            else:
+                self.count = 1
+            self.drop_next = self._control_law(now)
+            self.last_count = self.count
+        return entry
+
+
+POLICIES = {"taildrop": TailDrop, "red": RED, "codel": CoDel}
+
+
+# 2. Bounded queue with statistics
+class QueueStats:
+    """
+    Counters for one queue over simulated time.
+
+    Occupancy is time-weighted: the integral of queue length over time
+    divided by the elapsed time, which is what a buffer-sizing study needs
+    (a plain average over events would over-weight busy periods).
+    """
+
+    def __init__(self):
+        self.enqueued = 0
+        self.dequeued = 0
+        self.bytes_out = 0
+        self.drops = {}  # reason -> count
+        self.sojourn = Histogram()
+        self.max_packets = 0
+        self.max_bytes = 0
+        self._area = 0.0
+        self._last_change = None
+        self._first = None
+
+    def occupancy_changed(self, now, packets, old_packets):
+        if self._last_change is None:
+            self._first = now
+        else:
+            self._area += old_packets * (now - self._last_change)
+        self._last_change = now
+        if packets > self.max_packets:
+            self.max_packets = packets
+
+    @property
+    def dropped(self):
+        return sum(self.drops.values())
+
+    def average_occupancy(self):
+        if self._last_change is None or self._last_change == self._first:
+            return 0.0
+        return self._area / (self._last_change - self._first)
+
+
+class BoundedQueue:
+    """
+    One FIFO buffer holding at most limit_packets packets (and, if given,
+    limit_bytes bytes), with an AQM policy deciding early drops.
+
+    Entries are (enqueue_time, size, packet) tuples in a deque, so a run
+    of millions of packets costs no per-packet objects beyond the tuple.
+    """
+
+    def __init__(self, policy=None, limit_packets=1000, limit_bytes=None):
+        self.policy = policy or TailDrop()
+        self.limit_packets = limit_packets
+        self.limit_bytes = limit_bytes
+        self.items = deque()
+        self.bytes = 0
+        self.stats = QueueStats()
+
+    def __len__(self):
+        return len(self.items)
+
+    def enqueue(self, packet, size, now) -> bool:
+        """Returns False if the packet was dropped."""
+        items = self.items
+        length = len(items)
+        if length >= self.limit_packets or (self.limit_bytes and self.bytes + size > self.limit_bytes):
+            self.stats.drops["tail"] = self.stats.drops.get("tail", 0) + 1
+            return False
+        if not self.policy.admit(self, now, size):
+            name = self.policy.name
+            self.stats.drops[name] = self.stats.drops.get(name, 0) + 1
+            return False
+        items.append((now, size, packet))
+        self.bytes += size
+        self.stats.enqueued += 1
+        self.stats.occupancy_changed(now, length + 1, length)
+        if self.bytes > self.stats.max_bytes:
+            self.stats.max_bytes = self.bytes
+        return True
+
+    def dequeue(self, now):
+        """Next packet to transmit as (enqueue_time, size, packet), or None."""
+        entry = self.policy.dequeue(self, now)
+        if entry is not None:
+            stats = self.stats
+            stats.dequeued += 1
+            stats.bytes_out += entry[1]
+            stats.sojourn.observe(now - entry[0])
+        return entry
+
+    def pop(self, now):
+        """Removes the head packet (used by policies; no drop accounting)."""
+        items = self.items
+        if not items:
+            return None
+        entry = items.popleft()
+        self.bytes -= entry[1]
+        length = len(items)
+        self.stats.occupancy_changed(now, length, length + 1)
+        return entry
+
+    def drop(self, entry, now, reason):
+        """Records a packet that a policy removed instead of sending."""
+        self.stats.drops[reason] = self.stats.drops.get(reason, 0) + 1
+
+
+# 3. Output port: scheduler + bounded queues
+class Port:
+    """
+    An output port with bounded buffers.
+
+    "fifo" serves one queue in arrival order, like fifo_scheduler();
+    "priority" keeps one queue per priority class and always serves the
+    lowest-numbered non-empty class, arrival order within a class, which
+    is the order priority_scheduler() produces. Each class gets its own
+    buffer of limit_packets and its own policy instance.
+    """
+
+    def __init__(self, scheduler="fifo", policy="taildrop", limit_packets=1000,
+                 limit_bytes=None, classes=3, **policy_kwargs):
+        if scheduler not in ("fifo", "priority"):
+            raise ValueError(f"unknown scheduler {scheduler!r}")
+        if policy == "red":
+            policy_kwargs.setdefault("limit", limit_packets)
+        self.scheduler = scheduler
+        self.policy_name = policy
+        count = 1 if scheduler == "fifo" else classes
+        self.queues = [BoundedQueue(POLICIES[policy](**policy_kwargs), limit_packets, limit_bytes)
+                       for _ in range(count)]
+
+    def enqueue(self, packet, size, now) -> bool:
+        queue = self.queues[0] if self.scheduler == "fifo" else self.queues[packet.priority]
+        return queue.enqueue(packet, size, now)
+
+    def dequeue(self, now):
+        for queue in self.queues:
+            if queue.items:
+                entry = queue.dequeue(now)
+                if entry is not None:
+                    return entry
+        return None
+
+
+# 4. Simulation
+def overload_traffic(count, link_bps, load=1.2, seed=1):
+    """
+    Poisson arrivals offering `load` times the link rate, with the usual
+    64/576/1500-byte size mix. Small packets are priority 0 (ACKs, VoIP),
+    medium 1, full-size 2.
+
+    Yields:
+        (arrival_time, packet, size); the three Packet objects are shared
+        between arrivals, since only their priority matters here.
+    """
+    rng = random.Random(seed)
+    classes = [(64, 0.45, 0), (576, 0.15, 1), (1500, 0.40, 2)]
+    templates = [Packet("10.0.0.1", "10.0.0.2", "", priority) for _, _, priority in classes]
+    mean_size = sum(size * share for size, share, _ in classes)
+    rate = load * link_bps / (8 * mean_size)
+    cumulative = [0.45, 0.60, 1.0]
+    t = 0.0
+    expovariate, uniform = rng.expovariate, rng.random
+    for _ in range(count):
+        t += expovariate(rate)
+        u = uniform()
+        k = 0 if u < cumulative[0] else 1 if u < cumulative[1] else 2
+        yield t, templates[k], classes[k][0]
+
+
+def simulate(port: Port, arrivals, link_bps):
+    """
+    Runs arrivals through a port served at link_bps, one packet at a time
+    (non-preemptive), on a simulated clock.
+
+    Returns:
+        A dict with the simulated duration, link utilization and the
+        wall-clock speed of the simulation.
+    """
+    seconds_per_byte = 8 / link_bps
+    free_at = 0.0
+    busy = 0.0
+    arrived = 0
+    dequeue, enqueue = port.dequeue, port.enqueue
+    start = time.perf_counter()
+    now = 0.0
+    for now, packet, size in arrivals:
+        arrived += 1
+        while free_at <= now:
+            entry = dequeue(free_at)
+            if entry is None:
+                break
+            tx = entry[1] * seconds_per_byte
+            free_at += tx
+            busy += tx
+        enqueue(packet, size, now)
+        if free_at <= now:
+            entry = dequeue(now)
+            if entry is not None:
+                tx = entry[1] * seconds_per_byte
+                free_at = now + tx
+                busy += tx
+    while True:
+        entry = dequeue(free_at)
+        if entry is None:
+            break
+        tx = entry[1] * seconds_per_byte
+        free_at += tx
+        busy += tx
+    wall = time.perf_counter() - start
+    duration = max(free_at, now)
+    return {"arrived": arrived, "sim_seconds": duration,
+            "utilization": busy / duration if duration else 0.0,
+            "wall_seconds": wall, "packets_per_sec": arrived / wall if wall else 0.0}
+
+
+def summarize(port: Port, run: dict) -> dict:
+    classes = []
+    for queue in port.queues:
+        s = queue.stats
+        classes.append({
+            "sent": s.dequeued,
+            "dropped": s.dropped,
+            "drops": dict(s.drops),
+            "sojourn_p50_ms": s.sojourn.quantile(0.5) * 1000,
+            "sojourn_p99_ms": s.sojourn.quantile(0.99) * 1000,
+            "sojourn_max_ms": s.sojourn.max * 1000 if s.sojourn.count else 0.0,
+            "avg_occupancy": s.average_occupancy(),
+            "max_occupancy": s.max_packets,
+        })
+    sent = sum(c["sent"] for c in classes)
+    dropped = sum(c["dropped"] for c in classes)
+    return dict(run, sent=sent, dropped=dropped,
+                drop_rate=dropped / max(1, sent + dropped), classes=classes)
+
+
+def check_service_order(count=200, seed=3):
+    """
+    Confirms that, with nothing dropped, the ports serve a backlog in the
+    same order as the lab's fifo_scheduler and priority_scheduler.
+    """
+    rng = random.Random(seed)
+    packets = [Packet("10.0.0.1", "10.0.0.2", f"Packet {i}", rng.choice((0, 1, 2)))
+               for i in range(count)]
+    for name, reference in (("fifo", fifo_scheduler), ("priority", priority_scheduler)):
+        port = Port(name, limit_packets=count)
+        for i, packet in enumerate(packets):
+            port.enqueue(packet, 100, i * 1e-6)
+        served = []
+        while (entry := port.dequeue(1.0)) is not None:
+            served.append(entry[2].payload)
+        assert served == [p.payload for p in reference(packets)], f"{name} order differs"
+
+
+def print_summary(label, result):
+    print(f"{label:<22} sent {result['sent']:9d} | drop {result['drop_rate'] * 100:5.1f}% | "
+          f"util {result['utilization'] * 100:5.1f}% | sim {result['packets_per_sec']:>9,.0f} pkt/s")
+    for priority, c in enumerate(result["classes"]):
+        name = "all" if len(result["classes"]) == 1 else f"prio {priority}"
+        print(f"{'':>4}{name:>8}: sojourn p50 {c['sojourn_p50_ms']:8.2f} ms | p99 "
+              f"{c['sojourn_p99_ms']:8.2f} ms | max {c['sojourn_max_ms']:8.2f} ms | occupancy avg "
+              f"{c['avg_occupancy']:7.1f} max {c['max_occupancy']:5d} | drops {c['drops']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bounded buffers with tail-drop, RED and CoDel")
+    parser.add_argument("--packets", type=int, default=1_000_000)
+    parser.add_argument("--load", type=float, default=1.2, help="offered load (1.0 = link rate)")
+    parser.add_argument("--link-mbps", type=float, default=10.0)
+    parser.add_argument("--buffer", type=int, default=1000, help="buffer limit in packets")
+    parser.add_argument("--policy", choices=list(POLICIES) + ["all"], default="all")
+    parser.add_argument("--scheduler", choices=["fifo", "priority", "all"], default="all")
+    parser.add_argument("--sweep-buffer", help="comma-separated buffer sizes to compare (tail-drop)")
+    args = parser.parse_args()
+
+    check_service_order()
+    link_bps = args.link_mbps * 1e6
+    mean_packet_time = 8 * (64 * 0.45 + 576 * 0.15 + 1500 * 0.40) / link_bps
+    print(f"--- {args.packets:,} packets at load {args.load} on a {args.link_mbps:g} Mb/s link ---")
+
+    if args.sweep_buffer:
+        for limit in [int(x) for x in args.sweep_buffer.split(",")]:
+            port = Port("fifo", "taildrop", limit)
+            run = simulate(port, overload_traffic(args.packets, link_bps, args.load), link_bps)
+            print_summary(f"fifo/taildrop/{limit}", summarize(port, run))
+        return
+
+    policies = list(POLICIES) if args.policy == "all" else [args.policy]
+    schedulers = ["fifo", "priority"] if args.scheduler == "all" else [args.scheduler]
+    for scheduler in schedulers:
+        for policy in policies:
+            kwargs = {"mean_packet_time": mean_packet_time} if policy == "red" else {}
+            port = Port(scheduler, policy, args.buffer, **kwargs)
+            run = simulate(port, overload_traffic(args.packets, link_bps, args.load), link_bps)
+            print_summary(f"{scheduler}/{policy}", summarize(port, run))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,60 @@
+import socket
+
+
+def ip_to_int(ip_address: str) -> tuple:
+    """
+    Parses an IPv4 or IPv6 address string into an integer.
+
+    Args:
+        ip_address: Dotted-decimal IPv4 (e.g., "192.168.1.1") or any
+                    RFC 4291 IPv6 form (e.g., "2001:db8::1", "::ffff:1.2.3.4").
+
+    Returns:
+        (value, width): the address as an int and its width in bits,
+        32 for IPv4 or 128 for IPv6 (e.g., (3232235777, 32)).
+
+    Raises:
+        ValueError: If the string is not a valid address.
+    """
+    # inet_pton does the parsing (and "::" expansion) in C and rejects
+    # the shorthand forms inet_aton would accept, like "10.1"
+    family, width = (socket.AF_INET6, 128) if ":" in ip_address else (socket.AF_INET, 32)
+    try:
+        packed = socket.inet_pton(family, ip_address)
+    except OSError:
+        raise ValueError(f"invalid IP address: {ip_address!r}") from None
+    return int.from_bytes(packed, "big"), width
+
+
+def parse_cidr(ip_cidr: str) -> tuple:
+    """
+    Parses a CIDR prefix (IPv4 or IPv6) into integers.
+
+    Args:
+        ip_cidr: A string in CIDR format (e.g., "200.23.16.0/23" or "2001:db8::/32").
+
+    Returns:
+        (network, prefix_length, width), with any host bits cleared
+        (e.g., "200.23.17.5/23" -> (3356954624, 23, 32)).
+
+    Raises:
+        ValueError: If the prefix or its length is invalid.
+    """
+    ip_address, slash, prefix_length_str = ip_cidr.partition('/')
+    if not slash:
+        raise ValueError(f"invalid CIDR format (expected 'IP/Prefix'): {ip_cidr!r}")
+    value, width = ip_to_int(ip_address)
+    if not prefix_length_str.isdigit() or int(prefix_length_str) > width:
+        raise ValueError(f"prefix length must be between 0 and {width}: {ip_cidr!r}")
+    prefix_length = int(prefix_length_str)
+    host_bits = width - prefix_length
+    return value >> host_bits << host_bits, prefix_length, width
 
 
 def ip_to_binary(ip_address: str) -> str:
     """
     Converts a standard dotted-decimal IP address string into a 32-bit binary string.
+    IPv6 addresses (anything containing ':') become 128-bit strings.
 
     Args:
         ip_address: A string in dotted-decimal format (e.g., "192.168.1.1").
@@ -11,6 +63,9 @@ def ip_to_binary(ip_address: str) -> str:
         A 32-bit binary string, with each octet represented by 8 bits
         (e.g., "11000000101010000000000100000001").
     """
+    if ":" in ip_address:
+        return f'{ip_to_int(ip_address)[0]:0128b}'
+
     # 1. Split the IP string by the '.' character to get a list of octets
     #    Example: "192.168.1.1" -> ["192", "168", "1", "1"]
     #
@@ -45,15 +100,16 @@ def get_network_prefix(ip_cidr: str) -> str:
     except ValueError:
         return "Error: Invalid CIDR format. Expected 'IP/Prefix'."
 
-    # 2. Convert the prefix length to an integer
+    # 2. Convert the prefix length to an integer (IPv6 prefixes go up to /128)
+    max_length = 128 if ":" in ip_address else 32
     try:
         prefix_length = int(prefix_length_str)
-        if not 0 <= prefix_length <= 32:
-             raise ValueError("Prefix length must be between 0 and 32")
+        if not 0 <= prefix_length <= max_length:
+             raise ValueError(f"Prefix length must be between 0 and {max_length}")
     except ValueError as e:
         return f"Error: Invalid prefix length. {e}"
 
-    # 3. Use our first function to get the full 32-bit binary IP
+    # 3. Use our first function to get the full 32-bit (or 128-bit) binary IP
     full_binary_ip = ip_to_binary(ip_address)
 
     # 4. Slice the full binary string to get only the first 'prefix_length' bits
@@ -98,4 +154,11 @@ if __name__ == "__main__":
     prefix3 = get_network_prefix(cidr3)
     print(f'get_network_prefix("{cidr3}"):')
     print(f'  -> {prefix3}')
-    print(f'  Expected: 1010110000010000\n')
\ No newline at end of file
+    print(f'  Expected: 1010110000010000\n')
+
+    # Test Case 6: An IPv6 prefix, parsed as integers
+    cidr4 = "2001:db8:1234::/48"
+    network, length, width = parse_cidr(cidr4)
+    print(f'parse_cidr("{cidr4}"):')
+    print(f'  -> ({network:#x}, {length}, {width})')
+    print(f'  Expected: (0x20010db8123400000000000000000000, 48, 128)\n')
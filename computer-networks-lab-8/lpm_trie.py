@@ -0,0 +1,359 @@
+# lpm_trie.py
+"""
+Path-compressed binary trie for longest prefix match over IPv4 and IPv6.
+
+    import lab8_import  # noqa: F401
+    from lpm_trie import PrefixTrie
+
+    trie = PrefixTrie(128)
+    trie.insert(0x20010db8 << 96, 32, "Link 0")
+    trie.lookup(0x20010db8_0001 << 80)  # -> "Link 0"
+
+    python lpm_trie.py --prefixes 300000   # lookup and memory benchmark
+
+Nodes live in a pool of parallel typed arrays rather than as Python
+objects, so a node costs 29 bytes no matter how many exist, and removed
+nodes go on a free list for reuse. Every node is a route or a branch
+point (path compression), so a table of N prefixes never needs more
+than 2N nodes, and a lookup visits at most one node per branch point
+instead of one per bit.
+"""
+import argparse
+import contextlib
+import io
+import random
+import sys
+import time
+from array import array
+from ipaddress import IPv4Address, IPv6Address
+
+import lab8_import  # noqa: F401  (makes the *.py.py lab modules importable)
+from ip_utils import ip_to_int, parse_cidr
+
+MASK64 = (1 << 64) - 1
+NO_NODE = 0  # Node 0 is the root, which is never anyone's child
+NO_VALUE = 0
+
+
+class PrefixTrie:
+    """
+    Longest-prefix-match table for one address family.
+
+    Keys are stored left-aligned in 128 bits, split across two 64-bit
+    arrays, so IPv4 and IPv6 share the same code and a lookup never
+    builds a new 128-bit integer. Values are interned: each node holds a
+    small index into `self._values`, so a million routes to four links
+    store four link objects.
+    """
+
+    def __init__(self, width=32):
+        if width not in (32, 128):
+            raise ValueError("width must be 32 (IPv4) or 128 (IPv6)")
+        self.width = width
+        self._align = 128 - width
+        # The node pool: node i is (length[i], key_hi[i], key_lo[i],
+        # zero[i], one[i], value[i]); 1 + 8 + 8 + 4 + 4 + 4 bytes
+        self._length = array("B")
+        self._key_hi = array("Q")
+        self._key_lo = array("Q")
+        self._zero = array("I")
+        self._one = array("I")
+        self._value = array("I")
+        self._free = []
+        self._values = [None]  # index 0 means "no route here"
+        self._value_index = {}
+        self._count = 0
+        self._alloc(0, 0, NO_VALUE)  # The root: the empty prefix
+
+    def __len__(self):
+        return self._count
+
+    def _alloc(self, key, length, value):
+        hi, lo = key >> 64, key & MASK64
+        if self._free:
+            node = self._free.pop()
+            self._length[node] = length
+            self._key_hi[node] = hi
+            self._key_lo[node] = lo
+            self._zero[node] = self._one[node] = NO_NODE
+            self._value[node] = value
+            return node
+        self._length.append(length)
+        self._key_hi.append(hi)
+        self._key_lo.append(lo)
+        self._zero.append(NO_NODE)
+        self._one.append(NO_NODE)
+        self._value.append(value)
+        return len(self._length) - 1
+
+    def _key(self, node):
+        return self._key_hi[node] << 64 | self._key_lo[node]
+
+    def _intern(self, value):
+        index = self._value_index.get(value)
+        if index is None:
+            index = self._value_index[value] = len(self._values)
+            self._values.append(value)
+        return index
+
+    def _side(self, key, length):
+        """The child array (zero or one) that `key` continues into after `length` bits."""
+        return self._one if key >> (127 - length) & 1 else self._zero
+
+    def _aligned(self, network, length):
+        if not 0 <= length <= self.width:
+            raise ValueError(f"prefix length must be between 0 and {self.width}")
+        host_bits = 128 - length
+        return (network << self._align) >> host_bits << host_bits
+
+    def insert(self, network, length, value):
+        """
+        Adds (or replaces) the route network/length -> value. Host bits
+        of `network` beyond `length` are ignored.
+        """
+        if value is None:
+            raise ValueError("value must not be None")
+        key = self._aligned(network, length)
+        index = self._intern(value)
+        node = 0
+        while True:
+            node_length = self._length[node]
+            if node_length == length:
+                if self._value[node] == NO_VALUE:
+                    self._count += 1
+                self._value[node] = index
+                return
+            children = self._side(key, node_length)
+            child = children[node]
+            if child == NO_NODE:
+                children[node] = self._alloc(key, length, index)
+                self._count += 1
+                return
+            child_key, child_length = self._key(child), self._length[child]
+            # How far the new prefix and the child's agree
+            common = min(128 - (key ^ child_key).bit_length(), child_length, length)
+            if common == child_length:
+                node = child
+                continue
+            if common == length:
+                # The new prefix sits between node and child
+                new = self._alloc(key, length, index)
+                self._side(child_key, length)[new] = child
+            else:
+                # They diverge below node: add a branch point where they split
+                new = self._alloc(key >> (128 - common) << (128 - common), common, NO_VALUE)
+                self._side(child_key, common)[new] = child
+                self._side(key, common)[new] = self._alloc(key, length, index)
+            children[node] = new
+            self._count += 1
+            return
+
+    def remove(self, network, length):
+        """
+        Deletes the route network/length, returning its value (None if
+        there was no such route). Nodes left with no route and fewer than
+        two children are unlinked and go back to the pool.
+        """
+        key = self._aligned(network, length)
+        path = []
+        node = 0
+        while self._length[node] < length:
+            children = self._side(key, self._length[node])
+            child = children[node]
+            if child == NO_NODE:
+                return None
+            path.append((node, children))
+            node = child
+        if (self._length[node] != length or self._key(node) != key
+                or self._value[node] == NO_VALUE):
+            return None
+        value = self._values[self._value[node]]
+        self._value[node] = NO_VALUE
+        self._count -= 1
+        # Splice out nodes that no longer route or branch, walking upwards
+        while node and self._value[node] == NO_VALUE:
+            zero, one = self._zero[node], self._one[node]
+            if zero and one:
+                break
+            parent, children = path.pop()
+            children[parent] = zero or one
+            self._free.append(node)
+            node = parent
+        return value
+
+    def lookup(self, address):
+        """
+        Returns the value of the longest prefix containing `address` (an
+        int of `width` bits), or None when nothing matches.
+        """
+        address <<= self._align
+        hi, lo = address >> 64, address & MASK64
+        lengths, key_hi, key_lo = self._length, self._key_hi, self._key_lo
+        zero, one, values = self._zero, self._one, self._value
+        best = NO_VALUE
+        node = 0
+        while True:
+            length = lengths[node]
+            # Path compression skips bits, so confirm the whole prefix matches
+            if length <= 64:
+                if (hi ^ key_hi[node]) >> (64 - length):
+                    break
+            elif hi != key_hi[node] or (lo ^ key_lo[node]) >> (128 - length):
+                break
+            if values[node]:
+                best = values[node]
+            if length < 64:
+                node = (one if hi >> (63 - length) & 1 else zero)[node]
+            elif length < 128:
+                node = (one if lo >> (127 - length) & 1 else zero)[node]
+            else:
+                break
+            if node == NO_NODE:
+                break
+        return self._values[best]
+
+    def routes(self):
+        """Yields (network, length, value) for every route, in address order."""
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if self._value[node]:
+                yield (self._key(node) >> self._align, self._length[node],
+                       self._values[self._value[node]])
+            for child in (self._one[node], self._zero[node]):
+                if child:
+                    stack.append(child)
+
+    @property
+    def nodes(self):
+        """Nodes in use (the pool minus the free list)."""
+        return len(self._length) - len(self._free)
+
+    def nbytes(self):
+        """Bytes held by the node pool (allocated capacity, not just used slots)."""
+        total = sum(a.buffer_info()[1] * a.itemsize for a in
+                    (self._length, self._key_hi, self._key_lo, self._zero, self._one, self._value))
+        return total + sys.getsizeof(self._free) + sys.getsizeof(self._values)
+
+
+class DualStackTable:
+    """
+    An IPv4 and an IPv6 PrefixTrie behind string addresses, the backend
+    Router(routes, backend="trie") uses.
+    """
+
+    def __init__(self):
+        self.tries = {32: PrefixTrie(32), 128: PrefixTrie(128)}
+
+    def insert(self, cidr, value):
+        network, length, width = parse_cidr(cidr)
+        self.tries[width].insert(network, length, value)
+
+    def lookup(self, address):
+        value, width = ip_to_int(address)
+        return self.tries[width].lookup(value)
+
+    def __len__(self):
+        return sum(len(trie) for trie in self.tries.values())
+
+    def nbytes(self):
+        return sum(trie.nbytes() for trie in self.tries.values())
+
+
+# --- Benchmark ---
+
+# Rough shape of the public IPv6 table: mostly /48s, then /32-/44 allocations
+V6_LENGTHS = [32, 32, 36, 40, 44, 44, 48, 48, 48, 48, 48, 48, 56, 64]
+
+
+def make_routes_v6(count=100_000, seed=1, links=4):
+    """
+    Random IPv6 routes (/32 to /64) inside 2000::/3, clustered under a
+    few thousand /24-ish regional blocks the way real allocations are.
+    """
+    rng = random.Random(seed)
+    blocks = [0x2000 << 112 | rng.getrandbits(21) << 104 for _ in range(max(1, count // 64))]
+    seen = set()
+    routes = []
+    while len(routes) < count:
+        length = rng.choice(V6_LENGTHS)
+        network = (rng.choice(blocks) | rng.getrandbits(104)) >> (128 - length) << (128 - length)
+        if (network, length) not in seen:
+            seen.add((network, length))
+            routes.append((network, length, f"Link {len(routes) % links}"))
+    return routes
+
+
+def to_text(address, width):
+    return str(IPv4Address(address) if width == 32 else IPv6Address(address))
+
+
+def lookup_targets(routes, count, width, seed=2):
+    """Addresses inside the table (random host bits) plus 10% random misses."""
+    rng = random.Random(seed)
+    targets = []
+    for _ in range(count):
+        if rng.random() < 0.9:
+            network, length, _ = rng.choice(routes)
+            targets.append(network | rng.getrandbits(width - length) if length < width else network)
+        else:
+            targets.append(rng.getrandbits(width))
+    return targets
+
+
+def benchmark(prefixes, lookups, linear_routes, seed=1):
+    # Imported here: router_forwarding_table itself imports this module
+    from replay_harness import make_routes
+    from router_forwarding_table import Router
+
+    print(f"--- {prefixes:,} prefixes per family, {lookups:,} lookups ---")
+    v4 = [(*parse_cidr(cidr)[:2], link) for cidr, link in make_routes(prefixes, seed)]
+    v6 = make_routes_v6(prefixes, seed)
+    for width, routes in ((32, v4), (128, v6)):
+        trie = PrefixTrie(width)
+        start = time.perf_counter()
+        for network, length, link in routes:
+            trie.insert(network, length, link)
+        build = time.perf_counter() - start
+        targets = lookup_targets(routes, lookups, width)
+        lookup = trie.lookup
+        start = time.perf_counter()
+        for address in targets:
+            lookup(address)
+        elapsed = time.perf_counter() - start
+        family = "IPv4" if width == 32 else "IPv6"
+        print(f"{family} trie:   {len(trie):>8,} prefixes | {lookups / elapsed:>9,.0f} lookups/s | "
+              f"{trie.nbytes() / len(trie):5.1f} bytes/prefix ({trie.nodes:,} nodes) | "
+              f"built in {build:.2f} s")
+
+        # The lab's linear scan over binary strings, on a small table
+        sample = routes[:linear_routes]
+        with contextlib.redirect_stdout(io.StringIO()):
+            router = Router([(f"{to_text(n, width)}/{l}", link) for n, l, link in sample])
+        small = PrefixTrie(width)
+        for n, l, link in sample:
+            small.insert(n, l, link)
+        addresses = [to_text(a, width) for a in lookup_targets(sample, min(lookups, 5000), width)]
+        start = time.perf_counter()
+        expected = [router.route_packet(a) for a in addresses]
+        elapsed = time.perf_counter() - start
+        got = [small.lookup(ip_to_int(a)[0]) or "Default Gateway" for a in addresses]
+        if got != expected:
+            raise AssertionError("trie and linear Router disagree")
+        print(f"{family} linear: {len(sample):>8,} prefixes | {len(addresses) / elapsed:>9,.0f} lookups/s | "
+              f"same links as the trie")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Path-compressed trie LPM benchmark")
+    parser.add_argument("--prefixes", type=int, default=300_000, help="routes per address family")
+    parser.add_argument("--lookups", type=int, default=200_000)
+    parser.add_argument("--linear-routes", type=int, default=1000,
+                        help="table size for the linear Router comparison")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    benchmark(args.prefixes, args.lookups, args.linear_routes, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+# replay_harness.py
+import argparse
+import json
+import os
+import random
+import socket
+import struct
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, List
+
+import lab8_import  # noqa: F401  (makes the *.py.py lab modules importable)
+from router_forwarding_table import Router
+from scheduler import Packet, fifo_scheduler, priority_scheduler
+
+LAB_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSIGNMENT6_DIR = os.path.normpath(os.path.join(LAB_DIR, "..", "computer-networks-asiggnment-6"))
+DEFAULT_PCAP = os.path.join(ASSIGNMENT6_DIR, "capture_lab1.pcap")
+
+# Same routes as the router_forwarding_table.py.py test case
+LAB_ROUTES = [
+    ("223.1.1.0/24", "Link 0"),
+    ("223.1.2.0/24", "Link 1"),
+    ("223.1.3.0/24", "Link 2"),
+    ("223.1.0.0/16", "Link 4 (ISP)"),
+]
+
+SCHEDULERS = {"fifo": fifo_scheduler, "priority": priority_scheduler}
+
+
+@dataclass
+class TracedPacket(Packet):
+    """
+    A Packet plus what the replay needs to know about it.
+
+    Attributes:
+        size (int): Bytes on the wire.
+        arrival (float): Arrival time at the router in seconds.
+    """
+    size: int = 0
+    arrival: float = 0.0
+
+
+def classify(size: int, udp: bool, port: int) -> int:
+    """
+    Picks a priority like an edge router might: DNS and small packets
+    (ACKs, VoIP-sized) are high, other UDP (QUIC, media) medium, bulk low.
+    """
+    if port == 53 or size <= 128:
+        return 0
+    return 1 if udp else 2
+
+
+# --- Traffic sources ---
+
+def pcap_trace(path=DEFAULT_PCAP) -> List[TracedPacket]:
+    """
+    Reads the IPv4 packets of a pcap/pcapng capture (Ethernet or raw IP),
+    keeping their real destinations, sizes and relative arrival times.
+    """
+    if ASSIGNMENT6_DIR not in sys.path:
+        sys.path.append(ASSIGNMENT6_DIR)  # Appended, so it cannot shadow anything
+    from pcap_analyzer import (ETH_IPV4, ETH_TYPE, IPV4, LINKTYPE_ETHERNET, LINKTYPE_RAW,
+                               PORTS, PcapReader)
+
+    packets = []
+    start = None
+    with PcapReader(path) as reader:
+        view = reader.view
+        for ts, linktype, offset, caplen, wirelen in reader:
+            if linktype == LINKTYPE_ETHERNET:
+                if caplen < 34 or ETH_TYPE.unpack_from(view, offset + 12)[0] != ETH_IPV4:
+                    continue
+                ip = offset + 14
+            elif linktype == LINKTYPE_RAW and caplen >= 20 and view[offset] >> 4 == 4:
+                ip = offset
+            else:
+                continue
+            ver_ihl, _, _, _, frag, _, proto, _, src, dst = IPV4.unpack_from(view, ip)
+            port = 0
+            l4 = ip + (ver_ihl & 0x0F) * 4
+            if proto in (6, 17) and not frag & 0x1FFF and l4 + 4 <= offset + caplen:
+                sport, dport = PORTS.unpack_from(view, l4)
+                port = min(sport, dport)
+            if start is None:
+                start = ts
+            packets.append(TracedPacket(
+                source_ip=socket.inet_ntoa(struct.pack("!I", src)),
+                dest_ip=socket.inet_ntoa(struct.pack("!I", dst)),
+                payload="", priority=classify(wirelen, proto == 17, port),
+                size=wirelen, arrival=ts - start))
+    return packets
+
+
+def zipf_trace(count=100_000, routes=LAB_ROUTES, destinations=10_000, s=1.1,
+               mean_rate_pps=10_000, seed=1) -> List[TracedPacket]:
+    """
+    Synthetic traffic: destination popularity follows a Zipf law (a few
+    hosts get most packets), sizes follow the usual 64/576/1500-byte
+    mix, and arrivals are Poisson at mean_rate_pps.
+
+    Most destinations fall inside the given routes; a fifth do not, and
+    exercise the full scan to the default gateway.
+    """
+    rng = random.Random(seed)
+    networks = []
+    for cidr, _ in routes:
+        ip, length = cidr.split("/")
+        base = struct.unpack("!I", socket.inet_aton(ip))[0]
+        networks.append((base, 32 - int(length)))
+
+    hosts = []
+    for _ in range(destinations):
+        if rng.random() < 0.8:
+            base, host_bits = rng.choice(networks)
+            address = base | rng.getrandbits(host_bits) if host_bits else base
+        else:
+            address = rng.getrandbits(32)
+        hosts.append(socket.inet_ntoa(struct.pack("!I", address)))
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, destinations + 1):
+        total += 1 / rank ** s
+        cum_weights.append(total)
+
+    dests = rng.choices(hosts, cum_weights=cum_weights, k=count)
+    sizes = rng.choices([64, 576, 1500], weights=[0.45, 0.15, 0.40], k=count)
+    packets = []
+    t = 0.0
+    for dest, size in zip(dests, sizes):
+        t += rng.expovariate(mean_rate_pps)
+        udp = rng.random() < 0.3
+        packets.append(TracedPacket(source_ip="10.0.0.1", dest_ip=dest, payload="",
+                                    priority=classify(size, udp, 0), size=size, arrival=t))
+    return packets
+
+
+def make_routes(count=1000, seed=1, include=()) -> list:
+    """
+    Builds a forwarding table: the lab routes, one /24 per address in
+    `include` (so replayed traffic actually matches something), and random
+    prefixes (/8 to /28, mostly /16-/24) until there are `count` routes.
+    """
+    rng = random.Random(seed)
+    routes = list(LAB_ROUTES)
+    seen = {cidr for cidr, _ in routes}
+    for ip in include:
+        cidr = ".".join(ip.split(".")[:3]) + ".0/24"
+        if cidr not in seen and len(routes) < count:
+            seen.add(cidr)
+            routes.append((cidr, f"Link {len(routes) % 4}"))
+    while len(routes) < count:
+        length = rng.choice([8, 12, 16, 16, 20, 22, 24, 24, 24, 28])
+        network = rng.getrandbits(32) >> (32 - length) << (32 - length)
+        cidr = f"{socket.inet_ntoa(struct.pack('!I', network))}/{length}"
+        if cidr not in seen:
+            seen.add(cidr)
+            routes.append((cidr, f"Link {len(routes) % 4}"))
+    return routes
+
+
+# --- Measurements ---
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def measure_lookups(router: Router, packets: List[TracedPacket]):
+    """
+    Routes every packet twice: once in a tight loop for lookups/sec, once
+    timing each call for the per-packet latency distribution.
+
+    Returns:
+        (stats dict, list of output links in packet order)
+    """
+    route = router.route_packet
+    dests = [p.dest_ip for p in packets]
+    start = time.perf_counter()
+    links = [route(d) for d in dests]
+    elapsed = time.perf_counter() - start
+
+    clock = time.perf_counter_ns
+    latencies = []
+    for d in dests:
+        t0 = clock()
+        route(d)
+        latencies.append(clock() - t0)
+    latencies.sort()
+    per_link = {}
+    for link in links:
+        per_link[link] = per_link.get(link, 0) + 1
+    return {
+        "lookups": len(dests),
+        "lookups_per_sec": len(dests) / elapsed if elapsed else 0.0,
+        "latency_p50_us": percentile(latencies, 0.50) / 1000,
+        "latency_p99_us": percentile(latencies, 0.99) / 1000,
+        "latency_max_us": latencies[-1] / 1000 if latencies else 0.0,
+        "per_link": per_link,
+    }, links
+
+
+def simulate_port(packets: List[TracedPacket], scheduler: Callable, link_bps: float,
+                  buffer_packets=1000):
+    """
+    Replays arrivals into one output port served at link_bps.
+
+    Whenever the link goes idle, the scheduler is asked to order the
+    current backlog and the first packet it returns is transmitted
+    (non-preemptive). Arrivals beyond buffer_packets are tail-dropped.
+
+    Returns:
+        A dict of queueing delays (overall and per priority), drops, the
+        largest backlog and the scheduler's CPU cost per decision.
+    """
+    backlog = []
+    delays = {}
+    now = 0.0
+    i, n = 0, len(packets)
+    drops = max_backlog = decisions = 0
+    scheduler_ns = 0
+    clock = time.perf_counter_ns
+    while i < n or backlog:
+        if not backlog:
+            now = max(now, packets[i].arrival)
+        while i < n and packets[i].arrival <= now:
+            if len(backlog) >= buffer_packets:
+                drops += 1
+            else:
+                backlog.append(packets[i])
+            i += 1
+        max_backlog = max(max_backlog, len(backlog))
+
+        t0 = clock()
+        chosen = scheduler(backlog)[0]
+        scheduler_ns += clock() - t0
+        decisions += 1
+        for k, pkt in enumerate(backlog):
+            if pkt is chosen:
+                del backlog[k]
+                break
+        delays.setdefault(chosen.priority, []).append(now - chosen.arrival)
+        now += chosen.size * 8 / link_bps
+
+    everything = sorted(d for values in delays.values() for d in values)
+    result = {
+        "packets": len(everything),
+        "drops": drops,
+        "max_backlog": max_backlog,
+        "queue_p50_ms": percentile(everything, 0.50) * 1000,
+        "queue_p99_ms": percentile(everything, 0.99) * 1000,
+        "queue_max_ms": everything[-1] * 1000 if everything else 0.0,
+        "scheduler_us_per_decision": scheduler_ns / max(1, decisions) / 1000,
+        "by_priority": {},
+    }
+    for priority, values in sorted(delays.items()):
+        values.sort()
+        result["by_priority"][priority] = {
+            "packets": len(values),
+            "queue_p50_ms": percentile(values, 0.50) * 1000,
+            "queue_p99_ms": percentile(values, 0.99) * 1000,
+        }
+    return result
+
+
+def replay(packets: List[TracedPacket], routes: list, link_bps=10e6, load=0.9,
+           buffer_packets=1000, schedulers=("fifo", "priority")):
+    """
+    Runs a trace through route lookup and then through each scheduler on
+    the busiest output port.
+
+    Arrival times are rescaled so that the busiest port's average offered
+    load equals `load` (1.0 = the link rate), which lets the same capture
+    be replayed against any link speed.
+    """
+    router = Router(routes)
+    lookup_stats, links = measure_lookups(router, packets)
+
+    # An empty trace has no busiest port; the schedulers then see no packets
+    busiest = max(lookup_stats["per_link"], key=lookup_stats["per_link"].get, default=None)
+    port = [p for p, link in zip(packets, links) if link == busiest]
+    span = port[-1].arrival - port[0].arrival if len(port) > 1 else 0.0
+    offered_bps = sum(p.size for p in port) * 8 / span if span > 0 else link_bps
+    scale = offered_bps / (load * link_bps)
+    port = [TracedPacket(p.source_ip, p.dest_ip, p.payload, p.priority, p.size,
+                         (p.arrival - port[0].arrival) * scale) for p in port]
+
+    result = {"routes": len(routes), "lookup": lookup_stats, "port": busiest,
+              "port_packets": len(port), "link_mbps": link_bps / 1e6, "load": load,
+              "schedulers": {}}
+    for name in schedulers:
+        result["schedulers"][name] = simulate_port(port, SCHEDULERS[name], link_bps,
+                                                   buffer_packets)
+    return result
+
+
+def print_result(result):
+    lookup = result["lookup"]
+    print(f"\n--- Route lookup ({result['routes']} routes, {lookup['lookups']} packets) ---")
+    print(f"{lookup['lookups_per_sec']:,.0f} lookups/s | latency p50 {lookup['latency_p50_us']:.2f} us"
+          f" | p99 {lookup['latency_p99_us']:.2f} us | max {lookup['latency_max_us']:.2f} us")
+    for link, count in sorted(lookup["per_link"].items(), key=lambda kv: -kv[1]):
+        print(f"  {link:<16} {count:8d} packets")
+
+    print(f"\n--- Output port '{result['port']}' ({result['port_packets']} packets, "
+          f"{result['link_mbps']:g} Mb/s, load {result['load']:.2f}) ---")
+    for name, stats in result["schedulers"].items():
+        print(f"{name:>9}: queue p50 {stats['queue_p50_ms']:8.3f} ms | p99 {stats['queue_p99_ms']:8.3f} ms"
+              f" | max {stats['queue_max_ms']:8.3f} ms | drops {stats['drops']} | max backlog "
+              f"{stats['max_backlog']} | {stats['scheduler_us_per_decision']:.2f} us/decision")
+        for priority, p in stats["by_priority"].items():
+            print(f"{'':>11}priority {priority}: {p['packets']:7d} packets, "
+                  f"p50 {p['queue_p50_ms']:8.3f} ms, p99 {p['queue_p99_ms']:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay traffic through Router and the schedulers")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--pcap", nargs="?", const=DEFAULT_PCAP,
+                        help="replay a capture (default: assignment-6 capture_lab1.pcap)")
+    source.add_argument("--zipf", type=int, metavar="N", help="replay N synthetic Zipf packets")
+    parser.add_argument("--routes", type=int, default=1000, help="forwarding table size")
+    parser.add_argument("--link-mbps", type=float, default=10.0)
+    parser.add_argument("--load", type=float, default=0.9,
+                        help="offered load on the busiest port (1.0 = link rate)")
+    parser.add_argument("--buffer", type=int, default=1000, help="port buffer in packets")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    if args.zipf:
+        routes = make_routes(args.routes)
+        packets = zipf_trace(args.zipf, routes)
+        label = f"Zipf trace, {len(packets)} packets"
+    else:
+        path = args.pcap or DEFAULT_PCAP
+        packets = pcap_trace(path)
+        routes = make_routes(args.routes, include=[p.dest_ip for p in packets[:2000]])
+        label = f"{os.path.basename(path)}, {len(packets)} IPv4 packets"
+
+    result = replay(packets, routes, args.link_mbps * 1e6, args.load, args.buffer)
+    result["trace"] = label
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"Trace: {label}")
+        print_result(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,30 +2,52 @@
 
 # Import the functions from your first file
 try:
-    from ip_utils import ip_to_binary, get_network_prefix
+    from ip_utils import ip_to_int, get_network_prefix
 except ImportError:
     print("Error: Could not import from ip_utils.py.")
     print("Please make sure ip_utils.py is in the same directory.")
     exit(1)
 
+try:
+    from lpm_trie import DualStackTable
+except ImportError as e:
+    print(f"Error: Could not import DualStackTable from lpm_trie.py ({e}).")
+    print("Please make sure lpm_trie.py is in the same directory.")
+    exit(1)
+
 class Router:
     """
     Simulates a router's forwarding table and LPM lookup process.
     """
 
-    def __init__(self, routes: list):
+    def __init__(self, routes: list, backend: str = "linear"):
         """
         Initializes the router with a list of routes.
 
         Args:
             routes: A list of tuples, where each tuple contains
                     (cidr_prefix_str, output_link_str).
-                    e.g., [("223.1.1.0/24", "Link 0"), ...]
+                    e.g., [("223.1.1.0/24", "Link 0"), ("2001:db8::/32", "Link 1"), ...]
+            backend: "linear" scans a sorted list of binary strings (the
+                     lab's algorithm); "trie" uses the path-compressed
+                     tries in lpm_trie.py, for tables with many thousands of
+                     routes.
         """
+        if backend not in ("linear", "trie"):
+            raise ValueError(f"Unknown backend {backend!r}, expected 'linear' or 'trie'")
         print("Initializing router...")
         # This list will store our processed, sorted forwarding table.
         # It will be a list of tuples: [(binary_prefix, output_link), ...]
+        # IPv6 routes get their own list: a 128-bit destination must never
+        # match a 32-bit IPv4 prefix just because the leading bits agree.
         self.__forwarding_table = []
+        self.__forwarding_table_v6 = []
+        self.__trie = None
+
+        if backend == "trie":
+            self.__build_trie(routes)
+            print("Forwarding tries built for Longest Prefix Match.")
+            return
 
         # Call the private helper method to process the routes
         self.__build_forwarding_table(routes)
@@ -40,23 +62,46 @@ class Router:
         to shortest (least specific).
         """
         processed_table = []
+        processed_table_v6 = []
         for cidr, link in routes:
             # Use our function from Part 1 to get the binary prefix
-            binary_prefix = get_network_prefix(cidr)
+            # (malformed IPv6 addresses raise instead of returning "Error:")
+            try:
+                binary_prefix = get_network_prefix(cidr)
+            except ValueError as e:
+                print(f"Skipping invalid route: {cidr} (Error: {e})")
+                continue
             if "Error:" in binary_prefix:
                 print(f"Skipping invalid route: {cidr} ({binary_prefix})")
                 continue
 
             # Store the binary prefix and its corresponding link
-            processed_table.append((binary_prefix, link))
+            if ":" in cidr:
+                processed_table_v6.append((binary_prefix, link))
+            else:
+                processed_table.append((binary_prefix, link))
 
         # --- This is the most critical step for LPM ---
         # We sort the list based on the *length* of the binary prefix (route[0]).
         # 'reverse=True' ensures that the longest prefixes (e.g., /24)
         # come *before* the shorter ones (e.g., /16).
         processed_table.sort(key=lambda route: len(route[0]), reverse=True)
+        processed_table_v6.sort(key=lambda route: len(route[0]), reverse=True)
 
         self.__forwarding_table = processed_table
+        self.__forwarding_table_v6 = processed_table_v6
+
+    def __build_trie(self, routes: list):
+        """
+        (Private) Loads the routes into one path-compressed trie per
+        address family; prefixes are parsed straight to integers.
+        """
+        self.__trie = DualStackTable()
+        for cidr, link in routes:
+            try:
+                self.__trie.insert(cidr, link)
+            except ValueError as e:
+                print(f"Skipping invalid route: {cidr} (Error: {e})")
 
     def route_packet(self, dest_ip: str) -> str:
         """
@@ -64,21 +109,33 @@ class Router:
         given destination IP address.
 
         Args:
-            dest_ip: A dotted-decimal IP address string (e.g., "223.1.1.100").
+            dest_ip: A dotted-decimal IP address string (e.g., "223.1.1.100"),
+                     or an IPv6 address (e.g., "2001:db8::1").
 
         Returns:
             The output link string (e.g., "Link 0") for the *best*
             matching route, or "Default Gateway" if no match is found.
         """
+        if self.__trie is not None:
+            try:
+                output_link = self.__trie.lookup(dest_ip)
+            except ValueError:
+                return f"Error: Invalid destination IP {dest_ip}"
+            return output_link if output_link is not None else "Default Gateway"
 
         # (a) Convert the destination IP to its 32-bit binary representation
-        binary_dest_ip = ip_to_binary(dest_ip)
-        if "Error:" in binary_dest_ip:
+        #     (128-bit for IPv6). It is parsed the way the trie backend parses
+        #     it, so both reject the same malformed addresses.
+        try:
+            value, width = ip_to_int(dest_ip)
+        except ValueError:
             return f"Error: Invalid destination IP {dest_ip}"
+        binary_dest_ip = f'{value:0{width}b}'
 
         # (b) Iterate through your sorted internal forwarding table
         #     (from longest prefix to shortest)
-        for binary_prefix, output_link in self.__forwarding_table:
+        table = self.__forwarding_table_v6 if width == 128 else self.__forwarding_table
+        for binary_prefix, output_link in table:
 
             # (c) Check if the binary destination IP *starts with* the prefix
             if binary_dest_ip.startswith(binary_prefix):
@@ -92,6 +149,9 @@ class Router:
 
 # --- Test Case from the assignment ---
 if __name__ == "__main__":
+    import contextlib
+    import io
+
     print("--- Testing Router Longest Prefix Match ---")
 
     # The routes table from the assignment
@@ -135,4 +195,19 @@ if __name__ == "__main__":
     ip4 = "198.51.100.1"
     link4 = my_router.route_packet(ip4)
     print(f'Routing "{ip4}" -> {link4}')
-    print(f'  Expected: Default Gateway (Matches no prefixes)\n')
\ No newline at end of file
+    print(f'  Expected: Default Gateway (Matches no prefixes)\n')
+
+    # Test 5: Both backends give the same answer, valid or not, IPv4 or IPv6
+    mixed_routes = test_routes + [("2001:db8::/32", "Link 5"), ("2001:db8:1::/48", "Link 6"),
+                                  ("::ffff:223.1.0.0/112", "Link 7")]
+    addresses = ["223.1.1.100", "198.51.100.1", "2001:db8:1::1", "2001:db8:2::1", "::ffff:223.1.3.4",
+                 "fe80::1", "1.2.3", "300.1.1.1", "abc", "", "2001:zz::1", "2001:db8::1::2"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        linear, trie = Router(mixed_routes), Router(mixed_routes, backend="trie")
+    print("Both backends on valid, invalid and mixed IPv4/IPv6 input:")
+    for ip in addresses:
+        link, trie_link = linear.route_packet(ip), trie.route_packet(ip)
+        print(f'  Routing "{ip}" -> {link}')
+        if link != trie_link:
+            raise AssertionError(f"linear and trie backends disagree on {ip!r}: {link} vs {trie_link}")
+    print("  Expected: the same link (or the same error) from both backends")
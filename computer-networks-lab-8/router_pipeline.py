@@ -0,0 +1,454 @@
+# router_pipeline.py
+import argparse
+import contextlib
+import io
+import multiprocessing as mp
+import os
+import queue
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import lab8_import  # noqa: F401  (makes the *.py.py lab modules importable)
+from router_forwarding_table import Router
+from replay_harness import make_routes
+from ip_utils import parse_cidr
+from lpm_trie import PrefixTrie
+
+# The repository root, for the shared common package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)  # Appended, so it cannot shadow anything
+from common.metrics import Histogram
+
+# One packet record: src, dst, size, priority, output port, input port, created (perf_counter)
+RECORD = struct.Struct("<IIHBBHxxd")
+COUNTER = struct.Struct("<Q")
+BATCH_SIZE = 256
+ROUTE_CACHE_SIZE = 65_536
+
+
+class PacketRing:
+    """
+    Single-producer, single-consumer ring of fixed-size packet records in
+    multiprocessing.shared_memory.
+
+    Layout: head (records consumed) at offset 0, tail (records published)
+    at 64, a done flag at 128, each on its own cache line, then
+    `slots` records. The producer copies a whole batch into the slots
+    and only then advances tail; the consumer copies records out and then
+    advances head. Counters only grow, so full/empty is tail - head and
+    no lock is needed. (This relies on the stores becoming visible in
+    program order, which holds on x86; weaker CPUs would need fences that
+    Python cannot express.)
+
+    Records cross the process boundary as raw bytes, never pickled.
+    """
+
+    HEAD, TAIL, DONE, HEADER_SIZE = 0, 64, 128, 192
+
+    def __init__(self, slots=8192, name=None):
+        if slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.slots = slots
+        size = self.HEADER_SIZE + slots * RECORD.size
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.shm.buf[:self.HEADER_SIZE] = bytes(self.HEADER_SIZE)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.buf = self.shm.buf
+        self.data = self.buf[self.HEADER_SIZE:self.HEADER_SIZE + slots * RECORD.size]
+
+    # With the "spawn" start method rings are sent to children by name
+    def __reduce__(self):
+        return PacketRing, (self.slots, self.shm.name)
+
+    def _get(self, offset):
+        return COUNTER.unpack_from(self.buf, offset)[0]
+
+    def push(self, blob):
+        """
+        Publishes a batch of packed records, waiting while the ring is
+        full (backpressure).
+        """
+        count = len(blob) // RECORD.size
+        slots, size = self.slots, RECORD.size
+        if count > slots:
+            raise ValueError(f"batch of {count} records does not fit in {slots} slots")
+        tail = self._get(self.TAIL)
+        while slots - (tail - self._get(self.HEAD)) < count:
+            time.sleep(0)  # Let the consumer run
+        start = (tail & (slots - 1)) * size
+        first = min(len(blob), slots * size - start)
+        self.data[start:start + first] = blob[:first]
+        if first < len(blob):
+            self.data[:len(blob) - first] = blob[first:]
+        COUNTER.pack_into(self.buf, self.TAIL, tail + count)
+
+    def pop(self, max_records=BATCH_SIZE):
+        """Copies out up to max_records published records (b"" if none)."""
+        head = self._get(self.HEAD)
+        count = min(self._get(self.TAIL) - head, max_records)
+        if count <= 0:
+            return b""
+        size = self.slots * RECORD.size
+        start = (head & (self.slots - 1)) * RECORD.size
+        length = count * RECORD.size
+        if start + length <= size:
+            blob = bytes(self.data[start:start + length])
+        else:
+            blob = bytes(self.data[start:]) + bytes(self.data[:start + length - size])
+        COUNTER.pack_into(self.buf, self.HEAD, head + count)
+        return blob
+
+    def finish(self):
+        self.buf[self.DONE] = 1
+
+    @property
+    def finished(self):
+        return self.buf[self.DONE] == 1
+
+    def close(self):
+        self.data.release()
+        self.buf = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+# --- Pipeline stages ---
+
+def ip_to_int(ip):
+    return struct.unpack("!I", socket.inet_aton(ip))[0]
+
+
+def make_traffic(count, routes, seed, destinations=20_000, s=1.1):
+    """
+    Zipf-distributed destinations (most inside the routing table) with the
+    usual size mix; priorities as in aqm.overload_traffic().
+
+    Returns:
+        A list of (src, dst, size, priority) tuples with integer addresses.
+    """
+    rng = random.Random(seed)
+    networks = []
+    for cidr, _ in routes:
+        ip, length = cidr.split("/")
+        networks.append((ip_to_int(ip), 32 - int(length)))
+    hosts = []
+    for _ in range(destinations):
+        if rng.random() < 0.8:
+            base, host_bits = rng.choice(networks)
+            hosts.append(base | rng.getrandbits(host_bits) if host_bits else base)
+        else:
+            hosts.append(rng.getrandbits(32))
+    weights = [1 / rank ** s for rank in range(1, destinations + 1)]
+    dests = rng.choices(hosts, weights=weights, k=count)
+    sizes = rng.choices([(64, 0), (576, 1), (1500, 2)], weights=[0.45, 0.15, 0.40], k=count)
+    src = ip_to_int("10.0.0.1")
+    return [(src, dst, size, priority) for dst, (size, priority) in zip(dests, sizes)]
+
+
+def make_lookup(routes, backend):
+    """
+    Returns lookup(dst) -> link for integer IPv4 destinations.
+
+    "trie" (the default) does longest prefix match in a PrefixTrie on the
+    integers the records already carry; "linear" formats each address and
+    goes through the lab's Router.route_packet, for comparison.
+    """
+    if backend == "trie":
+        trie = PrefixTrie(32)
+        for cidr, link in routes:
+            network, length, width = parse_cidr(cidr)
+            if width == 32:
+                trie.insert(network, length, link)
+        trie_lookup = trie.lookup
+        return lambda dst: trie_lookup(dst) or "Default Gateway"
+    with contextlib.redirect_stdout(io.StringIO()):
+        router = Router(routes)
+    route, ntoa, to_bytes = router.route_packet, socket.inet_ntoa, struct.Struct("!I").pack
+    return lambda dst: route(ntoa(to_bytes(dst)))
+
+
+def input_worker(index, routes, link_ports, packets, rings, start, seed, backend, use_cache,
+                 results):
+    """
+    Input port: routes its share of the traffic a batch at a time and
+    hands each packet to the ring of the output port its link maps to.
+
+    With use_cache, lookups first go through a bounded per-worker route
+    cache keyed by destination, the way line cards cache recent flows.
+    Zipf traffic hits it most of the time, so it is off by default: the
+    headline figures measure the LPM itself.
+    """
+    lookup = make_lookup(routes, backend)
+    traffic = make_traffic(packets, routes, seed)
+    cache = {}
+    hits = 0
+    pack = RECORD.pack
+    outputs = len(rings)
+    start.wait()
+
+    for offset in range(0, len(traffic), BATCH_SIZE):
+        chunk = traffic[offset:offset + BATCH_SIZE]
+        if use_cache:
+            ports = []
+            for _, dst, _, _ in chunk:
+                port = cache.get(dst)
+                if port is None:
+                    if len(cache) >= ROUTE_CACHE_SIZE:
+                        cache.clear()
+                    port = cache[dst] = link_ports[lookup(dst)]
+                else:
+                    hits += 1
+                ports.append(port)
+        else:
+            ports = [link_ports[lookup(dst)] for _, dst, _, _ in chunk]
+        batch = [[] for _ in range(outputs)]
+        now = time.perf_counter()
+        for (src, dst, size, priority), port in zip(chunk, ports):
+            batch[port].append(pack(src, dst, size, priority, port, index, now))
+        for port, records in enumerate(batch):
+            if records:
+                rings[port].push(b"".join(records))
+    for ring in rings:
+        ring.finish()
+        ring.close()
+    results.put(("input", index, {"packets": len(traffic), "cache_hits": hits}))
+
+
+def output_worker(port, rings, scheduler, start, results, link_bps=0.0, buffer_packets=1000):
+    """
+    Output port: drains every input's ring into per-class queues and
+    transmits strictly by priority, arrival order within a class (the
+    order priority_scheduler produces), or in arrival order for "fifo".
+
+    With link_bps, the port is a link of that rate: a packet takes
+    size * 8 / link_bps seconds to send, and arrivals that find
+    buffer_packets already queued are tail-dropped, so the scheduler
+    decides who waits and who is lost. The link is clocked by the
+    packets' own timestamps (before each arrival, everything that would
+    have started sending by then is sent), so time this process spends
+    descheduled does not count as idle link time.
+    With link_bps=0 every batch is sent as soon as it arrives (a
+    forwarding benchmark; the scheduler then makes no difference).
+    Records end-to-end latency from input to transmission, per class.
+    """
+    queues = [deque() for _ in range(1 if scheduler == "fifo" else 3)]
+    latency = Histogram()
+    class_latency = [Histogram() for _ in range(3)]
+    per_class = [0, 0, 0]
+    dropped = [0, 0, 0]
+    sent = sent_bytes = backlog = 0
+    link_free_at = 0.0
+
+    def transmit(until):
+        """Sends queued packets whose transmission starts by `until`."""
+        nonlocal backlog, link_free_at, sent, sent_bytes
+        while backlog and link_free_at <= until:
+            record = next(q for q in queues if q).popleft()
+            backlog -= 1
+            if link_bps:
+                link_free_at = max(link_free_at, record[6]) + record[2] * 8 / link_bps
+                departed = link_free_at
+            else:
+                departed = until
+            latency.observe(departed - record[6])
+            class_latency[record[3]].observe(departed - record[6])
+            per_class[record[3]] += 1
+            sent += 1
+            sent_bytes += record[2]
+
+    start.wait()
+    idle = 0
+    while True:
+        got = 0
+        for ring in rings:
+            blob = ring.pop()
+            if blob:
+                got += 1
+                for record in RECORD.iter_unpack(blob):
+                    if link_bps:
+                        transmit(record[6])
+                        if backlog >= buffer_packets:
+                            dropped[record[3]] += 1
+                            continue
+                    queues[0 if scheduler == "fifo" else record[3]].append(record)
+                    backlog += 1
+        if got:
+            idle = 0
+            transmit(time.perf_counter())
+        elif all(ring.finished for ring in rings):
+            # Finished flags are set after the last push; one more empty
+            # pass confirms nothing arrived in between
+            idle += 1
+            if idle > 1:
+                transmit(float("inf"))  # Play out what is left in the buffer
+                break
+        else:
+            time.sleep(0)
+    for ring in rings:
+        ring.close()
+    results.put(("output", port, {
+        "packets": sent, "bytes": sent_bytes, "per_class": per_class, "dropped": dropped,
+        "latency_p50_ms": latency.quantile(0.5) * 1000,
+        "latency_p99_ms": latency.quantile(0.99) * 1000,
+        "class_p99_ms": [h.quantile(0.99) * 1000 for h in class_latency],
+        "done_at": time.perf_counter(),
+    }))
+
+
+def collect(procs, results, start, timeout):
+    """
+    Waits for one report per process. Raises RuntimeError as soon as a
+    process exits without reporting (a crashed worker would otherwise
+    leave the others, and us, waiting forever), or after `timeout`.
+    """
+    deadline = time.monotonic() + timeout
+
+    def check():
+        crashed = [p for p in procs if p.exitcode not in (None, 0)]
+        if crashed:
+            raise RuntimeError("pipeline worker failed: " + ", ".join(
+                f"{p.name} exited with code {p.exitcode}" for p in crashed))
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"pipeline did not finish within {timeout:.0f} s")
+
+    # Join the start barrier only once everyone else is at it, so a worker
+    # that dies during setup cannot leave us blocked there
+    while start.n_waiting < len(procs):
+        check()
+        time.sleep(0.01)
+    try:
+        start.wait(5)
+    except threading.BrokenBarrierError:
+        check()
+        raise RuntimeError("pipeline workers did not start together")
+    began = time.perf_counter()
+    reports = []
+    while len(reports) < len(procs):
+        try:
+            reports.append(results.get(timeout=0.2))
+        except queue.Empty:
+            check()
+    return began, reports
+
+
+def run_pipeline(workers, outputs=2, packets=200_000, routes=None, scheduler="priority",
+                 backend="trie", use_cache=False, link_mbps=0.0, buffer_packets=1000,
+                 ring_slots=8192, seed=1, timeout=300.0):
+    """
+    Starts `workers` input processes and `outputs` output processes
+    connected by workers * outputs rings, pushes `packets` packets
+    through, and reports end-to-end throughput. link_mbps (per output
+    port, 0 = unlimited) and buffer_packets shape the output links; see
+    output_worker().
+    """
+    routes = routes or make_routes(1000)
+    links = sorted({link for _, link in routes}) + ["Default Gateway"]
+    link_ports = {link: i % outputs for i, link in enumerate(links)}
+
+    ctx = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else "spawn")
+    rings = [[PacketRing(ring_slots) for _ in range(outputs)] for _ in range(workers)]
+    start = ctx.Barrier(workers + outputs + 1)
+    results = ctx.Queue()
+    share = packets // workers
+    procs = [ctx.Process(target=input_worker, name=f"input-{i}",
+                         args=(i, routes, link_ports, share, rings[i], start, seed + i,
+                               backend, use_cache, results))
+             for i in range(workers)]
+    procs += [ctx.Process(target=output_worker, name=f"output-{port}",
+                          args=(port, [rings[i][port] for i in range(workers)], scheduler,
+                                start, results, link_mbps * 1e6, buffer_packets))
+              for port in range(outputs)]
+    try:
+        for p in procs:
+            p.start()
+        began, reports = collect(procs, results, start, timeout)
+        for p in procs:
+            p.join()
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+        for row in rings:
+            for ring in row:
+                ring.close()
+                ring.unlink()
+
+    outs = [r for kind, _, r in reports if kind == "output"]
+    ins = [r for kind, _, r in reports if kind == "input"]
+    elapsed = max(r["done_at"] for r in outs) - began
+    delivered = sum(r["packets"] for r in outs)
+    return {
+        "workers": workers,
+        "outputs": outputs,
+        "packets": delivered,
+        "sent": sum(r["packets"] for r in ins),
+        "dropped": [sum(r["dropped"][c] for r in outs) for c in range(3)],
+        "seconds": elapsed,
+        "packets_per_sec": delivered / elapsed,
+        "bits_per_sec": sum(r["bytes"] for r in outs) * 8 / elapsed,
+        "cache_hit_rate": sum(r["cache_hits"] for r in ins) / max(1, sum(r["packets"] for r in ins)),
+        "latency_p50_ms": max(r["latency_p50_ms"] for r in outs),
+        "latency_p99_ms": max(r["latency_p99_ms"] for r in outs),
+        "class_p99_ms": [max(r["class_p99_ms"][c] for r in outs) for c in range(3)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process router pipeline over shared-memory rings")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1,
+                        help="scale input workers from 1 to this")
+    parser.add_argument("--outputs", type=int, default=2, help="output-port scheduler processes")
+    parser.add_argument("--packets", type=int, default=200_000)
+    parser.add_argument("--routes", type=int, default=1000)
+    parser.add_argument("--backend", choices=["trie", "linear"], default="trie",
+                        help="LPM in a PrefixTrie, or the lab's linear Router")
+    parser.add_argument("--link-mbps", type=float, default=0,
+                        help="output link rate for the scheduler comparison (default: 80%% "
+                             "of the measured forwarding rate; input batches arrive in bursts, "
+                             "so buffers still overflow)")
+    parser.add_argument("--buffer", type=int, default=1000, help="output port buffer in packets")
+    args = parser.parse_args()
+
+    routes = make_routes(args.routes)
+    print(f"--- {args.packets:,} packets, {args.routes} routes, {args.outputs} output ports, "
+          f"{args.backend} LPM, {os.cpu_count()} CPUs ---")
+    print("Forwarding (no route cache, output links unlimited):")
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        r = run_pipeline(workers, args.outputs, args.packets, routes, backend=args.backend)
+        baseline = baseline or r
+        lost = r["sent"] - r["packets"]
+        print(f"{workers:2d} input workers: {r['packets_per_sec']:>10,.0f} pkt/s "
+              f"(x{r['packets_per_sec'] / baseline['packets_per_sec']:4.2f}) | latency p50 "
+              f"{r['latency_p50_ms']:7.2f} ms p99 {r['latency_p99_ms']:7.2f} ms"
+              + (f" | LOST {lost}" if lost else ""))
+
+    r = run_pipeline(args.max_workers, args.outputs, args.packets, routes, backend=args.backend,
+                     use_cache=True)
+    print(f"\nWith a per-worker route cache in front of the LPM ({args.max_workers} input workers): "
+          f"{r['packets_per_sec']:,.0f} pkt/s, {r['cache_hit_rate'] * 100:.1f}% cache hits")
+
+    link_mbps = args.link_mbps or 0.8 * baseline["bits_per_sec"] / args.outputs / 1e6
+    print(f"\nScheduling on {link_mbps:,.0f} Mb/s output links, {args.buffer}-packet buffers "
+          f"(1 input worker):")
+    for scheduler in ("fifo", "priority"):
+        r = run_pipeline(1, args.outputs, args.packets, routes, scheduler, args.backend,
+                         link_mbps=link_mbps, buffer_packets=args.buffer)
+        p99 = " / ".join(f"{ms:7.2f}" for ms in r["class_p99_ms"])
+        drops = " / ".join(str(d) for d in r["dropped"])
+        print(f"{scheduler:>9}: p99 by class 0/1/2 {p99} ms | drops by class {drops}")
+
+
+if __name__ == "__main__":
+    main()